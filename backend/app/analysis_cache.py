@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .cache import TTLCache
+
+# Content-addressed cache for chart analyses.
+#
+# Key = sha256(image bytes, mode, rounded quantitative context, model name), so re-submitting
+# the same chart with the same mode and (rounded) indicators returns the stored answer instead
+# of another vision call. Entries live in an in-memory LRU in front of a directory of JSON
+# files (<dir>/<2 hex>/<hash>.json); both expire after ANALYSIS_CACHE_TTL.
+
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "analysis_cache")
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", str(24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
+ANALYSIS_CACHE_CONTEXT_DECIMALS = int(os.getenv("ANALYSIS_CACHE_CONTEXT_DECIMALS", "2"))
+
+# Expired files are removed when read, plus a sweep of the whole directory every N writes
+_SWEEP_EVERY = 200
+
+
+def _rounded(value, decimals: int):
+    if isinstance(value, float):
+        return round(value, decimals)
+    if isinstance(value, dict):
+        return {str(k): _rounded(v, decimals) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_rounded(v, decimals) for v in value]
+    return value
+
+
+def analysis_key(image_bytes: bytes, mode: str, context, model: str,
+                 decimals: int = ANALYSIS_CACHE_CONTEXT_DECIMALS) -> str:
+    h = hashlib.sha256()
+    h.update(hashlib.sha256(image_bytes).digest())
+    h.update(b"\0" + model.encode() + b"\0" + str(mode).encode() + b"\0")
+    h.update(json.dumps(_rounded(context or {}, decimals), sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class AnalysisCache:
+
+    def __init__(self, directory: str = ANALYSIS_CACHE_DIR, ttl: float = ANALYSIS_CACHE_TTL,
+                 max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.ttl = ttl
+        # Memory layer; entries promoted from disk start a fresh memory TTL (worst case ~2x ttl)
+        self.memory = TTLCache("chart_analyses", ttl=ttl, max_entries=max_entries)
+        self._writes = 0
+
+        self.disk_hits = 0
+        self.disk_errors = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        """
+        Cached analysis for key (memory, then disk) or None.
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.disk_errors += 1
+            print(f"Analysis cache read error ({key}): {e}")
+            return None
+
+        if time.time() - saved.get("stored_at", 0) >= self.ttl:
+            self._remove(path)
+            return None
+        self.disk_hits += 1
+        self.memory.put(key, saved["response"])
+        return saved["response"]
+
+    def put(self, key: str, response: dict):
+        self.memory.put(key, response)
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": time.time(), "response": response}, f)
+            os.replace(tmp, path)
+        except Exception as e:
+            self.disk_errors += 1
+            print(f"Analysis cache write error ({key}): {e}")
+            return
+
+        self._writes += 1
+        if self._writes % _SWEEP_EVERY == 0:
+            self.sweep()
+
+    def sweep(self):
+        """
+        Deletes expired files from the disk layer.
+        """
+        cutoff = time.time() - self.ttl
+        try:
+            buckets = [e.path for e in os.scandir(self.directory) if e.is_dir()]
+        except FileNotFoundError:
+            return
+        for bucket in buckets:
+            for entry in os.scandir(bucket):
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        self._remove(entry.path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+analysis_cache = AnalysisCache()
@@ -1,70 +1,113 @@
 import pandas as pd
 import numpy as np
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.trend import MACD, SMAIndicator, EMAIndicator, IchimokuIndicator
-from ta.volatility import BollingerBands, AverageTrueRange
-from ta.volume import OnBalanceVolumeIndicator
 
-# ... imports ...
+from . import indicators as ind
 
-def calculate_technical_indicators(df: pd.DataFrame):
+# Columns written by calculate_technical_indicators, in block order
+INDICATOR_COLUMNS = [
+    'rsi', 'macd', 'macd_signal', 'macd_diff', 'bb_high', 'bb_low', 'bb_mid',
+    'sma_50', 'sma_200', 'ema_20', 'ichimoku_a', 'ichimoku_b', 'ichimoku_base_line',
+    'ichimoku_conversion_line', 'obv', 'atr',
+]
+
+def compute_indicator_block(open_, high, low, close, volume) -> np.ndarray:
     """
-    Adds technical indicators to the DataFrame.
-    Expects columns: ['open', 'high', 'low', 'close', 'volume']
+    Runs every indicator kernel into one preallocated (len(INDICATOR_COLUMNS), n) float64 block.
+    Same values the `ta` objects produce (see indicators.py).
     """
-    if df.empty:
-        return {}
-
-    # Ensure close is numeric
-    close = df['close']
-    high = df['high']
-    low = df['low']
-    volume = df['volume']
+    close = ind.as_array(close)
+    high = ind.as_array(high)
+    low = ind.as_array(low)
+    block = np.empty((len(INDICATOR_COLUMNS), len(close)), dtype=np.float64)
+    row = dict(zip(INDICATOR_COLUMNS, block))
 
     # 1. RSI (14)
-    rsi_indicator = RSIIndicator(close=close, window=14)
-    df['rsi'] = rsi_indicator.rsi()
+    ind.rsi(close, 14, out=row['rsi'])
 
     # 2. MACD (12, 26, 9)
-    macd = MACD(close=close)
-    df['macd'] = macd.macd()
-    df['macd_signal'] = macd.macd_signal()
-    df['macd_diff'] = macd.macd_diff()
+    ind.macd(close, out=(row['macd'], row['macd_signal'], row['macd_diff']))
 
     # 3. Bollinger Bands (20, 2 std dev)
-    bollinger = BollingerBands(close=close, window=20, window_dev=2)
-    df['bb_high'] = bollinger.bollinger_hband()
-    df['bb_low'] = bollinger.bollinger_lband()
-    df['bb_mid'] = bollinger.bollinger_mavg()
+    ind.bollinger(close, 20, 2, out=(row['bb_high'], row['bb_low'], row['bb_mid']))
 
     # 4. SMA / EMA (Trend)
-    df['sma_50'] = SMAIndicator(close=close, window=50).sma_indicator()
-    df['sma_200'] = SMAIndicator(close=close, window=200).sma_indicator() # Added for Golden Cross
-    df['ema_20'] = EMAIndicator(close=close, window=20).ema_indicator()
-    
-    # 5. Ichimoku Cloud (9, 26, 52)
-    ichimoku = IchimokuIndicator(high=high, low=low, window1=9, window2=26, window3=52)
-    df['ichimoku_a'] = ichimoku.ichimoku_a()
-    df['ichimoku_b'] = ichimoku.ichimoku_b()
-    df['ichimoku_base_line'] = ichimoku.ichimoku_base_line()
-    df['ichimoku_conversion_line'] = ichimoku.ichimoku_conversion_line()
+    ind.sma(close, 50, out=row['sma_50'])
+    ind.sma(close, 200, out=row['sma_200']) # Added for Golden Cross
+    ind.ema(close, span=20, min_periods=20, out=row['ema_20'])
 
-    # ... (existing indicators) ...
+    # 5. Ichimoku Cloud (9, 26, 52)
+    ind.ichimoku(high, low, 9, 26, 52, out=(row['ichimoku_a'], row['ichimoku_b'],
+                                             row['ichimoku_base_line'], row['ichimoku_conversion_line']))
 
     # 6. On-Balance Volume (OBV)
-    df['obv'] = OnBalanceVolumeIndicator(close=close, volume=volume).on_balance_volume()
+    ind.obv(close, volume, out=row['obv'])
 
     # 7. ATR (14) - Volatility / Stop Loss
-    df['atr'] = AverageTrueRange(high=high, low=low, close=close, window=14).average_true_range()
+    ind.atr(high, low, close, 14, out=row['atr'])
+    return block
+
+def calculate_technical_indicators(df: pd.DataFrame):
+    """
+    Adds technical indicators to the DataFrame.
+    Expects columns: ['open', 'high', 'low', 'close', 'volume']
+    """
+    if df.empty:
+        return {}
+
+    block = compute_indicator_block(df['open'], df['high'], df['low'], df['close'], df['volume'])
+    for name, values in zip(INDICATOR_COLUMNS, block):
+        df[name] = values
 
     # --- NEW: Fibonacci & Pattern Recognition ---
     
     # Fibonacci Levels (based on last 100 periods or full DF)
     lookback = min(len(df), 100)
-    recent_high = df['high'].rolling(window=lookback).max().iloc[-1]
-    recent_low = df['low'].rolling(window=lookback).min().iloc[-1]
+    recent_high = np.float64(df['high'].to_numpy()[-lookback:].max())
+    recent_low = np.float64(df['low'].to_numpy()[-lookback:].min())
+
+    # Candlestick Patterns
+    df['doji'], df['hammer'], df['bullish_engulfing'] = candlestick_patterns(
+        df['open'], df['high'], df['low'], df['close'])
+
+    # Return the latest values as a summary dict
+    return summarize_indicators(df.iloc[-1], recent_high, recent_low)
+
+def candlestick_patterns(open_, high, low, close):
+    """
+    Per-bar (doji, hammer, bullish_engulfing) boolean arrays.
+    """
+    open_, high, low, close = (ind.as_array(x) for x in (open_, high, low, close))
+
+    # Doji: Open and Close are virtually equal
+    doji = np.abs(open_ - close) <= (high - low) * 0.1
+
+    # Hammer: Small body at top, long lower wick (Bullish)
+    # Body is in upper third, lower wick is > 2x body
+    body_size = np.abs(open_ - close)
+    lower_wick = np.minimum(open_, close) - low
+    upper_wick = high - np.maximum(open_, close)
+    hammer = (lower_wick > 2 * body_size) & (upper_wick < body_size)
+
+    # Engulfing (Bullish)
+    # Prev candle Red, Curr candle Green, Curr body engulfs prev body
+    bullish_engulfing = np.zeros(close.shape, dtype=bool)
+    prev_open, prev_close = open_[:-1], close[:-1]
+    cur_open, cur_close = open_[1:], close[1:]
+    bullish_engulfing[1:] = (prev_close < prev_open) & (cur_close > cur_open) & \
+                            (cur_open < prev_close) & (cur_close > prev_open)
+    return doji, hammer, bullish_engulfing
+
+def _round_finite(value, digits: int = 2):
+    # Warm-up NaNs (series shorter than the window) become None, JSON has no NaN
+    return round(value, digits) if np.isfinite(value) else None
+
+def summarize_indicators(latest, recent_high, recent_low):
+    """
+    Builds the indicator summary dict from the latest bar's values.
+    `latest` can be a DataFrame row or any mapping with the indicator column names
+    (shared with the incremental engine so both return the same shape).
+    """
     diff = recent_high - recent_low
-    
     fib_levels = {
         "0.0": recent_low,
         "0.236": recent_low + 0.236 * diff,
@@ -75,34 +118,13 @@ def calculate_technical_indicators(df: pd.DataFrame):
         "1.0": recent_high
     }
 
-    # Candlestick Patterns
-    # Doji: Open and Close are virtually equal
-    df['doji'] = np.abs(df['open'] - df['close']) <= (df['high'] - df['low']) * 0.1
-    
-    # Hammer: Small body at top, long lower wick (Bullish)
-    # Body is in upper third, lower wick is > 2x body
-    body_size = np.abs(df['open'] - df['close'])
-    lower_wick = np.minimum(df['open'], df['close']) - df['low']
-    upper_wick = df['high'] - np.maximum(df['open'], df['close'])
-    df['hammer'] = (lower_wick > 2 * body_size) & (upper_wick < body_size)
-    
-    # Engulfing (Bullish)
-    # Prev candle Red, Curr candle Green, Curr body engulfs prev body
-    prev_open = df['open'].shift(1)
-    prev_close = df['close'].shift(1)
-    df['bullish_engulfing'] = (prev_close < prev_open) & (df['close'] > df['open']) & \
-                              (df['open'] < prev_close) & (df['close'] > prev_open)
-
-    # Return the latest values as a summary dict
-    latest = df.iloc[-1]
-    
     # Determine basic signal state
     macd_signal = "Bullish" if latest['macd'] > latest['macd_signal'] else "Bearish"
     rsi_state = "Overbought" if latest['rsi'] > 70 else ("Oversold" if latest['rsi'] < 30 else "Neutral")
     
     # Advanced Signals
     # Golden Cross: SMA 50 > SMA 200 (detect if it recently crossed or is just above)
-    golden_cross = latest['sma_50'] > latest['sma_200'] if not np.isnan(latest['sma_200']) else False
+    golden_cross = bool(latest['sma_50'] > latest['sma_200']) if not np.isnan(latest['sma_200']) else False
     
     # Ichimoku Status
     cloud_top = max(latest['ichimoku_a'], latest['ichimoku_b'])
@@ -122,81 +144,117 @@ def calculate_technical_indicators(df: pd.DataFrame):
     if latest['bullish_engulfing']: patterns.append("Bullish Engulfing")
     
     return {
-        "rsi": round(latest['rsi'], 2),
+        "rsi": _round_finite(latest['rsi']),
         "rsi_state": rsi_state,
-        "macd": round(latest['macd'], 2),
+        "macd": _round_finite(latest['macd']),
         "macd_signal": macd_signal,
-        "bb_position": round((latest['close'] - latest['bb_low']) / (latest['bb_high'] - latest['bb_low']), 2),
+        "bb_position": _round_finite((latest['close'] - latest['bb_low']) / (latest['bb_high'] - latest['bb_low'])),
         "current_price": round(latest['close'], 2),
-        "sma_50": round(latest['sma_50'], 2) if not np.isnan(latest['sma_50']) else None,
-        "sma_200": round(latest['sma_200'], 2) if not np.isnan(latest['sma_200']) else None,
+        "sma_50": _round_finite(latest['sma_50']),
+        "sma_200": _round_finite(latest['sma_200']),
         "golden_cross": golden_cross,
         "ichimoku_status": ichimoku_status,
-        "atr": round(latest['atr'], 2),
+        "atr": _round_finite(latest['atr']),
         "obv": round(latest['obv'], 2),
         "patterns": patterns,
         "fibonacci_levels": {k: round(v, 2) for k, v in fib_levels.items()}
     }
 
+FORECAST_FEATURES = ['return_1d', 'vol_change', 'high_low_pct', 'rsi', 'macd']
+FORECAST_MIN_BARS = 50
+
+def build_forecast_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Feature frame for the next-close model (FORECAST_FEATURES + 'close' + 'target').
+    Returns a new frame; df is left untouched, so cached frames can be passed directly.
+    """
+    close = df['close']
+    features = pd.DataFrame(index=df.index)
+    features['close'] = close
+    features['target'] = close.shift(-1) # Next day's price
+
+    # Features: Lagged returns, volatility, volume change
+    features['return_1d'] = close.pct_change()
+    features['vol_change'] = df['volume'].pct_change()
+    features['high_low_pct'] = (df['high'] - df['low']) / close
+
+    # Indicator features (reuse the columns if calculate_technical_indicators already ran)
+    features['rsi'] = df['rsi'] if 'rsi' in df.columns else ind.rsi(close, 14)
+    features['macd'] = df['macd'] if 'macd' in df.columns else ind.macd(close)[0]
+
+    # Zero volume bars turn pct_change into inf, treat those like missing values
+    return features.replace([np.inf, -np.inf], np.nan)
+
+def fit_forecast_model(features: pd.DataFrame):
+    """
+    Trains a lightweight Random Forest on a build_forecast_features() frame.
+    Returns (model, rmse on the most recent 20% held out).
+    """
+    # scikit-learn is only imported where models are fitted (analytics workers, mock forecasts)
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_squared_error
+    from sklearn.model_selection import train_test_split
+
+    # Clean NaNs
+    model_df = features.dropna(subset=FORECAST_FEATURES + ['target'])
+
+    if model_df.empty:
+        raise ValueError("Data validation failed")
+
+    X = model_df[FORECAST_FEATURES]
+    y = model_df['target']
+
+    # Split (Training on past, Testing on recent) -- simple validation
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
+
+    model = RandomForestRegressor(n_estimators=100, max_depth=5, random_state=42)
+    model.fit(X_train, y_train)
+
+    # Evaluate
+    predictions = model.predict(X_test)
+    rmse = float(np.sqrt(mean_squared_error(y_test, predictions)))
+    return model, rmse
+
+def predict_next_close(model, rmse: float, features: pd.DataFrame) -> dict:
+    """
+    Predicts the NEXT close from the very last row of features with a fitted model.
+    """
+    last_row = features.iloc[[-1]][FORECAST_FEATURES]
+    # Impute if needed (though indicators should be present)
+    last_row = last_row.fillna(0)
+
+    next_price = model.predict(last_row)[0]
+    current_price = features['close'].iloc[-1]
+    predicted_change = ((next_price - current_price) / current_price) * 100
+
+    return {
+        "predicted_price": round(next_price, 2),
+        "predicted_change_percent": round(predicted_change, 2),
+        "direction": "Up" if next_price > current_price else "Down",
+        "confidence": forecast_confidence(rmse, current_price),
+        "model_error_rmse": round(rmse, 2)
+    }
+
+def forecast_confidence(rmse: float, current_price: float) -> str:
+    """
+    High / Medium / Low from the model's RMSE relative to the current price.
+    """
+    confidence = "High" if rmse < (current_price * 0.02) else "Medium" # Simple heuristic
+    if rmse > (current_price * 0.05): confidence = "Low"
+    return confidence
+
 def train_and_predict(df: pd.DataFrame):
     """
     Trains a lightweight Random Forest model to predict the NEXT day's close.
+    Fits on every call; the endpoints go through model_registry.get_forecast instead.
     """
-    if len(df) < 50:
+    if len(df) < FORECAST_MIN_BARS:
         return {"error": "Not enough data for ML prediction (need 50+ candles)"}
 
     try:
-        # Feature Engineering
-        df['target'] = df['close'].shift(-1) # Next day's price
-        
-        # Features: Lagged returns, volatility, volume change
-        df['return_1d'] = df['close'].pct_change()
-        df['vol_change'] = df['volume'].pct_change()
-        df['high_low_pct'] = (df['high'] - df['low']) / df['close']
-        
-        # Clean NaNs
-        model_df = df.dropna().copy()
-        
-        if model_df.empty:
-            return {"error": "Data validation failed"}
-
-        features = ['return_1d', 'vol_change', 'high_low_pct', 'rsi', 'macd']
-        # Simple fill provided we calculated indicators previously. 
-        # If indicators aren't in DF yet (if called separately), we'd need to add them.
-        # Assuming df already has indicators from calculate_technical_indicators
-        
-        X = model_df[features]
-        y = model_df['target']
-        
-        # Split (Training on past, Testing on recent) -- simple validation
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
-        
-        model = RandomForestRegressor(n_estimators=100, max_depth=5, random_state=42)
-        model.fit(X_train, y_train)
-        
-        # Evaluate
-        predictions = model.predict(X_test)
-        rmse = np.sqrt(mean_squared_error(y_test, predictions))
-        
-        # Predict NEXT Day (using the very last row of available data)
-        last_row = df.iloc[[-1]][features]
-        # Impute if needed (though indicators should be present)
-        last_row = last_row.fillna(0) 
-        
-        next_price = model.predict(last_row)[0]
-        current_price = df.iloc[-1]['close']
-        predicted_change = ((next_price - current_price) / current_price) * 100
-        
-        confidence = "High" if rmse < (current_price * 0.02) else "Medium" # Simple heuristic
-        if rmse > (current_price * 0.05): confidence = "Low"
-
-        return {
-            "predicted_price": round(next_price, 2),
-            "predicted_change_percent": round(predicted_change, 2),
-            "direction": "Up" if next_price > current_price else "Down",
-            "confidence": confidence,
-            "model_error_rmse": round(rmse, 2)
-        }
+        features = build_forecast_features(df)
+        model, rmse = fit_forecast_model(features)
+        return predict_next_close(model, rmse, features)
 
     except Exception as e:
         print(f"ML Error: {e}")
@@ -0,0 +1,273 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .analysis_engine import fit_forecast_model, train_and_predict
+from .backtest import backtest_ticker
+from .metrics import timed
+
+# Process pool for the CPU-bound analytics (forecast fits, backtests).
+#
+# sklearn fits and the pandas/numpy kernels hold the GIL for most of their runtime, so on the
+# request threads they serialize against each other and against the event loop. Here they run
+# in ANALYTICS_WORKERS worker processes instead.
+#
+# A task's input is a dict of equal-length numeric columns. The parent copies them into one
+# shared-memory block and sends only its name and layout; the worker maps the block, rebuilds
+# the columns as views and returns a small result (a fitted model, metrics). The block is
+# unlinked once the task finishes, also when the caller stopped waiting for it.
+#
+# Admission control: at most ANALYTICS_MAX_PENDING tasks are queued or running; past that
+# submit() raises PoolSaturated right away and callers answer from what they have (the last
+# fitted model) or with a degraded response, instead of queueing work nobody will wait for.
+# Every wait is bounded by a deadline (ANALYTICS_TASK_DEADLINE unless the caller passes one).
+#
+# ANALYTICS_WORKERS=0 runs tasks inline in the calling thread (no processes, no shared memory).
+
+# A single core gains nothing from worker processes but the IPC, so it defaults to inline there
+_CPUS = os.cpu_count() or 1
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", str(min(4, _CPUS) if _CPUS > 1 else 0)))
+ANALYTICS_MAX_PENDING = int(os.getenv("ANALYTICS_MAX_PENDING", str(max(1, ANALYTICS_WORKERS) * 4)))
+ANALYTICS_TASK_DEADLINE = float(os.getenv("ANALYTICS_TASK_DEADLINE", "30"))  # seconds
+# "spawn" keeps workers clear of locks held by the server's threads at fork time
+ANALYTICS_START_METHOD = os.getenv("ANALYTICS_START_METHOD", "spawn")
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+def _pack(arrays: dict):
+    """
+    Copies the columns into one shared-memory block.
+    Returns (block, layout) with layout = [(name, dtype, shape, offset)].
+    """
+    layout = []
+    size = 0
+    for name, values in arrays.items():
+        values = np.asarray(values)
+        size = -(-size // 8) * 8  # keep every column 8-byte aligned
+        layout.append((name, values.dtype.str, values.shape, size))
+        size += values.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for (name, dtype, shape, offset), values in zip(layout, arrays.values()):
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)[...] = values
+    return block, layout
+
+
+def _release(block):
+    try:
+        block.close()
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _run_task(fn, block_name: str, layout: list, args: tuple):
+    # Worker side: map the block, hand the columns to fn, drop every view before closing
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        arrays = {name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+                  for name, dtype, shape, offset in layout}
+        result = fn(arrays, *args)
+        del arrays
+        return result
+    finally:
+        block.close()
+
+
+def _warm():
+    return os.getpid()
+
+
+# Tasks. Module-level so the workers can unpickle them; each takes the columns dict first.
+# Results are built from fresh arrays (DataFrames copy the dict's columns), so nothing
+# returned points into the block.
+
+def fit_forecast(arrays: dict):
+    """
+    (model, rmse) for a build_forecast_features() frame given as columns.
+    """
+    return fit_forecast_model(pd.DataFrame(arrays))
+
+
+def forecast_once(arrays: dict) -> dict:
+    """
+    train_and_predict on OHLCV columns (fit and predict, nothing kept).
+    """
+    return train_and_predict(pd.DataFrame(arrays))
+
+
+def backtest(arrays: dict, tickers: list, strategy: str, grid: list, cost_bps: float, allow_short: bool,
+             periods_per_year: int) -> list:
+    """
+    backtest_ticker for each ticker, reading its "<ticker>.open|high|low|close" columns.
+    Returns the runs per ticker, in order.
+    """
+    cols = ('open', 'high', 'low', 'close')
+    return [backtest_ticker({col: arrays[f"{ticker}.{col}"] for col in cols},
+                            strategy, grid, cost_bps, allow_short, periods_per_year)
+            for ticker in tickers]
+
+
+class AnalyticsPool:
+    """
+    Bounded process pool for the analytics tasks above.
+    """
+
+    def __init__(self, workers: int = ANALYTICS_WORKERS, max_pending: int = ANALYTICS_MAX_PENDING,
+                 deadline: float = ANALYTICS_TASK_DEADLINE, start_method: str = ANALYTICS_START_METHOD):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.start_method = start_method
+        self._lock = threading.RLock()  # cancelling futures runs their callbacks, which take it again
+        self._executor = None
+        self._pending = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.restarts = 0
+        self.inline = 0
+        self.task_seconds = 0.0
+
+    def _get_executor(self):
+        # Caller holds self._lock; workers start on first use (or start())
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(self.start_method))
+        return self._executor
+
+    def start(self):
+        """
+        Starts the workers ahead of the first request (they import pandas on boot, sklearn on the first fit).
+        """
+        if self.workers <= 0:
+            return
+        with self._lock:
+            executor = self._get_executor()
+            for _ in range(self.workers):
+                executor.submit(_warm)
+
+    def saturated(self) -> bool:
+        return self.workers > 0 and self._pending >= self.max_pending
+
+    def submit(self, fn, arrays: dict, *args):
+        """
+        Queues fn(arrays, *args) on a worker. Returns a concurrent.futures.Future.
+        Raises PoolSaturated when max_pending tasks are already queued or running.
+        """
+        if self.workers <= 0:
+            future = Future()
+            with self._lock:
+                self.inline += 1
+            try:
+                future.set_result(fn(arrays, *args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated(f"analytics pool saturated ({self._pending} tasks pending)")
+            self._pending += 1
+            self.submitted += 1
+        block = None
+        try:
+            block, layout = _pack(arrays)
+            with self._lock:
+                try:
+                    future = self._get_executor().submit(_run_task, fn, block.name, layout, args)
+                except BrokenProcessPool:
+                    # A worker died (OOM, segfault) and took the executor with it: start a new one
+                    self._reset()
+                    future = self._get_executor().submit(_run_task, fn, block.name, layout, args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            if block is not None:
+                _release(block)
+            raise
+        started = time.perf_counter()
+
+        def done(future):
+            _release(block)
+            with self._lock:
+                self._pending -= 1
+                if not future.cancelled():
+                    self.completed += 1
+                    self.task_seconds += time.perf_counter() - started
+
+        future.add_done_callback(done)
+        return future
+
+    def _reset(self):
+        # Caller holds self._lock
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.restarts += 1
+
+    def wait(self, future, deadline: float = None):
+        """
+        Result of a submit() future, waiting at most `deadline` seconds.
+        Raises TimeoutError past the deadline, or whatever the task raised.
+        """
+        try:
+            return future.result(timeout=self.deadline if deadline is None else max(deadline, 0.0))
+        except (TimeoutError, CancelledError):
+            # Dropped if still queued; a running task finishes and frees its slot then
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError("analytics task missed its deadline")
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def run(self, fn, arrays: dict, *args, deadline: float = None):
+        """
+        submit() and wait(): fn(arrays, *args) on a worker, bounded by `deadline`.
+        Raises PoolSaturated, TimeoutError, or whatever fn raised.
+        """
+        with timed(f"analytics.{fn.__name__}"):
+            return self.wait(self.submit(fn, arrays, *args), deadline)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.completed
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "deadline": self.deadline,
+                "pending": self._pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "restarts": self.restarts,
+                "inline": self.inline,
+                "avg_task_ms": round(self.task_seconds / finished * 1000, 2) if finished else 0.0,
+            }
+
+
+analytics_pool = AnalyticsPool()
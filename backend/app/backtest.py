@@ -0,0 +1,204 @@
+import inspect
+import itertools
+import os
+
+import numpy as np
+
+from . import indicators as ind
+from .analysis_engine import candlestick_patterns
+
+# Vectorized backtests of the indicator signals.
+#
+# Each strategy turns the same kernels calculate_technical_indicators uses into a position
+# series (1 long, -1 short, 0 flat, NaN = keep the previous position). For a ticker, every
+# parameter combination of the grid is stacked into a (bars, runs) matrix and P&L, equity,
+# drawdown, Sharpe, trades and hit rate are computed for all columns at once: the only
+# Python loops are over tickers and parameter combinations, never over bars.
+#
+# Positions are decided on a bar's close and earn the next bar's return; every change of
+# position pays cost_bps of the traded notional.
+
+BACKTEST_MAX_RUNS = int(os.getenv("BACKTEST_MAX_RUNS", "20000"))  # tickers x parameter combinations
+
+PERIODS_PER_YEAR = {
+    "1m": 252 * 390, "2m": 252 * 195, "5m": 252 * 78, "15m": 252 * 26, "30m": 252 * 13,
+    "60m": 252 * 7, "90m": 252 * 5, "1h": 252 * 7, "1d": 252, "5d": 52, "1wk": 52, "1mo": 12, "3mo": 4,
+}
+
+
+def _ffill(pos: np.ndarray) -> np.ndarray:
+    """
+    Carries the last non-NaN position forward; flat before the first signal.
+    """
+    valid = ~np.isnan(pos)
+    idx = np.where(valid, np.arange(len(pos)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    out = pos[idx]
+    out[~valid[idx]] = 0.0
+    return out
+
+
+def _two_state(bullish, bearish, allow_short: bool) -> np.ndarray:
+    pos = np.full(len(bullish), np.nan)
+    pos[bearish] = -1.0 if allow_short else 0.0
+    pos[bullish] = 1.0
+    return _ffill(pos)
+
+
+def macd_positions(bars, fast: int = 12, slow: int = 26, signal: int = 9, allow_short: bool = False):
+    """
+    Long while MACD is above its signal line.
+    """
+    line, sig, _ = ind.macd(bars['close'], fast, slow, signal)
+    return _two_state(line > sig, line < sig, allow_short)
+
+
+def rsi_positions(bars, window: int = 14, lower: float = 30, upper: float = 70, allow_short: bool = False):
+    """
+    Mean reversion: long once oversold (rsi < lower), out (or short) once overbought (rsi > upper).
+    """
+    rsi = ind.rsi(bars['close'], window)
+    return _two_state(rsi < lower, rsi > upper, allow_short)
+
+
+def golden_cross_positions(bars, fast: int = 50, slow: int = 200, allow_short: bool = False):
+    """
+    Long while the fast SMA is above the slow SMA.
+    """
+    fast_sma, slow_sma = ind.sma(bars['close'], fast), ind.sma(bars['close'], slow)
+    return _two_state(fast_sma > slow_sma, fast_sma < slow_sma, allow_short)
+
+
+def ichimoku_positions(bars, window1: int = 9, window2: int = 26, window3: int = 52, allow_short: bool = False):
+    """
+    Long above the cloud, out (or short) below it, unchanged inside it.
+    """
+    span_a, span_b, _, _ = ind.ichimoku(bars['high'], bars['low'], window1, window2, window3)
+    close = bars['close']
+    return _two_state(close > np.maximum(span_a, span_b), close < np.minimum(span_a, span_b), allow_short)
+
+
+def pattern_positions(bars, hold: int = 5, allow_short: bool = False):
+    """
+    Long for `hold` bars after a hammer or bullish engulfing candle (long-only patterns).
+    """
+    _, hammer, engulfing = candlestick_patterns(bars['open'], bars['high'], bars['low'], bars['close'])
+    return ind.rolling_max((hammer | engulfing).astype(np.float64), hold, min_periods=1)
+
+
+STRATEGIES = {
+    "macd": macd_positions,
+    "rsi": rsi_positions,
+    "golden_cross": golden_cross_positions,
+    "ichimoku": ichimoku_positions,
+    "patterns": pattern_positions,
+}
+
+
+def parameter_grid(strategy: str, params: dict = None) -> list:
+    """
+    Every combination of the given parameter lists (scalars count as one value).
+    Raises ValueError for an unknown strategy or parameter.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}' (available: {', '.join(STRATEGIES)})")
+    params = params or {}
+    signature = inspect.signature(STRATEGIES[strategy]).parameters
+    accepted = set(signature) - {"bars", "allow_short"}
+    unknown = set(params) - accepted
+    if unknown:
+        raise ValueError(f"Unknown parameters for '{strategy}': {', '.join(sorted(unknown))}")
+
+    names = sorted(params)
+    values = []
+    for name in names:
+        options = params[name] if isinstance(params[name], (list, tuple)) else [params[name]]
+        # Windows, periods and hold lengths (annotated int) must be whole numbers; thresholds may not be
+        whole = signature[name].annotation is int
+        for v in options:
+            if isinstance(v, bool) or not isinstance(v, (int, float)) or not 0 < v < float("inf"):
+                raise ValueError(f"Parameter '{name}' needs positive numbers, got {v!r}")
+            if whole and not float(v).is_integer():
+                raise ValueError(f"Parameter '{name}' needs whole numbers, got {v!r}")
+        # Windows arrive as JSON numbers (12.0), kernels need ints
+        values.append([int(v) if whole else v for v in options])
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def evaluate(close, positions: np.ndarray, cost_bps: float = 5.0, periods_per_year: int = 252) -> dict:
+    """
+    Metrics for a (bars, runs) matrix of target positions against one close series.
+    Every value in the returned dict is an array with one entry per run.
+    """
+    close = ind.as_array(close)
+    positions = np.asarray(positions, dtype=np.float64).reshape(len(close), -1)
+    n, runs = positions.shape
+
+    returns = np.zeros(n)
+    if n > 1:
+        np.divide(close[1:], close[:-1], out=returns[1:])
+        returns[1:] -= 1.0
+
+    held = np.zeros_like(positions)
+    held[1:] = positions[:-1]
+    turnover = np.abs(np.diff(held, axis=0, prepend=0.0))
+    pnl = held * returns[:, None] - turnover * (cost_bps / 10_000)
+
+    equity = np.cumprod(1.0 + pnl, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1.0
+    final = equity[-1] if n else np.ones(runs)
+    years = n / periods_per_year
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = np.where((final > 0) & (years > 0), final ** (1.0 / max(years, 1e-12)) - 1.0, -1.0)
+        std = pnl.std(axis=0)
+        sharpe = np.where(std > 0, pnl.mean(axis=0) / std * np.sqrt(periods_per_year), 0.0)
+
+    # Trades: runs of one non-zero held position. One reduceat over the column-major
+    # flattening sums each trade's log return (a column start always opens a new segment).
+    held_flat = held.T.ravel()
+    log_pnl = np.log1p(np.maximum(pnl, -0.999999)).T.ravel()
+    change = np.ones(n * runs, dtype=bool)
+    change[1:] = held_flat[1:] != held_flat[:-1]
+    if n:
+        change[::n] = True
+    starts = np.flatnonzero(change)
+    trade_returns = np.add.reduceat(log_pnl, starts) if len(starts) else np.zeros(0)
+    is_trade = held_flat[starts] != 0
+    column = starts // max(n, 1)
+    trades = np.bincount(column, weights=is_trade, minlength=runs)
+    wins = np.bincount(column, weights=is_trade & (trade_returns > 0), minlength=runs)
+
+    return {
+        "total_return": final - 1.0,
+        "cagr": cagr,
+        "sharpe": sharpe,
+        "max_drawdown": drawdown.min(axis=0) if n else np.zeros(runs),
+        "trades": trades,
+        "hit_rate": np.divide(wins, trades, out=np.zeros(runs), where=trades > 0),
+        "exposure": (held != 0).mean(axis=0) if n else np.zeros(runs),
+    }
+
+
+def backtest_ticker(df, strategy: str, grid: list, cost_bps: float = 5.0, allow_short: bool = False,
+                    periods_per_year: int = 252) -> list:
+    """
+    Runs every parameter combination in grid on one ticker's bars (a MarketData df, or a
+    dict of open/high/low/close arrays). Returns one dict per combination: {"params": ..., <metric>: ...}.
+    """
+    fn = STRATEGIES[strategy]
+    bars = {col: ind.as_array(df[col]) for col in ('open', 'high', 'low', 'close')}
+    positions = np.empty((len(bars['close']), len(grid)))
+    for j, params in enumerate(grid):
+        positions[:, j] = fn(bars, allow_short=allow_short, **params)
+
+    metrics = evaluate(bars['close'], positions, cost_bps, periods_per_year)
+    return [
+        {"params": params, **{name: int(values[j]) if name == "trades" else round(float(values[j]), 4)
+                              for name, values in metrics.items()}}
+        for j, params in enumerate(grid)
+    ]
+
+
+def buy_and_hold(df) -> float:
+    close = ind.as_array(df['close'])
+    return round(float(close[-1] / close[0] - 1.0), 4) if len(close) > 1 else 0.0
@@ -0,0 +1,310 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Persistent local store for OHLCV history.
+#
+# One directory per (interval, ticker) holding a base and a tail. The base is two
+# memory-mapped NumPy files: the bar times (int64 UTC nanoseconds) and a (5, n) float64 OHLCV
+# block whose rows are contiguous columns. The tail holds the bars merged since the base was
+# last written, in the same layout. read() wraps the base rows in a DataFrame without copying
+# when the window has no tail bars (long lookbacks go straight into the indicator kernels),
+# and copies just the window when it has some.
+#
+# Files are never modified once written. A tail update (the forming bar revised, a few new
+# bars) writes a new tail: the old tail plus the new bars, and any trailing base bars they
+# replace, which the base then stops counting (meta "base_rows"). That costs O(tail), not
+# O(history). Once the tail passes BAR_STORE_TAIL_MAX rows (many updates, or a download
+# reaching deep into the base), everything is compacted into a new base. Each merge flips meta.json to the
+# new files, so readers never see half a write.
+#
+# Files meta.json no longer references are removed after a merge. A removal can fail (on
+# Windows a file still memory-mapped by a reader can't be deleted); those are counted and
+# retried by the sweep after the next merge of that ticker.
+#
+# The store remembers how far back it is complete (`covered_from`), which lets the market
+# data fetcher download only the missing tail once a ticker has been seen.
+
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", "bar_store")
+BAR_STORE_TAIL_MAX = int(os.getenv("BAR_STORE_TAIL_MAX", "512"))  # tail rows before compaction
+# Unreferenced files younger than this are left alone (another process may be mid-merge)
+SWEEP_MIN_AGE = 60
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Lookback per yfinance period string (None = everything the provider has)
+PERIOD_DAYS = {
+    "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731,
+    "5y": 1827, "10y": 3653, "max": None,
+}
+# Day periods count trading sessions, not calendar days
+PERIOD_SESSIONS = {"1d": 1, "5d": 5}
+
+# covered_from value meaning "complete back to the provider's first bar"
+FULL_HISTORY = int(np.iinfo(np.int64).min)
+
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9^=._-]")
+
+
+def period_start(period: str):
+    """
+    First timestamp (UTC) a yfinance period string covers, or None for "max".
+    For session periods ("1d", "5d") this is a lower bound, see last_sessions().
+    Raises ValueError for an unknown period.
+    """
+    now = pd.Timestamp.now(tz="UTC")
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1, tz="UTC")
+    if period in PERIOD_SESSIONS:
+        # Enough calendar days to contain the sessions across weekends and holidays
+        return now - pd.Timedelta(days=PERIOD_SESSIONS[period] * 7 // 5 + 4)
+    if period not in PERIOD_DAYS:
+        raise ValueError(f"Unknown period '{period}'")
+    days = PERIOD_DAYS[period]
+    return None if days is None else now - pd.Timedelta(days=days)
+
+
+def _to_utc_ns(dates: pd.Series, tz: str = None) -> np.ndarray:
+    # Naive times are wall-clock times in tz (the store's), UTC when it has none
+    if dates.dt.tz is None:
+        dates = dates.dt.tz_localize(tz or "UTC")
+    return dates.dt.tz_convert("UTC").dt.as_unit("ns").to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def last_sessions(df: pd.DataFrame, sessions: int) -> pd.DataFrame:
+    """
+    Rows of the last `sessions` trading days (by local date), as a view.
+    """
+    days = df['date'].dt.normalize()
+    unique_days = days.unique()
+    if len(unique_days) <= sessions:
+        return df
+    # Dates are sorted, so the first row of that session starts the slice
+    first = int(np.argmax((days >= unique_days[-sessions]).to_numpy()))
+    return df.iloc[first:]
+
+
+class BarStore:
+
+    def __init__(self, directory: str = BAR_STORE_DIR):
+        self.directory = directory
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._unremoved = set()  # files whose removal failed, retried by the next sweep
+        self._tails = {}  # directory -> (tail version, dates, ohlcv) last read or written
+
+        self.reads = 0
+        self.writes = 0
+        self.compactions = 0
+        self.bars_written = 0
+        self.removal_failures = 0
+
+    def _dir(self, ticker: str, interval: str) -> str:
+        return os.path.join(self.directory, _UNSAFE_NAME.sub("_", interval), _UNSAFE_NAME.sub("_", ticker))
+
+    def lock(self, ticker: str, interval: str) -> threading.Lock:
+        """
+        Per (ticker, interval) lock; hold it across a coverage check, fetch and merge.
+        """
+        with self._locks_guard:
+            return self._locks.setdefault((ticker, interval), threading.Lock())
+
+    def meta(self, ticker: str, interval: str):
+        """
+        {"version", "base_rows", "tail", "tail_rows", "rows", "first", "last", "covered_from", "tz",
+        "updated_at"} or None. version / tail name the base and tail files (tail may be None);
+        first / last / covered_from are UTC nanoseconds (covered_from may be FULL_HISTORY).
+        """
+        try:
+            with open(os.path.join(self._dir(ticker, interval), "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Bar store meta error ({ticker} {interval}): {e}")
+            return None
+
+    def covers(self, ticker: str, interval: str, start) -> bool:
+        """
+        True if the stored history is complete back to `start` (None = full history) and
+        reaches into the window, so only the tail after the last stored bar is missing.
+        """
+        meta = self.meta(ticker, interval)
+        if meta is None or meta["rows"] == 0:
+            return False
+        if start is None:
+            return meta["covered_from"] == FULL_HISTORY
+        return meta["covered_from"] <= start.value <= meta["last"]
+
+    def _segments(self, path: str, meta: dict, mmap_mode=None):
+        # (dates, ohlcv) of the counted base rows and of the tail (empty arrays when there is none)
+        base_rows = meta.get("base_rows", meta["rows"])  # stores written before tails existed
+        dates = np.load(os.path.join(path, f"{meta['version']}.dates.npy"), mmap_mode=mmap_mode)[:base_rows]
+        ohlcv = np.load(os.path.join(path, f"{meta['version']}.ohlcv.npy"), mmap_mode=mmap_mode)[:, :base_rows]
+        if meta.get("tail"):
+            # Tails are small and never modified, so the current one is kept in memory
+            cached = self._tails.get(path)
+            if cached is not None and cached[0] == meta["tail"]:
+                _, tail_dates, tail_ohlcv = cached
+            else:
+                tail_dates = np.load(os.path.join(path, f"{meta['tail']}.dates.npy"))
+                tail_ohlcv = np.load(os.path.join(path, f"{meta['tail']}.ohlcv.npy"))
+                self._keep_tail(path, meta["tail"], tail_dates, tail_ohlcv)
+        else:
+            tail_dates, tail_ohlcv = np.empty(0, dtype=np.int64), np.empty((len(OHLCV_COLUMNS), 0))
+        return dates, ohlcv, tail_dates, tail_ohlcv
+
+    def _keep_tail(self, path: str, version: str, dates: np.ndarray, ohlcv: np.ndarray):
+        dates.flags.writeable = False
+        ohlcv.flags.writeable = False
+        self._tails[path] = (version, dates, ohlcv)
+
+    def read(self, ticker: str, interval: str, start=None):
+        """
+        Stored bars from `start` on as a DataFrame (date + OHLCV), or None if nothing is stored.
+        The OHLCV columns are read-only views of the memory-mapped base when the window has
+        no tail bars, copies of the window otherwise.
+        """
+        meta = self.meta(ticker, interval)
+        if meta is None:
+            return None
+        dates, ohlcv, tail_dates, tail_ohlcv = self._segments(self._dir(ticker, interval), meta, mmap_mode="r")
+
+        begin = 0 if start is None else int(np.searchsorted(dates, start.value))
+        tail_begin = 0 if start is None else int(np.searchsorted(tail_dates, start.value))
+        if tail_begin < len(tail_dates):
+            window_dates = np.concatenate([dates[begin:], tail_dates[tail_begin:]])
+            window_ohlcv = np.concatenate([ohlcv[:, begin:], tail_ohlcv[:, tail_begin:]], axis=1)
+        else:
+            window_dates, window_ohlcv = dates[begin:], ohlcv[:, begin:]
+
+        index = pd.DatetimeIndex(np.asarray(window_dates).view("datetime64[ns]"), tz="UTC")
+        if meta["tz"]:
+            index = index.tz_convert(meta["tz"])
+        columns = {"date": pd.Series(index)}
+        for name, row in zip(OHLCV_COLUMNS, window_ohlcv):
+            columns[name] = row
+        self.reads += 1
+        return pd.DataFrame(columns, copy=False)
+
+    def merge(self, ticker: str, interval: str, df: pd.DataFrame, covered_from=None, full_history: bool = False):
+        """
+        Upserts bars (a normalized history DataFrame) by time: fetched bars replace stored
+        bars at the same times. For a complete download of a period pass its start as
+        covered_from (full_history=True for "max"); leave both unset for a tail update.
+        Bars are matched by instant, so tz-aware frames in any timezone merge correctly; the
+        store takes the timezone of the last tz-aware frame, and naive frames are read in it.
+        """
+        if df.empty:
+            return
+        path = self._dir(ticker, interval)
+        meta = self.meta(ticker, interval)
+        stored_tz = meta.get("tz") if meta is not None else None
+        frame_tz = df['date'].dt.tz
+        new_dates = _to_utc_ns(df['date'], stored_tz)
+        order = np.argsort(new_dates, kind="stable")
+        new_dates = new_dates[order]
+        new_ohlcv = np.vstack([df[col].to_numpy(dtype=np.float64)[order] for col in OHLCV_COLUMNS])
+
+        base_version, base_rows, tail_dates, tail_ohlcv = None, 0, new_dates, new_ohlcv
+        if meta is not None and meta["rows"]:
+            dates, ohlcv, old_tail_dates, old_tail_ohlcv = self._segments(path, meta, mmap_mode="r")
+            # Base bars at or after the first new bar move to the tail (new bars win on equal times)
+            cut = int(np.searchsorted(dates, new_dates[0]))
+            tail_dates = np.concatenate([dates[cut:], old_tail_dates])
+            tail_ohlcv = np.concatenate([ohlcv[:, cut:], old_tail_ohlcv], axis=1)
+            keep = ~np.isin(tail_dates, new_dates)
+            tail_dates = np.concatenate([tail_dates[keep], new_dates])
+            tail_ohlcv = np.concatenate([tail_ohlcv[:, keep], new_ohlcv], axis=1)
+            order = np.argsort(tail_dates, kind="stable")
+            tail_dates, tail_ohlcv = tail_dates[order], np.ascontiguousarray(tail_ohlcv[:, order])
+            if len(tail_dates) <= BAR_STORE_TAIL_MAX:
+                base_version, base_rows = meta["version"], cut
+            else:
+                # Compaction: one new base (copies the old base once, amortized over the tail updates)
+                tail_dates = np.concatenate([np.asarray(dates[:cut]), tail_dates])
+                tail_ohlcv = np.concatenate([np.asarray(ohlcv[:, :cut]), tail_ohlcv], axis=1)
+            del dates, ohlcv  # drop the maps before the old files are removed
+
+        # How far back the store is now complete
+        first = int(tail_dates[0]) if base_version is None else min(meta["first"], int(tail_dates[0]))
+        downloaded_from = FULL_HISTORY if full_history else (covered_from.value if covered_from is not None else None)
+        if meta is None or not meta["rows"]:
+            covered = downloaded_from if downloaded_from is not None else first
+        elif downloaded_from is not None and downloaded_from <= meta["last"]:
+            covered = min(meta["covered_from"], downloaded_from)  # overlaps what was stored
+        elif downloaded_from is not None:
+            covered = downloaded_from  # gap between the stored bars and this download
+        else:
+            covered = meta["covered_from"]  # tail update, continues from the last stored bar
+
+        os.makedirs(path, exist_ok=True)
+        version = uuid.uuid4().hex[:12]
+        np.save(os.path.join(path, f"{version}.dates.npy"), tail_dates)
+        tail_ohlcv = np.ascontiguousarray(tail_ohlcv)
+        np.save(os.path.join(path, f"{version}.ohlcv.npy"), tail_ohlcv)
+        if base_version is None:
+            # Written as the new base, no tail
+            new_meta = {"version": version, "base_rows": int(len(tail_dates)), "tail": None, "tail_rows": 0}
+            self.compactions += meta is not None and bool(meta["rows"])
+        else:
+            new_meta = {"version": base_version, "base_rows": base_rows, "tail": version,
+                        "tail_rows": int(len(tail_dates))}
+            self._keep_tail(path, version, tail_dates, tail_ohlcv)
+        new_meta.update({
+            "rows": new_meta["base_rows"] + new_meta["tail_rows"],
+            "first": first,
+            "last": int(tail_dates[-1]),
+            "covered_from": int(covered),
+            "tz": str(frame_tz) if frame_tz is not None else stored_tz,
+            "updated_at": time.time(),
+        })
+        tmp = os.path.join(path, f"meta.{version}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(new_meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+        self.writes += 1
+        self.bars_written += len(new_dates)
+        replaced = {meta["version"], meta.get("tail")} if meta is not None else set()
+        self._sweep(path, new_meta, replaced)
+
+    def _sweep(self, path: str, meta: dict, replaced: set):
+        """
+        Removes the files meta no longer references: the versions this merge replaced, and
+        leftovers of earlier merges (removals that failed, or another process's). Open memory maps of removed files
+        stay valid (POSIX); where a mapped file can't be removed (Windows) it stays for the
+        next sweep.
+        """
+        live = {meta["version"], meta["tail"]}
+        now = time.time()
+        for name in os.listdir(path):
+            version = name.split(".", 1)[0]
+            if not name.endswith(".npy") or version in live:
+                continue
+            file = os.path.join(path, name)
+            try:
+                if (version not in replaced and file not in self._unremoved
+                        and now - os.path.getmtime(file) < SWEEP_MIN_AGE):
+                    continue  # not ours, possibly another process mid-merge
+                os.remove(file)
+                self._unremoved.discard(file)
+            except FileNotFoundError:
+                self._unremoved.discard(file)
+            except OSError as e:
+                self._unremoved.add(file)
+                self.removal_failures += 1
+                print(f"Bar store cleanup error ({file}), retried after the next merge: {e}")
+
+    def stats(self) -> dict:
+        return {"reads": self.reads, "writes": self.writes, "compactions": self.compactions,
+                "bars_written": self.bars_written, "removal_failures": self.removal_failures}
+
+
+bar_store = BarStore()
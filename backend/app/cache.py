@@ -0,0 +1,294 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Shared pool for stale-while-revalidate refreshes (kept small on purpose,
+# refreshes are I/O bound and coalesced per key anyway)
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+# All caches register here so one endpoint can report on every one of them
+_registry = {}
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "size")
+
+    def __init__(self, value, stored_at, size):
+        self.value = value
+        self.stored_at = stored_at
+        self.size = size
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with TTL, stale-while-revalidate and per-key request coalescing.
+
+    - Fresh entries (age < ttl) are returned directly.
+    - Stale entries (ttl <= age < ttl + stale_ttl) are returned immediately while
+      a single background refresh is scheduled.
+    - On a miss, the first caller runs the loader; concurrent callers for the same
+      key wait on that one load instead of hitting the upstream again.
+    - Bounded by max_entries and (optionally) max_bytes, evicting least recently used.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0.0, max_entries: int = 256,
+                 max_bytes: int = None, sizeof=None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.errors = 0
+
+        _registry[name] = self
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value for key, calling loader() at most once per key at a time.
+        Loader exceptions propagate to every caller waiting on that load.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        future = Future()
+                        self._inflight[key] = future
+                        self.refreshes += 1
+                        _refresh_pool.submit(self._refresh, key, loader, future)
+                    return entry.value
+                # Too old to serve at all
+                self._remove(key)
+
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+
+        if owner:
+            return self._load(key, loader, future)
+        return future.result()
+
+    def iter_many_or_load(self, keys, bulk_loader):
+        """
+        Batch version of get_or_load. Yields (key, value, error) as each key resolves:
+        cached keys first, then the ones loaded by a single bulk_loader(missing_keys) call
+        ({key: value}; keys it leaves out fail), then keys another caller was already loading.
+        Stale keys are served and refreshed together by one background bulk load. Closing the
+        generator before the bulk load starts hands that load to the background, so callers
+        waiting on those keys still get them.
+        """
+        now = time.monotonic()
+        cached, owned, waiting, refresh = [], {}, {}, {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    age = now - entry.stored_at
+                    if age < self.ttl:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        cached.append((key, entry.value))
+                        continue
+                    if age < self.ttl + self.stale_ttl:
+                        self._entries.move_to_end(key)
+                        self.stale_hits += 1
+                        cached.append((key, entry.value))
+                        if key not in self._inflight:
+                            future = Future()
+                            self._inflight[key] = future
+                            refresh[key] = future
+                            self.refreshes += 1
+                        continue
+                    self._remove(key)
+
+                future = self._inflight.get(key)
+                if future is None:
+                    future = Future()
+                    self._inflight[key] = future
+                    owned[key] = future
+                    self.misses += 1
+                else:
+                    waiting[key] = future
+                    self.coalesced += 1
+
+        if refresh:
+            _refresh_pool.submit(self._load_many, refresh, bulk_loader)
+
+        started = False
+        try:
+            for key, value in cached:
+                yield key, value, None
+            if owned:
+                started = True
+                yield from self._load_many(owned, bulk_loader)
+            for key, future in waiting.items():
+                try:
+                    yield key, future.result(), None
+                except Exception as e:
+                    yield key, None, e
+        finally:
+            if owned and not started:
+                # The caller stopped early (client gone, error mid-loop): the keys are in _inflight
+                _refresh_pool.submit(self._load_many, owned, bulk_loader)
+
+    def _load_many(self, futures, bulk_loader):
+        try:
+            loaded, failure = bulk_loader(list(futures)), None
+        except Exception as e:
+            print(f"Cache bulk load error ({self.name}): {e}")
+            loaded, failure = {}, e
+
+        results = []
+        for key, future in futures.items():
+            if key in loaded:
+                value, error = loaded[key], None
+                self.put(key, value)
+            else:
+                value, error = None, failure or LookupError(f"{key} missing from bulk load")
+            with self._lock:
+                self._inflight.pop(key, None)
+                if error is not None:
+                    self.errors += 1
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+            results.append((key, value, error))
+        return results
+
+    def _load(self, key, loader, future):
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.errors += 1
+            future.set_exception(e)
+            raise
+
+        self.put(key, value)
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def _refresh(self, key, loader, future):
+        try:
+            self._load(key, loader, future)
+        except Exception as e:
+            # Keep serving the stale copy, next stale hit will try again
+            print(f"Cache refresh error ({self.name}/{key}): {e}")
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, time.monotonic(), size)
+            self._bytes += size
+            self._evict()
+
+    def get(self, key):
+        """
+        Returns the value if it is fresh (age < ttl), else None. Counts as a hit or miss.
+        For callers that load on their own (e.g. async code that can't block on a loader).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            return None
+
+    def peek(self, key):
+        """
+        Returns the cached value regardless of age (or None) without touching stats or LRU order.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone is over the byte budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+                "in_flight": len(self._inflight),
+                "hit_ratio": round((self.hits + self.stale_hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def all_cache_stats() -> dict:
+    """
+    Stats for every registered cache, keyed by cache name.
+    """
+    return {name: c.stats() for name, c in _registry.items()}
@@ -0,0 +1,55 @@
+import os
+
+import httpx
+
+from .metrics import timed
+
+# Shared async HTTP client (connection pooling + keep-alive) for outbound downloads.
+# Created lazily on first use and closed from the app lifespan.
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+
+_client: httpx.AsyncClient = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=20),
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class ResponseTooLarge(ValueError):
+    pass
+
+
+async def download_bytes(url: str, max_bytes: int = None) -> bytes:
+    """
+    GETs url and returns the body. Raises on connection errors and non-2xx responses,
+    and with ResponseTooLarge as soon as the body is known to exceed max_bytes.
+    """
+    with timed("http.download", upstream="http_download"):
+        async with get_http_client().stream("GET", url) as response:
+            response.raise_for_status()
+            if max_bytes is not None:
+                length = response.headers.get("content-length")
+                if length and length.isdigit() and int(length) > max_bytes:
+                    raise ResponseTooLarge(f"Response too large ({length} bytes, max {max_bytes})")
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if max_bytes is not None and len(body) > max_bytes:
+                    raise ResponseTooLarge(f"Response too large (over {max_bytes} bytes)")
+            return bytes(body)
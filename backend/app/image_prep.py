@@ -0,0 +1,147 @@
+import io
+import os
+import threading
+from dataclasses import dataclass
+
+from .lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+# Preprocessing for chart images before they go to the vision model.
+#
+# Screenshots arrive at full resolution (often 4K PNGs). Models downscale internally anyway,
+# so shipping them as-is only costs upload bandwidth, memory and latency. This stage:
+#   - validates from the header alone (format, dimensions, byte size) before decoding anything,
+#   - caps the long side per analysis mode (detail-heavy modes keep more pixels),
+#   - re-encodes to a compact format, which also drops EXIF/ICC/text metadata.
+
+class ImageRejected(ValueError):
+    """
+    The input is not an image we accept (malformed, unsupported format, too large).
+    """
+
+ACCEPTED_FORMATS = {"PNG", "JPEG", "WEBP", "GIF", "BMP"}
+MAX_INPUT_BYTES = int(os.getenv("IMAGE_MAX_INPUT_BYTES", str(20 * 1024 * 1024)))
+MAX_INPUT_PIXELS = int(os.getenv("IMAGE_MAX_INPUT_PIXELS", str(50_000_000)))
+OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "WEBP").upper()
+OUTPUT_QUALITY = int(os.getenv("IMAGE_OUTPUT_QUALITY", "85"))
+
+DEFAULT_MAX_SIDE = 1536
+CHAT_MAX_SIDE = 1280
+# Wave counts and XABCD ratios depend on small swings, keep more detail there
+MODE_MAX_SIDE = {
+    "General Analysis": 1536,
+    "Trap Detector": 1536,
+    "Reversal Hunter": 1536,
+    "Momentum Scalp": 1280,
+    "Elliott Wave": 2048,
+    "Wyckoff Method": 1536,
+    "Harmonic Patterns": 2048,
+}
+
+MIME_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg", "PNG": "image/png"}
+
+_stats_lock = threading.Lock()
+_stats = {"images": 0, "rejected": 0, "resized": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data)
+
+    def blob(self) -> dict:
+        """
+        Inline blob for generate_content (passed through as-is, no re-encoding by the SDK).
+        """
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def max_side_for(mode: str) -> int:
+    return MODE_MAX_SIDE.get(mode, DEFAULT_MAX_SIDE)
+
+
+def _reject(message: str):
+    with _stats_lock:
+        _stats["rejected"] += 1
+    raise ImageRejected(message)
+
+
+def inspect_image(data: bytes):
+    """
+    Validates an image from its header only (nothing is decoded).
+    Returns the opened, still lazy PIL image. Raises ImageRejected.
+    """
+    if not data:
+        _reject("Empty image")
+    if len(data) > MAX_INPUT_BYTES:
+        _reject(f"Image too large ({len(data)} bytes, max {MAX_INPUT_BYTES})")
+    try:
+        image = Image.open(io.BytesIO(data))
+    except (Image.UnidentifiedImageError, OSError) as e:
+        _reject(f"Unreadable image: {e}")
+    if image.format not in ACCEPTED_FORMATS:
+        _reject(f"Unsupported image format: {image.format}")
+    width, height = image.size
+    if width <= 0 or height <= 0 or width * height > MAX_INPUT_PIXELS:
+        _reject(f"Image dimensions not accepted ({width}x{height}, max {MAX_INPUT_PIXELS} pixels)")
+    return image
+
+
+def prepare_image(data: bytes, max_side: int = DEFAULT_MAX_SIDE) -> PreparedImage:
+    """
+    Validates, downscales to max_side on the long edge and re-encodes without metadata.
+    """
+    image = inspect_image(data)
+    source_format = image.format
+    width, height = image.size
+    resize = max(width, height) > max_side
+
+    if resize and image.format == "JPEG":
+        # Let the JPEG decoder downscale by powers of two while decoding (far less memory)
+        image.draft("RGB", (max_side, max_side))
+
+    try:
+        image.load()
+    except Exception as e:
+        _reject(f"Malformed image data: {e}")
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Flatten transparency onto white, charts are rendered on light or opaque backgrounds
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    if resize:
+        image.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=2.0)
+
+    out = io.BytesIO()
+    image.save(out, format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY)
+    prepared = PreparedImage(out.getvalue(), MIME_TYPES.get(OUTPUT_FORMAT, "image/webp"),
+                             image.width, image.height, len(data))
+    if not resize and len(prepared.data) >= len(data) and source_format in MIME_TYPES:
+        # Already small and compact (e.g. a flat-colour PNG), re-encoding would only grow it
+        prepared = PreparedImage(data, MIME_TYPES[source_format], width, height, len(data))
+
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["resized"] += resize
+        _stats["bytes_in"] += len(data)
+        _stats["bytes_out"] += len(prepared.data)
+    return prepared
+
+
+def image_prep_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+    return stats
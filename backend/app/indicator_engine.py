@@ -0,0 +1,407 @@
+import math
+import os
+import threading
+from collections import deque
+
+import numpy as np
+
+from .analysis_engine import summarize_indicators
+from .cache import TTLCache
+from .metrics import timed
+
+# Stateful, per-ticker indicator engine.
+#
+# Mirrors calculate_technical_indicators (same windows, same `ta` semantics incl.
+# min_periods / NaN warm-up) but keeps rolling state so a poll that only revised
+# the last candle, or appended a few new ones, costs O(1) per bar instead of a
+# full recomputation.
+#
+# Every component keeps state for the *committed* bars (all but the last) and
+# evaluates the last, still-forming bar on top of that state without mutating it.
+# Revising the last bar is therefore free; appending a bar commits the previous one.
+
+NAN = float("nan")
+
+
+class _EMA:
+    """
+    pandas ewm(adjust=False, min_periods=...) over the committed values.
+    """
+    __slots__ = ("alpha", "min_periods", "value", "count")
+
+    def __init__(self, alpha: float, min_periods: int):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = NAN
+        self.count = 0
+
+    def _next(self, x):
+        if self.count == 0:
+            return x
+        return (1 - self.alpha) * self.value + self.alpha * x
+
+    def peek(self, x):
+        return self._next(x) if self.count + 1 >= self.min_periods else NAN
+
+    def push(self, x):
+        self.value = self._next(x)
+        self.count += 1
+
+
+class _RollingStats:
+    """
+    Rolling mean / population std over `window` values (the last window-1 committed + current).
+    Sums are shifted by the first value seen to keep the variance numerically stable,
+    and resynced from the window every `window` commits so drift can't accumulate.
+    """
+    __slots__ = ("window", "values", "shift", "s1", "s2", "pushes")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.shift = None
+        self.s1 = 0.0
+        self.s2 = 0.0
+        self.pushes = 0
+
+    def _sums(self, x):
+        d = x - (self.shift if self.shift is not None else x)
+        return self.s1 + d, self.s2 + d * d
+
+    def mean(self, x):
+        if len(self.values) + 1 < self.window:
+            return NAN
+        s1, _ = self._sums(x)
+        return (self.shift if self.shift is not None else x) + s1 / self.window
+
+    def std(self, x):
+        if len(self.values) + 1 < self.window:
+            return NAN
+        s1, s2 = self._sums(x)
+        n = self.window
+        return math.sqrt(max((s2 - s1 * s1 / n) / n, 0.0))
+
+    def push(self, x):
+        if self.window <= 1:
+            return
+        if self.shift is None:
+            self.shift = x
+        d = x - self.shift
+        self.values.append(d)
+        self.s1 += d
+        self.s2 += d * d
+        if len(self.values) > self.window - 1:
+            old = self.values.popleft()
+            self.s1 -= old
+            self.s2 -= old * old
+        self.pushes += 1
+        if self.pushes % self.window == 0:
+            self.s1 = math.fsum(self.values)
+            self.s2 = math.fsum(v * v for v in self.values)
+
+
+class _RollingExtreme:
+    """
+    Rolling max (or min) over `window` values via a monotonic deque of committed (index, value) pairs.
+    """
+    __slots__ = ("window", "is_max", "items", "index")
+
+    def __init__(self, window: int, is_max: bool):
+        self.window = window
+        self.is_max = is_max
+        self.items = deque()
+        self.index = -1
+
+    def peek(self, x):
+        if not self.items:
+            return x
+        front = self.items[0][1]
+        return max(front, x) if self.is_max else min(front, x)
+
+    def push(self, x):
+        self.index += 1
+        items = self.items
+        if self.is_max:
+            while items and items[-1][1] <= x:
+                items.pop()
+        else:
+            while items and items[-1][1] >= x:
+                items.pop()
+        items.append((self.index, x))
+        while items and items[0][0] <= self.index - (self.window - 1):
+            items.popleft()
+
+
+class IndicatorEngine:
+    """
+    Incremental equivalent of calculate_technical_indicators for one price series.
+    Feed it bars with append()/revise() (or a whole DataFrame with sync()) and
+    read summary(), which returns the same dict as calculate_technical_indicators.
+    """
+
+    RSI_WINDOW = 14
+    ATR_WINDOW = 14
+    FIB_LOOKBACK = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.committed = 0          # bars folded into the rolling state
+        self.bar = None             # last (still-forming) bar: (open, high, low, close, volume)
+        self.prev = None            # last committed bar
+        self.first_date = None
+        self.last_date = None
+        self._synced_df = None
+        self._summary = None
+
+        self.rsi_up = _EMA(1 / self.RSI_WINDOW, self.RSI_WINDOW)
+        self.rsi_down = _EMA(1 / self.RSI_WINDOW, self.RSI_WINDOW)
+        self.ema_fast = _EMA(2 / (12 + 1), 12)
+        self.ema_slow = _EMA(2 / (26 + 1), 26)
+        self.macd_sig = _EMA(2 / (9 + 1), 9)
+        self.ema_20 = _EMA(2 / (20 + 1), 20)
+        self.bb = _RollingStats(20)
+        self.sma_50 = _RollingStats(50)
+        self.sma_200 = _RollingStats(200)
+        self.high_9, self.low_9 = _RollingExtreme(9, True), _RollingExtreme(9, False)
+        self.high_26, self.low_26 = _RollingExtreme(26, True), _RollingExtreme(26, False)
+        self.high_52, self.low_52 = _RollingExtreme(52, True), _RollingExtreme(52, False)
+        self.high_fib = _RollingExtreme(self.FIB_LOOKBACK, True)
+        self.low_fib = _RollingExtreme(self.FIB_LOOKBACK, False)
+        self.obv = 0.0
+        self.atr = 0.0
+        self.tr_sum = 0.0
+
+    # --- bar updates ---
+
+    def append(self, bar, date=None):
+        if self.bar is not None:
+            self._commit(self.bar)
+        if self.first_date is None:
+            self.first_date = date
+        self.bar = tuple(float(v) for v in bar)
+        self.last_date = date
+        self._summary = None
+
+    def revise(self, bar):
+        """
+        Replaces the last bar (e.g. the intraday candle moved).
+        """
+        if self.bar is None:
+            raise ValueError("No bar to revise")
+        self.bar = tuple(float(v) for v in bar)
+        self._summary = None
+
+    def __len__(self):
+        return self.committed + (self.bar is not None)
+
+    def _true_range(self, high, low):
+        if self.prev is None:
+            return high - low
+        prev_close = self.prev[3]
+        return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+    def _rsi_moves(self, close):
+        if self.prev is None:
+            return 0.0, 0.0
+        diff = close - self.prev[3]
+        return (diff if diff > 0 else 0.0), (-diff if diff < 0 else 0.0)
+
+    def _atr(self, tr):
+        i, n = self.committed, self.ATR_WINDOW
+        if i < n - 1:
+            return 0.0
+        if i == n - 1:
+            return (self.tr_sum + tr) / n
+        return (self.atr * (n - 1) + tr) / n
+
+    def _commit(self, bar):
+        open_, high, low, close, volume = bar
+
+        up, down = self._rsi_moves(close)
+        self.rsi_up.push(up)
+        self.rsi_down.push(down)
+
+        self.ema_fast.push(close)
+        self.ema_slow.push(close)
+        if self.ema_slow.count >= self.ema_slow.min_periods:
+            self.macd_sig.push(self.ema_fast.value - self.ema_slow.value)
+        self.ema_20.push(close)
+
+        for stats in (self.bb, self.sma_50, self.sma_200):
+            stats.push(close)
+        for ext in (self.high_9, self.high_26, self.high_52, self.high_fib):
+            ext.push(high)
+        for ext in (self.low_9, self.low_26, self.low_52, self.low_fib):
+            ext.push(low)
+
+        if self.prev is not None and close < self.prev[3]:
+            self.obv -= volume
+        else:
+            self.obv += volume
+
+        tr = self._true_range(high, low)
+        self.atr = self._atr(tr)
+        if self.committed < self.ATR_WINDOW:
+            self.tr_sum += tr
+
+        self.prev = bar
+        self.committed += 1
+
+    # --- outputs ---
+
+    def latest(self) -> dict:
+        """
+        Indicator values for the last bar, keyed like the DataFrame columns
+        calculate_technical_indicators writes.
+        """
+        if self.bar is None:
+            return {}
+        open_, high, low, close, volume = self.bar
+
+        up, down = self._rsi_moves(close)
+        avg_up, avg_down = self.rsi_up.peek(up), self.rsi_down.peek(down)
+        if avg_down == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + avg_up / avg_down))
+
+        slow = self.ema_slow.peek(close)
+        macd = self.ema_fast._next(close) - slow if not math.isnan(slow) else NAN
+        macd_signal = self.macd_sig.peek(macd) if not math.isnan(macd) else NAN
+
+        bb_mid = self.bb.mean(close)
+        bb_std = self.bb.std(close)
+
+        count = self.committed + 1
+        conv = 0.5 * (self.high_9.peek(high) + self.low_9.peek(low)) if count >= 9 else NAN
+        base = 0.5 * (self.high_26.peek(high) + self.low_26.peek(low)) if count >= 26 else NAN
+
+        if self.prev is not None and close < self.prev[3]:
+            obv = self.obv - volume
+        else:
+            obv = self.obv + volume
+
+        body_size = abs(open_ - close)
+        lower_wick = min(open_, close) - low
+        upper_wick = high - max(open_, close)
+        if self.prev is not None:
+            prev_open, prev_close = self.prev[0], self.prev[3]
+            bullish_engulfing = (prev_close < prev_open) and (close > open_) and \
+                                (open_ < prev_close) and (close > prev_open)
+        else:
+            bullish_engulfing = False
+
+        # np.float64 so the summary behaves like a DataFrame row (NaN/zero-division semantics)
+        f = np.float64
+        return {
+            "close": f(close),
+            "rsi": f(rsi),
+            "macd": f(macd),
+            "macd_signal": f(macd_signal),
+            "bb_high": f(bb_mid + 2 * bb_std),
+            "bb_low": f(bb_mid - 2 * bb_std),
+            "bb_mid": f(bb_mid),
+            "sma_50": f(self.sma_50.mean(close)),
+            "sma_200": f(self.sma_200.mean(close)),
+            "ema_20": f(self.ema_20.peek(close)),
+            "ichimoku_conversion_line": f(conv),
+            "ichimoku_base_line": f(base),
+            "ichimoku_a": f(0.5 * (conv + base)),
+            "ichimoku_b": f(0.5 * (self.high_52.peek(high) + self.low_52.peek(low))),
+            "obv": f(obv),
+            "atr": f(self._atr(self._true_range(high, low))),
+            "doji": body_size <= (high - low) * 0.1,
+            "hammer": (lower_wick > 2 * body_size) and (upper_wick < body_size),
+            "bullish_engulfing": bullish_engulfing,
+        }
+
+    def summary(self) -> dict:
+        if self.bar is None:
+            return {}
+        if self._summary is None:
+            high, low = self.bar[1], self.bar[2]
+            recent_high = np.float64(self.high_fib.peek(high))
+            recent_low = np.float64(self.low_fib.peek(low))
+            self._summary = summarize_indicators(self.latest(), recent_high, recent_low)
+        return self._summary
+
+    # --- DataFrame reconciliation ---
+
+    def sync(self, df) -> dict:
+        """
+        Brings the state in line with df (columns: date + OHLCV) and returns summary().
+        Only the revised last bar and any new bars are processed when df extends what
+        was seen before; if history changed underneath (window slid, backfill), rebuilds:
+        the warm-up of every indicator starts at the first bar of the window.
+        """
+        if df is self._synced_df and self._summary is not None:
+            return self._summary
+        if not sync_bars(self, df, anchored=True):
+            return {}
+        return self.summary()
+
+
+def sync_bars(state, df, anchored: bool = False) -> bool:
+    """
+    Feeds df (columns: date + OHLCV) to a bar-by-bar state (IndicatorEngine, OnlineForecaster).
+    Aligned on the last bar the state has seen: when df still holds it, with an unchanged
+    close before it, only that bar (revised) and the ones after it are processed, wherever
+    the window now starts. Otherwise the state is rebuilt from df. `anchored` states depend
+    on where the window starts, so for them a window with another first bar also rebuilds.
+    Returns False (and resets) for an empty df.
+    """
+    n = len(df)
+    if n == 0:
+        state.reset()
+        return False
+
+    dates = df['date']
+    known = len(state)
+    start = None
+    if known and (not anchored or dates.iat[0] == state.first_date):
+        # Period-bounded frames keep their last bar at known - 1 only while the start is fixed
+        start = known - 1 if known <= n and dates.iat[known - 1] == state.last_date \
+            else int(dates.searchsorted(state.last_date))
+        if start >= n or dates.iat[start] != state.last_date \
+                or (anchored and start != known - 1) \
+                or (state.prev is not None and (start == 0 or df['close'].iat[start - 1] != state.prev[3])):
+            start = None
+    if start is None:
+        state.reset()
+        start = 0
+
+    bars = df[['open', 'high', 'low', 'close', 'volume']].iloc[start:].to_numpy(dtype='float64')
+    new_dates = dates.iloc[start:].tolist()
+    for i, bar in enumerate(bars):
+        if i == 0 and state.bar is not None:
+            if tuple(bar) != state.bar:
+                state.revise(bar)
+        else:
+            state.append(bar, new_dates[i])
+
+    state._synced_df = df
+    return True
+
+
+# One engine per ticker/period/interval; idle engines age out and get rebuilt on next use
+ENGINE_TTL = int(os.getenv("INDICATOR_ENGINE_TTL", "3600"))
+ENGINE_MAX_ENTRIES = int(os.getenv("INDICATOR_ENGINE_MAX_ENTRIES", "512"))
+
+engines = TTLCache("indicator_engines", ttl=ENGINE_TTL, max_entries=ENGINE_MAX_ENTRIES)
+
+
+def latest_indicators(result) -> dict:
+    """
+    Indicator summary for a MarketData result, updated incrementally from the
+    previous call for the same ticker/period/interval.
+    Same output as calculate_technical_indicators(result.df.copy()).
+    """
+    if result.df.empty:
+        return {}
+    key = f"{result.ticker}_{result.period}_{result.interval}"
+    engine = engines.get_or_load(key, IndicatorEngine)
+    with timed("indicators"), engine.lock:
+        return engine.sync(result.df)
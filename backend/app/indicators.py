@@ -0,0 +1,230 @@
+import numpy as np
+
+from .lazy import lazy_import
+
+# Vectorized indicator kernels.
+#
+# Drop-in replacements for the `ta` objects calculate_technical_indicators used to build
+# (same windows, same min_periods / NaN warm-up, same seeding), working on contiguous
+# float64 arrays. Every kernel takes an optional preallocated `out` (or tuple of outs)
+# and returns it, so a caller can compute everything into one block without temporaries.
+# Recursive filters (EMA / Wilder smoothing) run through scipy's lfilter, rolling
+# extremes through the O(n) ndimage filters. scipy is imported on the first kernel call.
+
+scipy_ndimage = lazy_import("scipy.ndimage")
+scipy_signal = lazy_import("scipy.signal")
+
+_STD_CHUNK = 1 << 16
+
+
+def as_array(values) -> np.ndarray:
+    """
+    Contiguous float64 view/copy of a Series, list or array.
+    """
+    return np.ascontiguousarray(getattr(values, "values", values), dtype=np.float64)
+
+
+def _out(out, n):
+    return np.empty(n, dtype=np.float64) if out is None else out
+
+
+def ema(x, span: int = None, alpha: float = None, min_periods: int = 0, out=None):
+    """
+    pandas x.ewm(span|alpha, min_periods, adjust=False).mean().
+    Leading NaNs are skipped (the average starts at the first valid value).
+    """
+    x = as_array(x)
+    out = _out(out, len(x))
+    if alpha is None:
+        alpha = 2.0 / (span + 1)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) == 0:
+        out[:] = np.nan
+        return out
+    start = valid[0]
+    out[:start] = np.nan
+    # y[t] = alpha * x[t] + (1 - alpha) * y[t-1], seeded so that y[start] = x[start]
+    seg, _ = scipy_signal.lfilter([alpha], [1.0, alpha - 1.0], x[start:], zi=[(1.0 - alpha) * x[start]])
+    out[start:] = seg
+    out[start:start + max(min_periods - 1, 0)] = np.nan
+    return out
+
+
+def sma(x, window: int, out=None):
+    """
+    Rolling mean with min_periods=window (x.rolling(window).mean()).
+    """
+    x = as_array(x)
+    out = _out(out, len(x))
+    out[:] = np.nan
+    if len(x) < window:
+        return out
+    # Cumulative sums of x - x[0] keep the magnitude (and the rounding error) small
+    c = np.cumsum(x - x[0])
+    out[window - 1] = c[window - 1]
+    np.subtract(c[window:], c[:-window], out=out[window:])
+    out[window - 1:] /= window
+    out[window - 1:] += x[0]
+    return out
+
+
+def rolling_std(x, window: int, out=None):
+    """
+    Rolling population std (ddof=0) with min_periods=window.
+    """
+    x = as_array(x)
+    out = _out(out, len(x))
+    out[:] = np.nan
+    if len(x) < window:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(x, window)
+    # np.std materializes (rows, window) temporaries, so go in chunks to cap memory
+    for start in range(0, len(windows), _STD_CHUNK):
+        stop = start + _STD_CHUNK
+        np.std(windows[start:stop], axis=1, out=out[window - 1 + start:window - 1 + stop])
+    return out
+
+
+def rolling_max(x, window: int, min_periods: int = None, out=None):
+    """
+    Trailing rolling max; min_periods defaults to window (NaN warm-up).
+    """
+    return _rolling_extreme(scipy_ndimage.maximum_filter1d, x, window, min_periods, out)
+
+
+def rolling_min(x, window: int, min_periods: int = None, out=None):
+    """
+    Trailing rolling min; min_periods defaults to window (NaN warm-up).
+    """
+    return _rolling_extreme(scipy_ndimage.minimum_filter1d, x, window, min_periods, out)
+
+
+def _rolling_extreme(fn, x, window, min_periods, out):
+    x = as_array(x)
+    out = _out(out, len(x))
+    if len(x) == 0:
+        return out
+    # origin shifts the centered filter so out[i] covers x[i - window + 1 : i + 1];
+    # 'nearest' padding repeats x[0], which is already inside every warm-up window
+    fn(x, window, output=out, mode="nearest", origin=(window - 1) // 2)
+    if min_periods is None:
+        min_periods = window
+    out[:max(min_periods - 1, 0)] = np.nan
+    return out
+
+
+def rsi(close, window: int = 14, out=None):
+    """
+    ta RSIIndicator: Wilder smoothing (alpha=1/window) of up/down moves, 100 when no down moves.
+    """
+    close = as_array(close)
+    n = len(close)
+    out = _out(out, n)
+    if n == 0:
+        return out
+    diff = np.empty(n)
+    diff[0] = 0.0
+    np.subtract(close[1:], close[:-1], out=diff[1:])
+    up = ema(np.maximum(diff, 0.0), alpha=1.0 / window, min_periods=window)
+    down = ema(np.maximum(-diff, 0.0), alpha=1.0 / window, min_periods=window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(100.0, 1.0 + up / down, out=out)
+    np.subtract(100.0, out, out=out)
+    out[down == 0] = 100.0
+    return out
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9, out=None):
+    """
+    ta MACD: returns (macd, macd_signal, macd_diff).
+    """
+    close = as_array(close)
+    n = len(close)
+    line, sig, diff = out if out is not None else (np.empty(n), np.empty(n), np.empty(n))
+    ema(close, span=fast, min_periods=fast, out=line)
+    np.subtract(line, ema(close, span=slow, min_periods=slow, out=diff), out=line)
+    ema(line, span=signal, min_periods=signal, out=sig)
+    np.subtract(line, sig, out=diff)
+    return line, sig, diff
+
+
+def bollinger(close, window: int = 20, window_dev: float = 2, out=None):
+    """
+    ta BollingerBands: returns (high band, low band, moving average).
+    """
+    close = as_array(close)
+    n = len(close)
+    hband, lband, mavg = out if out is not None else (np.empty(n), np.empty(n), np.empty(n))
+    sma(close, window, out=mavg)
+    rolling_std(close, window, out=lband)
+    lband *= window_dev
+    np.add(mavg, lband, out=hband)
+    np.subtract(mavg, lband, out=lband)
+    return hband, lband, mavg
+
+
+def ichimoku(high, low, window1: int = 9, window2: int = 26, window3: int = 52, out=None):
+    """
+    ta IchimokuIndicator (visual=False): returns (span a, span b, base line, conversion line).
+    Span b uses min_periods=0 like ta does.
+    """
+    high, low = as_array(high), as_array(low)
+    n = len(high)
+    span_a, span_b, base, conv = out if out is not None else tuple(np.empty(n) for _ in range(4))
+    tmp = np.empty(n)
+
+    np.add(rolling_max(high, window1, out=conv), rolling_min(low, window1, out=tmp), out=conv)
+    conv *= 0.5
+    np.add(rolling_max(high, window2, out=base), rolling_min(low, window2, out=tmp), out=base)
+    base *= 0.5
+    np.add(conv, base, out=span_a)
+    span_a *= 0.5
+    np.add(rolling_max(high, window3, min_periods=0, out=span_b),
+           rolling_min(low, window3, min_periods=0, out=tmp), out=span_b)
+    span_b *= 0.5
+    return span_a, span_b, base, conv
+
+
+def obv(close, volume, out=None):
+    """
+    ta OnBalanceVolumeIndicator: cumulative volume, signed by close-to-close direction.
+    """
+    close, volume = as_array(close), as_array(volume)
+    out = _out(out, len(close))
+    np.copyto(out, volume)
+    down = np.zeros(len(close), dtype=bool)
+    np.less(close[1:], close[:-1], out=down[1:])
+    np.negative(out, out=out, where=down)
+    np.cumsum(out, out=out)
+    return out
+
+
+def true_range(high, low, close, out=None):
+    high, low, close = as_array(high), as_array(low), as_array(close)
+    n = len(close)
+    out = _out(out, n)
+    np.subtract(high, low, out=out)
+    if n > 1:
+        prev_close = close[:-1]
+        np.maximum(out[1:], np.abs(high[1:] - prev_close), out=out[1:])
+        np.maximum(out[1:], np.abs(low[1:] - prev_close), out=out[1:])
+    return out
+
+
+def atr(high, low, close, window: int = 14, out=None):
+    """
+    ta AverageTrueRange: zeros during warm-up, seeded with the mean of the first
+    `window` true ranges, then Wilder-smoothed.
+    """
+    tr = true_range(high, low, close)
+    n = len(tr)
+    out = _out(out, n)
+    out[:window - 1] = 0.0
+    if n < window:
+        return out
+    alpha = 1.0 / window
+    seed = tr[:window].mean()
+    out[window - 1] = seed
+    if n > window:
+        out[window:], _ = scipy_signal.lfilter([alpha], [1.0, alpha - 1.0], tr[window:], zi=[(1.0 - alpha) * seed])
+    return out
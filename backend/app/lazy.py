@@ -0,0 +1,113 @@
+import importlib
+import os
+import threading
+import time
+
+# Deferred imports and clients.
+#
+# The provider SDKs (yfinance, google.generativeai, supabase, newsapi) and the heavy libraries
+# (scikit-learn, scipy, PIL) cost seconds and hundreds of MB to import, and most requests never
+# touch most of them: the health check touches none. A Lazy stands in for the module or client
+# and builds it on first attribute access, so a worker only pays for what its traffic uses.
+#
+#   yf = lazy_import("yfinance")                                 # imported on first yf.Ticker(...)
+#   client = Lazy(lambda: create_client(url, key), "supabase")   # connected on first use
+#
+# After loading, every attribute read is cached on the proxy, so the steady-state cost is a plain
+# attribute lookup. loaded() lists what was loaded when and how long it took (startup profile).
+#
+# LAZY_PREWARM names modules to load on a background thread once the server is up, so the
+# first request that needs them doesn't pay the import (by default the scipy kernels behind
+# the indicators, backtests, pattern scans and the screener). Empty disables it.
+
+LAZY_PREWARM = [name.strip() for name in os.getenv("LAZY_PREWARM", "scipy.signal,scipy.ndimage").split(",")
+                if name.strip()]
+
+_loaded = {}   # name -> {"seconds", "at"} (at: seconds since process start)
+_modules = {}  # name -> Lazy, for lazy_import()
+_started_at = time.time()
+
+
+class Lazy:
+    """
+    Proxy for the object `loader()` returns, built on first attribute access.
+    """
+
+    def __init__(self, loader, name: str):
+        self._loader = loader
+        self._name = name
+        self._target = None
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._target is None:
+                start = time.perf_counter()
+                target = self._loader()
+                for hook in self._hooks:
+                    hook(target)
+                _loaded[self._name] = {"seconds": round(time.perf_counter() - start, 4),
+                                       "at": round(time.time() - _started_at, 3)}
+                self._target = target
+        return self._target
+
+    def __getattr__(self, attr):
+        # Only reached for attributes not on the proxy yet
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        value = getattr(self._load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    def when_loaded(self, hook):
+        """
+        Runs hook(target) once the target exists (right away if it already does).
+        """
+        with self._lock:
+            if self._target is None:
+                self._hooks.append(hook)
+                return
+        hook(self._target)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._target is not None
+
+    def __repr__(self):
+        return f"<Lazy {self._name} ({'loaded' if self.is_loaded else 'not loaded'})>"
+
+
+def lazy_import(name: str) -> Lazy:
+    # One proxy per module, so every importer shares the loaded state
+    if name not in _modules:
+        _modules[name] = Lazy(lambda: importlib.import_module(name), name)
+    return _modules[name]
+
+
+def _prewarm(names):
+    for name in names:
+        try:
+            if name in _modules:
+                _modules[name]._load()
+            else:
+                importlib.import_module(name)
+        except Exception as e:
+            print(f"Prewarm error ({name}): {e}")
+
+
+def prewarm(names=None) -> threading.Thread:
+    """
+    Loads the named modules (default LAZY_PREWARM) on a daemon thread.
+    """
+    thread = threading.Thread(target=_prewarm, args=(LAZY_PREWARM if names is None else names,),
+                              name="lazy-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def loaded() -> dict:
+    """
+    What was loaded lazily so far: {name: {"seconds": import/build time, "at": seconds after start}}.
+    """
+    return dict(_loaded)
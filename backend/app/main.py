@@ -1,17 +1,35 @@
-
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-import requests
+import asyncio
 import json
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Import our modules
-from .market_data import get_market_data, get_news, init_news_api
-from .strategy_engine import analyze_chart, init_gemini
-from .analysis_engine import calculate_technical_indicators, train_and_predict
+from .market_data import fetch_market_data, iter_market_data_batch, get_news, init_news_api
+from .strategy_engine import analyze_chart_async, chat_with_ai_async, init_gemini
+from .indicator_engine import latest_indicators
+from .model_registry import FORECAST_MODES, get_forecast, registry as forecast_registry
+from .cache import all_cache_stats
+from .lazy import Lazy, loaded as lazy_loaded, prewarm
+from .http_client import ResponseTooLarge, close_http_client, download_bytes
+from .image_prep import MAX_INPUT_BYTES, ImageRejected, image_prep_stats, inspect_image
+from .write_behind import WriteBehindQueue
+from .news_store import news_store_stats
+from .streaming import hub as stream_hub
+from .bar_store import bar_store
+from .resample import fetch_timeframes, plan_fetches
+from .backtest import BACKTEST_MAX_RUNS, PERIODS_PER_YEAR, buy_and_hold, parameter_grid
+from .analytics_pool import PoolSaturated, analytics_pool, backtest as backtest_task
+from .screener import SCREENER_MAX_TICKERS, SCREENER_PERIOD, get_screen
+from .payload import FormatUnavailable, negotiate_encoding, negotiate_format, payload_stats, render as render_payload
+from .patterns import PATTERN_ORDER, pattern_names, recent_patterns, scan as scan_patterns
+from .metrics import MetricsMiddleware, render_metrics, timed
 
 # Load environment variables
 load_dotenv()
@@ -27,15 +45,51 @@ if NEWS_API_KEY:
 if GEMINI_API_KEY:
     init_gemini(GEMINI_API_KEY)
 
-# Initialize Supabase
-supabase: Client = None
-if SUPABASE_URL and SUPABASE_KEY:
+# Initialize Supabase (the SDK is imported and the client built on the first insert, see lazy.py)
+def _supabase_client():
+    from supabase import create_client
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return create_client(SUPABASE_URL, SUPABASE_KEY)
     except Exception as e:
         print(f"Supabase Init Error: {e}")
+        raise
+
+supabase: Lazy = None
+if SUPABASE_URL and SUPABASE_KEY:
+    supabase = Lazy(_supabase_client, "supabase")
+
+# analysis_history inserts are written behind the response (batched, retried, spilled to disk)
+history_writer: WriteBehindQueue = None
+if supabase:
+    history_writer = WriteBehindQueue(
+        supabase,
+        "analysis_history",
+        batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "50")),
+        flush_interval=int(os.getenv("HISTORY_FLUSH_MS", "500")) / 1000,
+        max_queue=int(os.getenv("HISTORY_QUEUE_SIZE", "10000")),
+        spill_path=os.getenv("HISTORY_SPILL_PATH", "analysis_history_spill.jsonl"),
+    )
+
+# Worker threads for blocking calls made through asyncio.to_thread (provider fetches,
+# indicators, forecasts); the interpreter default is only min(32, CPUs + 4)
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "40"))
 
-app = FastAPI(title="TradeMind API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking"))
+    if history_writer:
+        history_writer.start()
+    analytics_pool.start()
+    prewarm()
+    yield
+    await stream_hub.close()
+    await close_http_client()
+    if history_writer:
+        await asyncio.to_thread(history_writer.close)
+    await asyncio.to_thread(analytics_pool.shutdown)
+
+app = FastAPI(title="TradeMind API", lifespan=lifespan)
 
 origins = ["*"]
 
@@ -45,7 +99,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Per-route latency, in-flight requests and the opt-in Server-Timing breakdown (see metrics.py)
+app.add_middleware(MetricsMiddleware)
 
 class AnalyzeRequest(BaseModel):
     image_url: str
@@ -56,47 +113,398 @@ class AnalyzeRequest(BaseModel):
 def read_root():
     return {"message": "TradeMind Backend is Running"}
 
+@app.get("/api/cache/stats")
+def cache_stats_endpoint():
+    """
+    Hit/miss/eviction counters for the in-memory caches.
+    """
+    stats = all_cache_stats()
+    stats["forecast_models"] = forecast_registry.stats()
+    stats["analytics_pool"] = analytics_pool.stats()
+    if history_writer:
+        stats["analysis_history_writer"] = history_writer.stats()
+    stats["image_preprocessing"] = image_prep_stats()
+    stats["news_provider_budgets"] = news_store_stats()
+    stats["market_streams"] = stream_hub.stats()
+    stats["bar_store"] = bar_store.stats()
+    stats["lazy_imports"] = lazy_loaded()
+    stats["market_data_payloads"] = payload_stats()
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """
+    Stage latency histograms, upstream errors, request gauges and cache counters
+    in the Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Per-stage budgets (seconds) for /api/market-data; a stage that runs over is left out of the
+# response (listed under "partial") instead of holding up the rest
+PRICE_STAGE_TIMEOUT = float(os.getenv("MARKET_PRICE_TIMEOUT", "10"))
+NEWS_STAGE_TIMEOUT = float(os.getenv("MARKET_NEWS_TIMEOUT", "5"))
+INDICATORS_STAGE_TIMEOUT = float(os.getenv("MARKET_INDICATORS_TIMEOUT", "5"))
+FORECAST_STAGE_TIMEOUT = float(os.getenv("MARKET_FORECAST_TIMEOUT", "12"))
+
+async def _stage(name: str, call, timeout: float, default, partial: list):
+    """
+    Runs a blocking stage in a worker thread, bounded by timeout.
+    On timeout the thread still finishes in the background (and fills the caches
+    for the next request); this request gets `default` and the stage is listed in `partial`.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(call), timeout)
+    except asyncio.TimeoutError:
+        print(f"Market data stage '{name}' timed out after {timeout}s")
+    except Exception as e:
+        print(f"Market data stage '{name}' error: {e}")
+    partial.append(name)
+    return default
+
 @app.get("/api/market-data/{ticker}")
-def market_data_endpoint(ticker: str):
+async def market_data_endpoint(request: Request, ticker: str, forecast_model: str = None,
+                               response_format: str = Query(None, alias="format")):
     """
     Returns price history, news, and technical analysis for a ticker.
+    Price and news are fetched concurrently; indicators and forecast start as soon
+    as the price data arrives, so latency is the slowest stage, not the sum.
+    `forecast_model` (forest | online | both) overrides the ticker's configured forecast mode.
+    The body is JSON unless the Accept header or `format` (json | columnar | msgpack) asks
+    for a compact encoding; it is compressed per Accept-Encoding (see payload.py).
     """
+    if forecast_model is not None and forecast_model not in FORECAST_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown forecast_model (one of {', '.join(FORECAST_MODES)})")
+    try:
+        fmt = negotiate_format(request.headers.get("accept"), response_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FormatUnavailable as e:
+        raise HTTPException(status_code=406, detail=str(e))
     # Sanitize ticker (remove $ if present)
     ticker = ticker.replace("$", "").upper()
+    partial = []
 
-    # 1. Get DataFrame for analysis
-    df = get_market_data(ticker, return_df=True)
-    
-    # 2. Get Price Data for Charts
-    price_data = get_market_data(ticker, return_df=False) # Use cached version
-    
-    # 2. Get News & Sentiment
-    news_data = get_news(ticker)
-    news = news_data['news']
-    news_sentiment = {
-        "score": news_data['sentiment_score'],
-        "mood": news_data['market_mood']
-    }
+    # 2. News & Sentiment, started first: it doesn't depend on the price data
+    news_task = asyncio.create_task(_stage(
+        "news", lambda: get_news(ticker), NEWS_STAGE_TIMEOUT,
+        {"news": [], "sentiment_score": 0, "market_mood": "Neutral"}, partial))
 
-    # 3. Calculate Indicators
-    indicators = {}
-    if not df.empty:
-        indicators = calculate_technical_indicators(df)
-    
-    # 4. ML Prediction
-    forecast = {}
-    if not df.empty:
-        forecast = train_and_predict(df)
+    # 1. Get DataFrame + chart payload (one fetch, shared via cache)
+    result = await _stage("price", lambda: fetch_market_data(ticker), PRICE_STAGE_TIMEOUT, None, partial)
 
-    return {
+    indicators, forecast = {}, {}
+    if result is not None:
+        # 3. Indicators (incremental) and 4. ML Prediction (registry, refits in the background), in parallel
+        indicators, forecast = await asyncio.gather(
+            _stage("indicators", lambda: latest_indicators(result), INDICATORS_STAGE_TIMEOUT, {}, partial),
+            _stage("forecast", lambda: get_forecast(result, forecast_model), FORECAST_STAGE_TIMEOUT, {}, partial),
+        )
+    news_data = await news_task
+
+    price_data = result.chart if result is not None else []
+    response = {
         "ticker": ticker,
-        "price": price_data[0]['close'] if price_data else 0,
+        "price": price_data[-1]['close'] if price_data else 0,
         "market_data": price_data,
-        "news": news,
-        "news_sentiment": news_sentiment,
+        "news": news_data['news'],
+        "news_sentiment": {
+            "score": news_data['sentiment_score'],
+            "mood": news_data['market_mood']
+        },
         "indicators": indicators,
         "forecast": forecast
     }
+    if partial:
+        response["partial"] = partial
+    return render_payload(response, fmt, negotiate_encoding(request.headers.get("accept-encoding")), result)
+
+MAX_TIMEFRAMES = 8
+
+@app.get("/api/market-data/{ticker}/timeframes")
+def market_timeframes_endpoint(ticker: str, intervals: str = "1h,4h,1d", period: str = "1mo",
+                               include_history: bool = False):
+    """
+    Indicators for several timeframes of one ticker (intervals is comma-separated).
+    Each base interval is fetched once and coarser bars are resampled from it (see resample.py).
+    """
+    ticker = ticker.replace("$", "").upper()
+    requested = [iv.strip() for iv in intervals.split(",") if iv.strip()]
+    if not requested or len(requested) > MAX_TIMEFRAMES:
+        raise HTTPException(status_code=400, detail=f"Give 1 to {MAX_TIMEFRAMES} intervals")
+    try:
+        plan = plan_fetches(requested, period)
+        results = fetch_timeframes(ticker, requested, period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    timeframes = {}
+    for interval, result in results.items():
+        item = {
+            "base_interval": plan[interval],
+            "bars": len(result.df),
+            "price": result.chart[-1]['close'] if result.chart else 0,
+            "indicators": latest_indicators(result),
+            "is_mock": result.is_mock,
+        }
+        if include_history:
+            item["market_data"] = result.chart
+        timeframes[interval] = item
+    return {"ticker": ticker, "period": period, "timeframes": timeframes}
+
+@app.websocket("/ws/market/{ticker}")
+async def market_stream_endpoint(websocket: WebSocket, ticker: str):
+    """
+    Live updates for a ticker: a snapshot on connect, then only new/revised bars
+    and changed indicators. All viewers of a ticker share one producer (see streaming.py).
+    """
+    ticker = ticker.replace("$", "").upper()
+    await websocket.accept()
+
+    async def forward(queue):
+        while True:
+            await websocket.send_json(await queue.get())
+
+    async def wait_for_disconnect():
+        while True:
+            if (await websocket.receive())["type"] == "websocket.disconnect":
+                return
+
+    try:
+        async with stream_hub.subscribe(ticker) as queue:
+            tasks = [asyncio.create_task(forward(queue)), asyncio.create_task(wait_for_disconnect())]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+    except WebSocketDisconnect:
+        pass
+
+BATCH_MAX_TICKERS = int(os.getenv("BATCH_MAX_TICKERS", "250"))
+
+class BatchMarketDataRequest(BaseModel):
+    tickers: list[str]
+    period: str = "1mo"
+    interval: str = "1d"
+    include_history: bool = False # Chart payload per ticker (large for big watchlists)
+
+@app.post("/api/market-data/batch")
+def market_data_batch_endpoint(request: BatchMarketDataRequest):
+    """
+    Price + technical analysis for a whole watchlist.
+    Cache misses are fetched in one bulk download; results stream back as
+    newline-delimited JSON, one object per ticker, as each one is ready.
+    """
+    tickers = list(dict.fromkeys(t.replace("$", "").upper() for t in request.tickers if t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No tickers given")
+    if len(tickers) > BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"Too many tickers (max {BATCH_MAX_TICKERS})")
+
+    def stream():
+        for ticker, result in iter_market_data_batch(tickers, request.period, request.interval):
+            try:
+                item = {
+                    "ticker": ticker,
+                    "price": result.chart[-1]['close'] if result.chart else 0,
+                    "indicators": latest_indicators(result),
+                    "is_mock": result.is_mock,
+                }
+                if request.include_history:
+                    item["market_data"] = result.chart
+            except Exception as e:
+                item = {"ticker": ticker, "error": str(e)}
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+class BacktestRequest(BaseModel):
+    tickers: list[str]
+    strategy: str = "macd" # macd | rsi | golden_cross | ichimoku | patterns
+    params: dict = {} # Parameter sweep, e.g. {"fast": [8, 12], "slow": [26, 35]}
+    period: str = "5y"
+    interval: str = "1d"
+    cost_bps: float = 5.0
+    allow_short: bool = False
+
+@app.post("/api/backtest")
+def backtest_endpoint(request: BacktestRequest):
+    """
+    Backtests an indicator strategy over a parameter grid for many tickers.
+    History comes from the batch loader (one bulk download for cache misses);
+    every ticker's whole grid is evaluated in one vectorized pass (see backtest.py)
+    on the analytics process pool. 503 when the pool is saturated.
+    """
+    tickers = list(dict.fromkeys(t.replace("$", "").upper() for t in request.tickers if t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No tickers given")
+    if len(tickers) > BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"Too many tickers (max {BATCH_MAX_TICKERS})")
+    try:
+        grid = parameter_grid(request.strategy, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(grid) * len(tickers) > BACKTEST_MAX_RUNS:
+        raise HTTPException(status_code=400,
+                            detail=f"Too many runs ({len(grid) * len(tickers)}, max {BACKTEST_MAX_RUNS})")
+
+    periods_per_year = PERIODS_PER_YEAR.get(request.interval, 252)
+    # Tickers go to the analytics pool in chunks (one per worker) as their history arrives, so
+    # grids run on several cores while the rest is still loading; the response keeps batch order
+    chunk_size = -(-len(tickers) // max(analytics_pool.workers, 1))
+    pending, chunk = [], []
+
+    def submit_chunk():
+        bars = {f"{ticker}.{col}": result.df[col].to_numpy(dtype='float64')
+                for ticker, result in chunk for col in ('open', 'high', 'low', 'close')}
+        future = analytics_pool.submit(backtest_task, bars, [ticker for ticker, _ in chunk], request.strategy,
+                                       grid, request.cost_bps, request.allow_short, periods_per_year)
+        pending.append((list(chunk), future))
+        chunk.clear()
+
+    batch = iter_market_data_batch(tickers, request.period, request.interval)
+    try:
+        for ticker, result in batch:
+            if result.df.empty:
+                continue
+            chunk.append((ticker, result))
+            if len(chunk) >= chunk_size:
+                submit_chunk()
+        if chunk:
+            submit_chunk()
+    except PoolSaturated:
+        # Release the batch loader (keys it hasn't loaded yet) before answering
+        batch.close()
+        for _, queued in pending:
+            queued.cancel()
+        raise HTTPException(status_code=503, detail="Backtest workers are busy, try again shortly",
+                            headers={"Retry-After": "5"})
+    finally:
+        batch.close()
+
+    deadline = time.monotonic() + analytics_pool.deadline
+    results = []
+    for chunk, future in pending:
+        try:
+            chunk_runs = analytics_pool.wait(future, deadline - time.monotonic())
+        except TimeoutError:
+            raise HTTPException(status_code=504, detail="Backtest missed its deadline")
+        for (ticker, result), runs in zip(chunk, chunk_runs):
+            results.append({
+                "ticker": ticker,
+                "bars": len(result.df),
+                "is_mock": result.is_mock,
+                "buy_and_hold_return": buy_and_hold(result.df),
+                "best": max(runs, key=lambda run: run["sharpe"]),
+                "runs": runs,
+            })
+
+    return {
+        "strategy": request.strategy,
+        "interval": request.interval,
+        "grid_size": len(grid),
+        "results": results,
+    }
+
+class ScreenerRequest(BaseModel):
+    query: str = "" # e.g. "rsi < 30 and above cloud", "golden cross and price > sma_50"
+    sort: str = None # Field to order by, "-field" for descending
+    limit: int = 50
+    tickers: list[str] = None # Universe; defaults to SCREENER_UNIVERSE
+    period: str = SCREENER_PERIOD
+    interval: str = "1d"
+
+@app.post("/api/screener")
+def screener_endpoint(request: ScreenerRequest):
+    """
+    Screens a universe on its latest indicator values.
+    The universe's panel is built once (one bulk download, one vectorized indicator pass)
+    and cached, so follow-up queries only filter and sort the table (see screener.py).
+    """
+    tickers = None
+    if request.tickers:
+        tickers = list(dict.fromkeys(t.replace("$", "").upper() for t in request.tickers if t.strip()))
+        if len(tickers) > SCREENER_MAX_TICKERS:
+            raise HTTPException(status_code=400, detail=f"Too many tickers (max {SCREENER_MAX_TICKERS})")
+    screen = get_screen(tickers, request.period, request.interval)
+    try:
+        result = screen.run(request.query, request.sort, request.limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"period": screen.period, "interval": screen.interval, **result}
+
+@app.get("/api/patterns/{ticker}")
+def patterns_endpoint(ticker: str, period: str = "1y", interval: str = "1d", patterns: str = None,
+                      order: int = PATTERN_ORDER, lookback: int = None):
+    """
+    Candlestick and swing-structure pattern occurrences over a ticker's history, in bar order
+    (see patterns.py). `patterns`: comma-separated names (default: all); `order`: bars on each
+    side of a swing pivot; `lookback`: only occurrences in the last N bars.
+    """
+    names = [name.strip().lower() for name in patterns.split(",") if name.strip()] if patterns else None
+    unknown = sorted(set(names or ()) - set(pattern_names()))
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown pattern(s) {', '.join(unknown)} (known: {', '.join(pattern_names())})")
+    if not 1 <= order <= 50:
+        raise HTTPException(status_code=400, detail="order must be between 1 and 50")
+    if lookback is not None and lookback < 1:
+        raise HTTPException(status_code=400, detail="lookback must be at least 1")
+
+    ticker = ticker.replace("$", "").upper()
+    result = fetch_market_data(ticker, period, interval)
+    with timed("patterns"):
+        occurrences = scan_patterns(result.df, order, names) if not result.df.empty else []
+    if lookback is not None:
+        occurrences = [o for o in occurrences if o["index"] >= len(result.df) - lookback]
+    counts = {}
+    for o in occurrences:
+        counts[o["pattern"]] = counts.get(o["pattern"], 0) + 1
+    return {
+        "ticker": ticker,
+        "period": period,
+        "interval": interval,
+        "bars": len(result.df),
+        "is_mock": result.is_mock,
+        "counts": counts,
+        "occurrences": occurrences,
+    }
+
+def _quant_context(ticker: str) -> dict:
+    # Blocking (provider fetch + indicators + pattern scan), run it off the event loop
+    result = fetch_market_data(ticker)
+    context = latest_indicators(result)
+    recent = recent_patterns(result.df) if not result.df.empty else []
+    if recent:
+        context = {**context, "recent_patterns": ", ".join(recent)}
+    return context
+
+def _chat_market_context(ticker: str) -> dict:
+    try:
+        # Basic price data
+        price_data = fetch_market_data(ticker).chart
+        if price_data:
+            current = price_data[-1]  # latest bar
+            return {
+                "Price": current.get('close'),
+                "Volume": current.get('volume'),
+                "Date": current.get('time')
+            }
+    except Exception as e:
+        print(f"Context error: {e}")
+    return {}
+
+async def _optional_image(image_url: str):
+    try:
+        return await download_bytes(image_url, max_bytes=MAX_INPUT_BYTES)
+    except ResponseTooLarge:
+        raise
+    except Exception as e:
+        print(f"Image download error: {e}")
+        return None
+
+async def _resolved(value):
+    return value
 
 @app.post("/api/analyze")
 async def analyze_endpoint(request: AnalyzeRequest):
@@ -107,35 +515,29 @@ async def analyze_endpoint(request: AnalyzeRequest):
         raise HTTPException(status_code=500, detail="Gemini API Key not configured")
         
     try:
-        # 1. Download image
-        response = requests.get(request.image_url)
-        response.raise_for_status()
-        image_bytes = response.content
-        
-        # 2. Get Quantitative Context (Hybrid Analysis)
-        quant_context = {}
-        if request.ticker and request.ticker != "General":
-            df = get_market_data(request.ticker, return_df=True)
-            if not df.empty:
-                quant_context = calculate_technical_indicators(df)
+        # 1. Download image and 2. get Quantitative Context (Hybrid Analysis), concurrently
+        has_ticker = request.ticker and request.ticker != "General"
+        quant_task = asyncio.to_thread(_quant_context, request.ticker) if has_ticker else _resolved({})
+        image_bytes, quant_context = await asyncio.gather(
+            download_bytes(request.image_url, max_bytes=MAX_INPUT_BYTES), quant_task)
+        # Header-only check, malformed or oversized uploads are rejected before any decoding
+        inspect_image(image_bytes)
 
         # 3. Analyze with Gemini (Vision + Stats)
-        analysis = analyze_chart(image_bytes, request.mode, context=quant_context)
+        analysis = await analyze_chart_async(image_bytes, request.mode, context=quant_context)
         
-        # 4. Save to Supabase
-        if supabase:
-            try:
-                data = {
-                    "image_url": request.image_url,
-                    "strategy_type": request.mode,
-                    "gemini_response": json.dumps(analysis),
-                    "ticker": request.ticker
-                }
-                supabase.table("analysis_history").insert(data).execute()
-            except Exception as e:
-                print(f"Supabase Save Error: {e}")
+        # 4. Save to Supabase (queued, written in the background)
+        if history_writer:
+            history_writer.put({
+                "image_url": request.image_url,
+                "strategy_type": request.mode,
+                "gemini_response": json.dumps(analysis),
+                "ticker": request.ticker
+            })
                 
         return analysis
+    except (ImageRejected, ResponseTooLarge) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -153,37 +555,20 @@ async def chat_endpoint(request: ChatRequest):
         raise HTTPException(status_code=500, detail="Gemini API Key not configured")
 
     try:
-        # 1. Get Context (Market Data) if ticker is provided
-        market_context = {}
-        if request.ticker and request.ticker != "General":
-            try:
-                # Basic price data
-                price_data = get_market_data(request.ticker, return_df=False)
-                if price_data:
-                    current = price_data[0]
-                    market_context = {
-                        "Price": current.get('close'),
-                        "Volume": current.get('volume'),
-                        "Date": current.get('time')
-                    }
-            except Exception as e:
-                print(f"Context error: {e}")
-
-        # 2. Handle Image if present
-        image_bytes = None
-        if request.image_url:
-            try:
-                r = requests.get(request.image_url)
-                if r.status_code == 200:
-                    image_bytes = r.content
-            except Exception as e:
-                print(f"Image download error: {e}")
+        # 1. Get Context (Market Data) if ticker is provided and 2. the image if present, concurrently
+        has_ticker = request.ticker and request.ticker != "General"
+        context_task = asyncio.to_thread(_chat_market_context, request.ticker) if has_ticker else _resolved({})
+        image_task = _optional_image(request.image_url) if request.image_url else _resolved(None)
+        market_context, image_bytes = await asyncio.gather(context_task, image_task)
+        if image_bytes:
+            inspect_image(image_bytes)
 
         # 3. Call AI
-        from .strategy_engine import chat_with_ai
-        response_text = chat_with_ai(request.message, image_bytes, market_context)
+        response_text = await chat_with_ai_async(request.message, image_bytes, market_context)
         
         return {"response": response_text}
 
+    except (ImageRejected, ResponseTooLarge) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,210 +1,361 @@
-import yfinance as yf
-from newsapi import NewsApiClient
 import os
 from datetime import datetime, timedelta
 
+from .lazy import Lazy, lazy_import
+
+# Provider SDKs are imported on first use (see lazy.py)
+yf = lazy_import("yfinance")
+
 # Initialize NewsAPI (ensure api key is set in env)
 # We will load env vars in main.py usually, but good to have safety here
 newsapi = None
 
+def _newsapi_client(api_key: str):
+    from newsapi import NewsApiClient
+    return NewsApiClient(api_key=api_key)
+
 def init_news_api(api_key: str):
     global newsapi
-    newsapi = NewsApiClient(api_key=api_key)
+    newsapi = Lazy(lambda: _newsapi_client(api_key), "newsapi")
 
 import pandas as pd
-from functools import lru_cache
-import time
+from dataclasses import dataclass, field
 
-# Simple in-memory cache with expiration
-cache = {}
-CACHE_DURATION = 15 # 15 seconds for "live" feel
+from .bar_store import PERIOD_SESSIONS, bar_store, last_sessions, period_start
+from .cache import TTLCache
+from .metrics import timed
+from .news_store import dedup_articles, news_cache, provider_budgets, score_articles
+from .sentiment import SentimentScorer
 
-def get_market_data(ticker: str, period: str = "1mo", interval: str = "1d", return_df: bool = False):
+@dataclass
+class MarketData:
     """
-    Fetches historical data from yfinance.
-    Supports caching and returning raw DataFrame.
+    One fetch of price history: the normalized DataFrame (lowercase OHLCV columns
+    plus 'date') and the Lightweight Charts payload built from it.
+    Built once per upstream fetch and shared by every request served from cache;
+    `encodings` holds the other response encodings of the chart, built on demand (payload.py).
     """
-    cache_key = f"{ticker}_{period}_{interval}"
-    
-    # Check cache
-    if cache_key in cache:
-        timestamp, data, df = cache[cache_key]
-        if time.time() - timestamp < CACHE_DURATION:
-            return df if return_df else data
+    ticker: str
+    period: str
+    interval: str
+    df: pd.DataFrame
+    chart: list = field(default_factory=list)
+    is_mock: bool = False
+    encodings: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def nbytes(self) -> int:
+        # ~200 bytes per chart dict (6 keys + boxed values)
+        return int(self.df.memory_usage(deep=True).sum()) + len(self.chart) * 200
+
+# Bounded in-memory cache with expiration (see cache.py)
+CACHE_DURATION = int(os.getenv("MARKET_CACHE_TTL", "15")) # 15 seconds for "live" feel
+CACHE_STALE_DURATION = int(os.getenv("MARKET_CACHE_STALE_TTL", "60")) # Serve stale while refreshing in background
+CACHE_MAX_ENTRIES = int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_BYTES = int(os.getenv("MARKET_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+cache = TTLCache(
+    "market_data",
+    ttl=CACHE_DURATION,
+    stale_ttl=CACHE_STALE_DURATION,
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    sizeof=lambda result: result.nbytes,
+)
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+def _normalize_history(hist: pd.DataFrame) -> pd.DataFrame:
+    """
+    yfinance returns a Date/Datetime index and capitalized columns;
+    the analysis engine expects lowercase OHLCV columns.
+    """
+    hist = hist.reset_index()
+    date_col = 'Datetime' if 'Datetime' in hist.columns else 'Date'
+    df = pd.DataFrame({
+        'date': hist[date_col],
+        'open': hist['Open'].to_numpy(dtype='float64'),
+        'high': hist['High'].to_numpy(dtype='float64'),
+        'low': hist['Low'].to_numpy(dtype='float64'),
+        'close': hist['Close'].to_numpy(dtype='float64'),
+        'volume': hist['Volume'].to_numpy(dtype='float64'),
+    })
+    return df
 
+def build_chart_payload(df: pd.DataFrame) -> list:
+    """
+    Format for Lightweight Charts (time: string/timestamp, open, high, low, close).
+    Lightweight charts expects 'time' as YYYY-MM-DD for daily bars.
+    Vectorized: the date column is formatted in one pass, then converted to records.
+    """
+    chart = df[OHLCV_COLUMNS].copy()
+    chart.insert(0, 'time', df['date'].dt.strftime('%Y-%m-%d'))
+    return chart.to_dict('records')
+
+def _download_history(ticker: str, **kwargs) -> pd.DataFrame:
+    with timed("yfinance.history", upstream="yfinance"):
+        hist = yf.Ticker(ticker).history(**kwargs)
+    return _normalize_history(hist) if not hist.empty else pd.DataFrame()
+
+def _fetch_market_data(ticker: str, period: str, interval: str) -> MarketData:
+    """
+    Serves history from the local bar store (see bar_store.py), downloading only what it
+    is missing: the tail since the last stored bar once the period is covered, the whole
+    period otherwise. Raises if nothing comes back so the cache never stores empty results.
+    """
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period, interval=interval)
-        
-        if hist.empty:
+        start = period_start(period)
+    except ValueError:
+        # A period the store can't slice by: plain download, not stored
+        df = _download_history(ticker, period=period, interval=interval)
+        if df.empty:
             raise Exception("No data found")
+        return MarketData(ticker, period, interval, df, build_chart_payload(df))
 
-        # Reset index to make Date a column
-        hist.reset_index(inplace=True)
-        
-        # Format for Lightweight Charts (time: string/timestamp, open, high, low, close)
-        # Lightweight charts expects 'time' as YYYY-MM-DD for daily bars
-        data = []
-        for index, row in hist.iterrows():
-            # Handle different date formats if needed, but YYYY-MM-DD is standard
-            time_str = row['Date'].strftime('%Y-%m-%d')
-            data.append({
-                "time": time_str,
-                "open": row['Open'],
-                "high": row['High'],
-                "low": row['Low'],
-                "close": row['Close'],
-                "volume": row['Volume']
-            })
-            
-        # Update Cache
-        cache[cache_key] = (time.time(), data, hist)
+    with bar_store.lock(ticker, interval):
+        df = pd.DataFrame()
+        if bar_store.covers(ticker, interval, start):
+            last = pd.Timestamp(bar_store.meta(ticker, interval)["last"], tz="UTC")
+            try:
+                # Starts at the last stored bar so a revised (still forming) bar is replaced too
+                df = _download_history(ticker, start=last, interval=interval)
+            except Exception as e:
+                print(f"Tail fetch error for {ticker} ({interval}), serving stored bars: {e}")
+            bar_store.merge(ticker, interval, df)
+        else:
+            df = _download_history(ticker, period=period, interval=interval)
+            if df.empty:
+                raise Exception("No data found")
+            bar_store.merge(ticker, interval, df, covered_from=start, full_history=start is None)
+        df = bar_store.read(ticker, interval, start)
+
+    if period in PERIOD_SESSIONS:
+        df = last_sessions(df, PERIOD_SESSIONS[period])
+    if df is None or df.empty:
+        raise Exception("No data found")
+    return MarketData(ticker, period, interval, df, build_chart_payload(df))
+
+def _mock_market_data(ticker: str, period: str, interval: str) -> MarketData:
+    # Fallback to Mock Data (30 days) if API fails
+    print(f"Generating mock data for {ticker}...")
+    import random
+    base_price = 150.0
+    if ticker == "BTC-USD": base_price = 60000.0
+    
+    rows = []
+    # Generate last 30 days
+    for i in range(30):
+        change = random.uniform(-0.05, 0.05)
+        close = base_price * (1 + change)
+        open_p = base_price * (1 + random.uniform(-0.02, 0.02))
+        high = max(open_p, close) * (1 + random.uniform(0, 0.02))
+        low = min(open_p, close) * (1 - random.uniform(0, 0.02))
         
-        return hist if return_df else data
+        rows.append((round(open_p, 2), round(high, 2), round(low, 2), round(close, 2), int(random.uniform(1000000, 5000000))))
+        base_price = close
+
+    df = pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+    df.insert(0, 'date', pd.date_range(end=datetime.now().date(), periods=len(df), freq='D'))
+    return MarketData(ticker, period, interval, df, build_chart_payload(df), is_mock=True)
+
+def fetch_market_data(ticker: str, period: str = "1mo", interval: str = "1d") -> MarketData:
+    """
+    Fetches historical data from yfinance as a MarketData result.
+    Concurrent requests for the same ticker/period/interval share a single upstream fetch,
+    and the DataFrame + chart payload are reused for every cache hit.
+    Treat the result as read-only (copy the DataFrame before adding columns).
+    """
+    cache_key = f"{ticker}_{period}_{interval}"
+
+    try:
+        return cache.get_or_load(cache_key, lambda: _fetch_market_data(ticker, period, interval))
     except Exception as e:
         print(f"Error fetching data for {ticker}: {e}")
-        
-        # Fallback to Mock Data (20 days) if API fails
-        print(f"Generating mock data for {ticker}...")
-        mock_data = []
-        base_price = 150.0
-        if ticker == "BTC-USD": base_price = 60000.0
-        
-        # Generate last 30 days
-        for i in range(30):
-            dt = (datetime.now() - timedelta(days=29-i)).strftime('%Y-%m-%d')
-            import random
-            change = random.uniform(-0.05, 0.05)
-            close = base_price * (1 + change)
-            open_p = base_price * (1 + random.uniform(-0.02, 0.02))
-            high = max(open_p, close) * (1 + random.uniform(0, 0.02))
-            low = min(open_p, close) * (1 - random.uniform(0, 0.02))
-            
-            mock_data.append({
-                "time": dt,
-                "open": round(open_p, 2),
-                "high": round(high, 2),
-                "low": round(low, 2),
-                "close": round(close, 2),
-                "volume": int(random.uniform(1000000, 5000000))
-            })
-            base_price = close
-            
-        return pd.DataFrame(mock_data) if return_df else mock_data
+        return _mock_market_data(ticker, period, interval)
+
+def _fetch_market_data_bulk(tickers: list, period: str, interval: str) -> dict:
+    """
+    Downloads history for many tickers in one yfinance request.
+    Tickers that come back empty are left out of the result.
+    """
+    # ignore_tz=False: tz-aware times like Ticker.history returns (for daily bars yfinance
+    # otherwise drops the timezone), all in the most common exchange timezone of the batch
+    with timed("yfinance.download", upstream="yfinance"):
+        data = yf.download(tickers, period=period, interval=interval, group_by='ticker',
+                           auto_adjust=True, threads=True, progress=False, ignore_tz=False)
+    results = {}
+    for ticker in tickers:
+        try:
+            hist = data[ticker] if isinstance(data.columns, pd.MultiIndex) else data
+        except KeyError:
+            continue
+        # Calendars differ across symbols (crypto trades weekends), drop the padding rows
+        hist = hist.dropna(how='all')
+        if hist.empty:
+            continue
+        df = _normalize_history(hist)
+        meta = bar_store.meta(ticker, interval)
+        if meta is not None and meta["tz"] and df['date'].dt.tz is not None:
+            # Back in the ticker's own exchange timezone once the store knows it
+            df['date'] = df['date'].dt.tz_convert(meta["tz"])
+        results[ticker] = MarketData(ticker, period, interval, df, build_chart_payload(df))
+        _store_download(ticker, period, interval, df)
+    return results
+
+def _store_download(ticker: str, period: str, interval: str, df: pd.DataFrame):
+    # Bulk downloads are complete periods too, keep them for the next tail-only fetch
+    try:
+        start = period_start(period)
+        with bar_store.lock(ticker, interval):
+            bar_store.merge(ticker, interval, df, covered_from=start, full_history=start is None)
+    except Exception as e:
+        print(f"Bar store write error for {ticker} ({interval}): {e}")
+
+def iter_market_data_batch(tickers: list, period: str = "1mo", interval: str = "1d"):
+    """
+    Yields (ticker, MarketData) for every ticker, cached ones first.
+    All cache misses are fetched with a single bulk download (and share in-flight
+    fetches with fetch_market_data); tickers that fail fall back to mock data like
+    fetch_market_data does.
+    """
+    keys = {f"{ticker}_{period}_{interval}": ticker for ticker in tickers}
+
+    def bulk_loader(missing_keys):
+        loaded = _fetch_market_data_bulk([keys[k] for k in missing_keys], period, interval)
+        return {f"{ticker}_{period}_{interval}": result for ticker, result in loaded.items()}
+
+    for key, result, error in cache.iter_many_or_load(list(keys), bulk_loader):
+        ticker = keys[key]
+        if error is not None:
+            print(f"Error fetching data for {ticker}: {error}")
+            result = _mock_market_data(ticker, period, interval)
+        yield ticker, result
+
+def get_market_data(ticker: str, period: str = "1mo", interval: str = "1d", return_df: bool = False):
+    """
+    Fetches historical data from yfinance.
+    Supports caching and returning raw DataFrame.
+    """
+    result = fetch_market_data(ticker, period, interval)
+    return result.df if return_df else result.chart
 
 # Financial Sentiment Dictionary (Lightweight)
 SENTIMENT_LEXICON = {
     'bullish': ['surge', 'jump', 'rise', 'gain', 'climb', 'soar', 'rocket', 'bull', 'buy', 'outperform', 'upgrade', 'beat', 'record', 'strong', 'positive', 'growth', 'profit'],
     'bearish': ['plunge', 'drop', 'fall', 'sink', 'dive', 'crash', 'bear', 'sell', 'underperform', 'downgrade', 'miss', 'weak', 'negative', 'loss', 'debt', 'risk', 'crisis']
 }
+SENTIMENT_WEIGHT = 0.3
+
+# Term weights for the compiled scorer (override individual terms here to weight them)
+SENTIMENT_WEIGHTS = {
+    **{word: SENTIMENT_WEIGHT for word in SENTIMENT_LEXICON['bullish']},
+    **{word: -SENTIMENT_WEIGHT for word in SENTIMENT_LEXICON['bearish']},
+}
+
+# Word forms each term also matches (inflections only: "bullish" is not a form of "bull",
+# nor "buyer" of "buy"); a term not listed matches only as written
+SENTIMENT_FORMS = {
+    'surge': ['surges', 'surged', 'surging'],
+    'jump': ['jumps', 'jumped', 'jumping'],
+    'rise': ['rises', 'rose', 'risen', 'rising'],
+    'gain': ['gains', 'gained', 'gaining'],
+    'climb': ['climbs', 'climbed', 'climbing'],
+    'soar': ['soars', 'soared', 'soaring'],
+    'rocket': ['rockets', 'rocketed', 'rocketing'],
+    'bull': ['bulls'],
+    'buy': ['buys', 'buying', 'bought'],
+    'outperform': ['outperforms', 'outperformed', 'outperforming'],
+    'upgrade': ['upgrades', 'upgraded', 'upgrading'],
+    'beat': ['beats', 'beating', 'beaten'],
+    'record': ['records'],
+    'strong': ['stronger', 'strongest'],
+    'profit': ['profits'],
+    'plunge': ['plunges', 'plunged', 'plunging'],
+    'drop': ['drops', 'dropped', 'dropping'],
+    'fall': ['falls', 'fell', 'fallen', 'falling'],
+    'sink': ['sinks', 'sank', 'sunk', 'sinking'],
+    'dive': ['dives', 'dived', 'diving'],
+    'crash': ['crashes', 'crashed', 'crashing'],
+    'bear': ['bears'],
+    'sell': ['sells', 'selling', 'sold'],
+    'underperform': ['underperforms', 'underperformed', 'underperforming'],
+    'downgrade': ['downgrades', 'downgraded', 'downgrading'],
+    'miss': ['misses', 'missed', 'missing'],
+    'weak': ['weaker', 'weakest'],
+    'loss': ['losses'],
+    'debt': ['debts'],
+    'risk': ['risks'],
+    'crisis': ['crises'],
+}
+
+sentiment_scorer = SentimentScorer(SENTIMENT_WEIGHTS, SENTIMENT_FORMS)
 
 def analyze_sentiment(text: str) -> float:
     """
     Returns a sentiment score between -1.0 (Bearish) and 1.0 (Bullish).
     """
-    if not text:
-        return 0.0
-    
-    text_lower = text.lower()
-    score = 0.0
-    
-    for word in SENTIMENT_LEXICON['bullish']:
-        if word in text_lower:
-            score += 0.3
-            
-    for word in SENTIMENT_LEXICON['bearish']:
-        if word in text_lower:
-            score -= 0.3
-            
-    # Clamp score
-    return max(min(score, 1.0), -1.0)
+    return sentiment_scorer.score(text)
 
-def get_news(ticker: str):
-    """
-    Fetches news from Yahoo Finance (Public) first, then falls back to NewsAPI.
-    Calculates Market Mood based on aggregated sentiment.
-    """
-    global newsapi
-    news_items = []
-    
-    # 1. Try Yahoo Finance (Public Source)
-    try:
-        yf_ticker = yf.Ticker(ticker)
-        
-        # Skip YF for "GENERAL" as it's not a valid ticker, or use S&P 500
-        if ticker.upper() == "GENERAL":
-             yf_ticker = yf.Ticker("^GSPC") # S&P 500
+def _sentiment_label(score: float) -> str:
+    if score > 0.1: return "Positive"
+    if score < -0.1: return "Negative"
+    return "Neutral"
 
-        yf_news = yf_ticker.news
-        
-        if yf_news:
-            for item in yf_news:
-                title = item.get('title', '')
-                # Skip non-news items like videos if needed, but titles are usually enough
-                
-                # Normalize Timestamp
-                pub_time = item.get('providerPublishTime', 0)
-                pub_date = datetime.fromtimestamp(pub_time).strftime('%Y-%m-%dT%H:%M:%SZ') if pub_time else datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
-                
-                # Analyze Sentiment
-                score = analyze_sentiment(title)
-                sentiment_label = "Neutral"
-                if score > 0.1: sentiment_label = "Positive"
-                elif score < -0.1: sentiment_label = "Negative"
-                
-                news_items.append({
-                    "title": title,
-                    "url": item.get('link', '#'),
-                    "source": item.get('publisher', 'Yahoo Finance'),
-                    "publishedAt": pub_date,
-                    "sentiment": sentiment_label,
-                    "score": round(score, 2)
-                })
-    except Exception as e:
-        print(f"YFinance News Error for {ticker}: {e}")
+def _fetch_yahoo_news(ticker: str) -> list:
+    yf_ticker = yf.Ticker(ticker)
 
-    # 2. If YF failed or returned few results, try NewsAPI (if configured)
-    if len(news_items) < 3 and newsapi:
-        try:
-            # Search for ticker in last 7 days
-            start_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-            
-            query = ticker
-            if ticker.upper() == "GENERAL":
-                 query = "Stock Market, Economy, Finance"
-
-            response = newsapi.get_everything(
-                q=query,
-                from_param=start_date,
-                language='en',
-                sort_by='relevancy',
-                page_size=5 - len(news_items) # Fill remaining slots
-            )
-            
-            articles = response.get('articles', [])
-            
-            for art in articles:
-                title = art.get('title', '')
-                score = analyze_sentiment(title)
-                
-                sentiment_label = "Neutral"
-                if score > 0.1: sentiment_label = "Positive"
-                elif score < -0.1: sentiment_label = "Negative"
-                
-                # Dedup based on title similarity could go here, but simple append for now
-                news_items.append({
-                    "title": title,
-                    "url": art.get('url'),
-                    "source": art.get('source', {}).get('name'),
-                    "publishedAt": art.get('publishedAt'),
-                    "sentiment": sentiment_label,
-                    "score": round(score, 2)
-                })
-                
-        except Exception as e:
-            print(f"NewsAPI Error for {ticker}: {e}")
+    # Skip YF for "GENERAL" as it's not a valid ticker, or use S&P 500
+    if ticker.upper() == "GENERAL":
+         yf_ticker = yf.Ticker("^GSPC") # S&P 500
+
+    with timed("yfinance.news", upstream="yfinance"):
+        raw_items = yf_ticker.news or []
+
+    items = []
+    for item in raw_items:
+        title = item.get('title', '')
+        # Skip non-news items like videos if needed, but titles are usually enough
+
+        # Normalize Timestamp
+        pub_time = item.get('providerPublishTime', 0)
+        pub_date = datetime.fromtimestamp(pub_time).strftime('%Y-%m-%dT%H:%M:%SZ') if pub_time else datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        items.append({
+            "title": title,
+            "url": item.get('link', '#'),
+            "source": item.get('publisher', 'Yahoo Finance'),
+            "publishedAt": pub_date,
+        })
+    return items
+
+def _fetch_newsapi_news(ticker: str, page_size: int) -> list:
+    # Search for ticker in last 7 days
+    start_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+
+    query = ticker
+    if ticker.upper() == "GENERAL":
+         query = "Stock Market, Economy, Finance"
 
-    # 3. Calculate Aggregated Mood
+    with timed("newsapi", upstream="newsapi"):
+        response = newsapi.get_everything(
+            q=query,
+            from_param=start_date,
+            language='en',
+            sort_by='relevancy',
+            page_size=page_size
+        )
+
+    return [{
+        "title": art.get('title', ''),
+        "url": art.get('url'),
+        "source": (art.get('source') or {}).get('name'),
+        "publishedAt": art.get('publishedAt'),
+    } for art in response.get('articles', [])]
+
+def _news_payload(news_items: list) -> dict:
+    """
+    Calculates Market Mood based on aggregated sentiment.
+    """
     if not news_items:
         return {
             "news": [{"title": "No recent news found", "url": "#", "source": "System", "sentiment": "Neutral", "score": 0}],
@@ -214,7 +365,7 @@ def get_news(ticker: str):
 
     total_score = sum(item['score'] for item in news_items)
     avg_score = total_score / len(news_items)
-    
+
     market_mood = "Neutral"
     if avg_score > 0.1: market_mood = "Bullish"
     if avg_score > 0.4: market_mood = "Strong Bullish"
@@ -226,3 +377,51 @@ def get_news(ticker: str):
         "sentiment_score": round(avg_score, 2),
         "market_mood": market_mood
     }
+
+def _load_news(ticker: str) -> dict:
+    news_items = []
+    failed = False
+
+    # 1. Try Yahoo Finance (Public Source)
+    if provider_budgets["yahoo"].acquire():
+        try:
+            news_items = dedup_articles(_fetch_yahoo_news(ticker))
+        except Exception as e:
+            failed = True
+            print(f"YFinance News Error for {ticker}: {e}")
+
+    # 2. If YF failed or returned few results, try NewsAPI (if configured)
+    if len(news_items) < 3 and newsapi and provider_budgets["newsapi"].acquire():
+        try:
+            articles = _fetch_newsapi_news(ticker, 5 - len(news_items)) # Fill remaining slots
+            # The same story often comes back from both sources
+            news_items = dedup_articles(news_items + articles)
+        except Exception as e:
+            failed = True
+            print(f"NewsAPI Error for {ticker}: {e}")
+
+    if failed and not news_items:
+        # Don't cache an outage as "no news"
+        raise LookupError(f"No news provider answered for {ticker}")
+
+    # 3. Analyze Sentiment (only headlines not scored before)
+    with timed("sentiment"):
+        scores = score_articles(news_items, sentiment_scorer)
+    for item, score in zip(news_items, scores):
+        item["sentiment"] = _sentiment_label(score)
+        item["score"] = round(score, 2)
+
+    # 4. Calculate Aggregated Mood
+    return _news_payload(news_items)
+
+def get_news(ticker: str):
+    """
+    Fetches news from Yahoo Finance (Public) first, then falls back to NewsAPI.
+    Served from the shared news store (see news_store.py): one provider call per ticker per window.
+    """
+    key = ticker.upper()
+    try:
+        return news_cache.get_or_load(key, lambda: _load_news(ticker))
+    except Exception as e:
+        print(f"News Error for {ticker}: {e}")
+        return news_cache.peek(key) or _news_payload([])
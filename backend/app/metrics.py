@@ -0,0 +1,245 @@
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from .cache import all_cache_stats
+
+# Lightweight instrumentation, exported in the Prometheus text format on /metrics.
+#
+# Counters, gauges and fixed-bucket histograms are plain Python objects guarded by one lock
+# each; an observation is a perf_counter pair, a bisect and a few additions (~2-3 us per timed
+# block), negligible next to upstream calls measured in milliseconds.
+#
+#   with timed("yfinance.history", upstream="yfinance"):
+#       ...
+#
+# records the stage's latency (stage_duration_seconds{stage=...}) and, when the block raises,
+# counts an upstream error. Requests sent with an `X-Timing: 1` header get a Server-Timing
+# response header listing the stages they ran (including ones run through asyncio.to_thread,
+# which copies the context). Stages that finish after the response starts, or run on background
+# pools (model refits), are only in the histograms.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+TIMING_HEADER = b"x-timing"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Per-request [(stage, seconds)], set by the middleware for requests that opted in
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (+Inf last), then sum
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[i] += 1
+            state[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((labels, list(state)) for labels, state in self._values.items())
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(state[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+registry = []
+
+stage_duration = Histogram("stage_duration_seconds", "Latency of instrumented stages and upstream calls.", ["stage"])
+upstream_errors = Counter("upstream_errors_total", "Failed calls to upstream services.", ["upstream"])
+request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route.",
+                             ["method", "route", "status"])
+requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served.")
+started_at = time.time()
+
+
+class timed:
+    """
+    Context manager timing a block into stage_duration_seconds{stage}. With `upstream`
+    set, an exception leaving the block also counts in upstream_errors_total{upstream}.
+    Works around awaits too (wall-clock time).
+    """
+    __slots__ = ("stage", "upstream", "start")
+
+    def __init__(self, stage: str, upstream: str = None):
+        self.stage = stage
+        self.upstream = upstream
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not METRICS_ENABLED:
+            return False
+        elapsed = time.perf_counter() - self.start
+        stage_duration.observe(elapsed, self.stage)
+        if exc_type is not None and self.upstream is not None:
+            upstream_errors.inc(self.upstream)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.stage, elapsed))
+        return False
+
+
+def _server_timing(timings: list, total: float) -> bytes:
+    # Same stage run several times: one entry with the summed duration
+    totals = {}
+    for stage, elapsed in timings:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    entries = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1", "replace")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: in-flight gauge, latency per route template, and the opt-in
+    Server-Timing breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+        timings = None
+        for name, value in scope.get("headers", ()):
+            if name == TIMING_HEADER and value not in (b"0", b""):
+                timings = []
+                break
+        token = _request_timings.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if timings is not None:
+                    header = _server_timing(timings, time.perf_counter() - start)
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", header)]}
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.dec()
+            _request_timings.reset(token)
+            # Route template, not the raw path, to keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            request_duration.observe(time.perf_counter() - start, scope["method"], route, str(status[0]))
+
+
+def _cache_lines() -> list:
+    stats = all_cache_stats()
+    families = [
+        ("cache_hits_total", "counter", "Fresh cache hits.", "hits"),
+        ("cache_stale_hits_total", "counter", "Stale cache hits (served while refreshing).", "stale_hits"),
+        ("cache_misses_total", "counter", "Cache misses.", "misses"),
+        ("cache_evictions_total", "counter", "Cache evictions.", "evictions"),
+        ("cache_entries", "gauge", "Entries held per cache.", "entries"),
+        ("cache_hit_ratio", "gauge", "Hits / lookups per cache.", "hit_ratio"),
+    ]
+    lines = []
+    for name, kind, help, key in families:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        for cache, values in sorted(stats.items()):
+            lines.append(f'{name}{{cache="{_escape(cache)}"}} {_number(values.get(key, 0))}')
+    return lines
+
+
+def render_metrics() -> str:
+    """
+    Every metric in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for metric in registry:
+        lines += metric.render()
+    lines += _cache_lines()
+    lines += ["# HELP process_uptime_seconds Seconds since the app started.",
+              "# TYPE process_uptime_seconds gauge",
+              f"process_uptime_seconds {time.time() - started_at:.3f}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,285 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .analysis_engine import (
+    FORECAST_FEATURES,
+    FORECAST_MIN_BARS,
+    build_forecast_features,
+    predict_next_close,
+)
+from .analytics_pool import PoolSaturated, analytics_pool, fit_forecast, forecast_once
+from .lazy import lazy_import
+from .metrics import timed
+from .online_forecast import online_forecast
+
+joblib = lazy_import("joblib")  # only needed once a model is persisted or read back
+
+# Forecast models, trained in the background and reused across requests.
+#
+# One model per ticker/interval. A model is retrained when the bars it was fitted on
+# change (new candle closed, history revised) or when it gets older than MODEL_MAX_AGE;
+# until the new fit lands, requests keep being answered from the previous model.
+# Fitted models are written to MODEL_DIR so a restart doesn't start cold. At most
+# MODEL_MAX_ENTRIES stay in memory (least recently used go first, and are read back from
+# MODEL_DIR when their ticker comes back).
+# The fits themselves run on the analytics process pool; when it is saturated a refit is
+# skipped (the current model keeps answering) and a key with no model gets a degraded reply.
+
+MODEL_DIR = os.getenv("FORECAST_MODEL_DIR", "model_cache")
+MODEL_MAX_AGE = int(os.getenv("FORECAST_MODEL_MAX_AGE", "3600")) # seconds
+TRAIN_WORKERS = int(os.getenv("FORECAST_TRAIN_WORKERS", "2")) # fits in flight (each waits on the analytics pool)
+COLD_START_WAIT = float(os.getenv("FORECAST_COLD_START_WAIT", "10")) # seconds a request waits for a first fit
+MODEL_MAX_ENTRIES = int(os.getenv("FORECAST_MODEL_MAX_ENTRIES", "256")) # fitted models kept in memory
+
+# Forecast model per ticker: "forest" (RandomForest, refitted in the background), "online"
+# (recursive least squares updated per bar, see online_forecast.py) or "both" (forest, with the
+# online forecast alongside under "online"). FORECAST_MODE_OVERRIDES: "BTC-USD=online,SPY=both"
+FORECAST_MODES = ("forest", "online", "both")
+FORECAST_MODE = os.getenv("FORECAST_MODE", "forest")
+FORECAST_MODE_OVERRIDES = {
+    ticker.strip().upper(): mode.strip()
+    for ticker, _, mode in (item.partition("=") for item in os.getenv("FORECAST_MODE_OVERRIDES", "").split(","))
+    if ticker.strip() and mode.strip() in FORECAST_MODES
+}
+
+_train_pool = ThreadPoolExecutor(max_workers=TRAIN_WORKERS, thread_name_prefix="forecast-train")
+
+
+class _Model:
+    __slots__ = ("model", "rmse", "fingerprint", "trained_at")
+
+    def __init__(self, model, rmse, fingerprint, trained_at):
+        self.model = model
+        self.rmse = rmse
+        self.fingerprint = fingerprint
+        self.trained_at = trained_at  # wall clock, survives restarts
+
+
+def data_fingerprint(df) -> str:
+    """
+    Hash of the bars a model trains on. The last bar only feeds the prediction
+    (it has no next close yet), so a still-forming candle doesn't force a refit.
+    """
+    train = df.iloc[:-1]
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(train['date'].to_numpy(dtype='datetime64[ns]')).tobytes())
+    h.update(np.ascontiguousarray(train[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype='float64')).tobytes())
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Thread-safe registry of fitted forecast models with coalesced background training.
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR, max_age: float = MODEL_MAX_AGE,
+                 max_entries: int = MODEL_MAX_ENTRIES):
+        self.model_dir = model_dir
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._models = OrderedDict()
+        self._training = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.cold_starts = 0
+        self.trainings = 0
+        self.disk_loads = 0
+        self.skipped = 0
+        self.errors = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.model_dir, re.sub(r"[^A-Za-z0-9_.=-]", "_", key) + ".joblib")
+
+    def _load(self, key: str):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            saved = joblib.load(path)
+            self.disk_loads += 1
+            return _Model(saved["model"], saved["rmse"], saved["fingerprint"], saved["trained_at"])
+        except Exception as e:
+            print(f"Model load error ({key}): {e}")
+            return None
+
+    def _save(self, key: str, entry: _Model):
+        try:
+            os.makedirs(self.model_dir, exist_ok=True)
+            tmp = self._path(key) + ".tmp"
+            joblib.dump({
+                "model": entry.model,
+                "rmse": entry.rmse,
+                "fingerprint": entry.fingerprint,
+                "trained_at": entry.trained_at,
+            }, tmp)
+            os.replace(tmp, self._path(key))
+        except Exception as e:
+            print(f"Model save error ({key}): {e}")
+
+    def _train(self, key, features, fingerprint):
+        try:
+            model, rmse = analytics_pool.run(fit_forecast, _columns(features, ['close', 'target'] + FORECAST_FEATURES))
+            entry = _Model(model, rmse, fingerprint, time.time())
+            with self._lock:
+                self._remember(key, entry)
+                self.trainings += 1
+            self._save(key, entry)
+            return entry
+        except PoolSaturated:
+            with self._lock:
+                self.skipped += 1
+            raise
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"ML Training Error ({key}): {e}")
+            raise
+        finally:
+            with self._lock:
+                self._training.pop(key, None)
+
+    def _remember(self, key: str, entry: _Model):
+        # Caller holds self._lock
+        self._models[key] = entry
+        self._models.move_to_end(key)
+        while len(self._models) > self.max_entries:
+            self._models.popitem(last=False)
+            self.evictions += 1
+
+    def _schedule(self, key, features, fingerprint):
+        # Caller holds self._lock; one training per key at a time
+        future = self._training.get(key)
+        if future is None:
+            future = _train_pool.submit(self._train, key, features, fingerprint)
+            self._training[key] = future
+        return future
+
+    def get_forecast(self, key: str, df) -> dict:
+        """
+        Next-close forecast for df from the model registered under key.
+        Answers from the current model and schedules a refit in the background when
+        the data moved on or the model aged out; only a key with no model at all
+        waits (up to COLD_START_WAIT) for its first fit.
+        """
+        if len(df) < FORECAST_MIN_BARS:
+            return {"error": "Not enough data for ML prediction (need 50+ candles)"}
+
+        features = build_forecast_features(df)
+        fingerprint = data_fingerprint(df)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                with self._lock:
+                    if key in self._models:
+                        entry = self._models[key]  # a fit landed meanwhile
+                    else:
+                        self._remember(key, entry)
+
+        busy = analytics_pool.saturated()
+        with self._lock:
+            if entry is None:
+                if busy and key not in self._training:
+                    self.skipped += 1
+                    return {"error": "Forecast unavailable, analytics workers are busy; try again shortly"}
+                self.cold_starts += 1
+                future = self._schedule(key, features, fingerprint)
+            else:
+                if entry.fingerprint != fingerprint or time.time() - entry.trained_at > self.max_age:
+                    self.stale_hits += 1
+                    if busy:
+                        self.skipped += 1  # answer from the current model, refit on a later request
+                    else:
+                        self._schedule(key, features, fingerprint)
+                else:
+                    self.hits += 1
+                future = None
+
+        if future is not None:
+            try:
+                entry = future.result(timeout=COLD_START_WAIT)
+            except TimeoutError:
+                return {"error": "Forecast model is training, try again shortly"}
+            except PoolSaturated:
+                return {"error": "Forecast unavailable, analytics workers are busy; try again shortly"}
+            except Exception as e:
+                return {"error": str(e)}
+
+        try:
+            with timed("ml.predict"):
+                return predict_next_close(entry.model, entry.rmse, features)
+        except Exception as e:
+            print(f"ML Error: {e}")
+            return {"error": str(e)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "max_entries": self.max_entries,
+                "training": len(self._training),
+                "max_age": self.max_age,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "cold_starts": self.cold_starts,
+                "trainings": self.trainings,
+                "disk_loads": self.disk_loads,
+                "skipped": self.skipped,
+                "errors": self.errors,
+                "evictions": self.evictions,
+            }
+
+
+def _columns(df, names) -> dict:
+    return {name: np.ascontiguousarray(df[name].to_numpy(dtype='float64')) for name in names}
+
+
+registry = ModelRegistry()
+
+
+def forecast_mode(ticker: str) -> str:
+    return FORECAST_MODE_OVERRIDES.get(ticker, FORECAST_MODE)
+
+
+def get_forecast(result, mode: str = None) -> dict:
+    """
+    Forecast for a MarketData result with the ticker's model (mode overrides FORECAST_MODE /
+    FORECAST_MODE_OVERRIDES). Mock (fallback) data is random on every call, so forest
+    forecasts for it are fitted once per call and never registered or persisted.
+    """
+    mode = mode or forecast_mode(result.ticker)
+    if mode == "online":
+        return online_forecast(result)
+    forecast = _forest_forecast(result)
+    if mode == "both" and forecast is not None and not result.df.empty:
+        forecast = {**forecast, "online": online_forecast(result)}
+    return forecast
+
+
+def _forest_forecast(result) -> dict:
+    if result.df.empty:
+        return {}
+    if result.is_mock:
+        if len(result.df) < FORECAST_MIN_BARS:
+            return {"error": "Not enough data for ML prediction (need 50+ candles)"}
+        try:
+            return analytics_pool.run(forecast_once, _columns(result.df, ['open', 'high', 'low', 'close', 'volume']))
+        except PoolSaturated:
+            return {"error": "Forecast unavailable, analytics workers are busy; try again shortly"}
+        except TimeoutError as e:
+            return {"error": str(e)}
+    return registry.get_forecast(f"{result.ticker}_{result.interval}", result.df)
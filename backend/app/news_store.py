@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from .cache import TTLCache
+
+# Shared news store.
+#
+# News is cached per ticker (stale-while-revalidate, coalesced), so a popular ticker costs one
+# provider call per window however many pages show it. Articles from Yahoo and NewsAPI are
+# deduplicated by a fingerprint of the normalized title, sentiment is cached per fingerprint
+# (each headline is scored once, not once per load), and every provider call goes through a
+# request budget so a burst of cold tickers can't exhaust NewsAPI's daily quota.
+
+NEWS_CACHE_TTL = int(os.getenv("NEWS_CACHE_TTL", "300"))
+NEWS_CACHE_STALE_TTL = int(os.getenv("NEWS_CACHE_STALE_TTL", "900"))
+NEWS_CACHE_MAX_ENTRIES = int(os.getenv("NEWS_CACHE_MAX_ENTRIES", "512"))
+NEWS_SENTIMENT_MAX_ENTRIES = int(os.getenv("NEWS_SENTIMENT_MAX_ENTRIES", "20000"))
+
+# Calls allowed per provider per window (seconds); NewsAPI's developer plan is 100 requests/day
+YAHOO_NEWS_BUDGET = int(os.getenv("YAHOO_NEWS_BUDGET", "120"))
+YAHOO_NEWS_BUDGET_WINDOW = int(os.getenv("YAHOO_NEWS_BUDGET_WINDOW", "60"))
+NEWSAPI_BUDGET = int(os.getenv("NEWSAPI_BUDGET", "100"))
+NEWSAPI_BUDGET_WINDOW = int(os.getenv("NEWSAPI_BUDGET_WINDOW", str(24 * 3600)))
+
+news_cache = TTLCache(
+    "news",
+    ttl=NEWS_CACHE_TTL,
+    stale_ttl=NEWS_CACHE_STALE_TTL,
+    max_entries=NEWS_CACHE_MAX_ENTRIES,
+)
+# Fingerprint -> sentiment score; headlines don't change, so this outlives the news cache
+article_sentiment = TTLCache("news_sentiment", ttl=7 * 24 * 3600, max_entries=NEWS_SENTIMENT_MAX_ENTRIES)
+
+
+class RequestBudget:
+    """
+    Sliding-window call budget: at most `limit` acquisitions per `window` seconds.
+    """
+
+    def __init__(self, name: str, limit: int, window: float):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+        self.granted = 0
+        self.denied = 0
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and now - self._calls[0] >= self.window:
+                self._calls.popleft()
+            if len(self._calls) >= self.limit:
+                self.denied += 1
+                return False
+            self._calls.append(now)
+            self.granted += 1
+            return True
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            used = sum(1 for t in self._calls if now - t < self.window)
+            return {
+                "limit": self.limit,
+                "window": self.window,
+                "used": used,
+                "granted": self.granted,
+                "denied": self.denied,
+            }
+
+
+provider_budgets = {
+    "yahoo": RequestBudget("yahoo", YAHOO_NEWS_BUDGET, YAHOO_NEWS_BUDGET_WINDOW),
+    "newsapi": RequestBudget("newsapi", NEWSAPI_BUDGET, NEWSAPI_BUDGET_WINDOW),
+}
+
+# NewsAPI appends the publisher to titles ("Apple beats estimates - Reuters")
+_PUBLISHER_SUFFIX = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def title_fingerprint(title: str) -> str:
+    """
+    Same story, same fingerprint: case, punctuation, whitespace and a trailing
+    " - Publisher" are ignored.
+    """
+    normalized = _PUBLISHER_SUFFIX.sub("", title or "").lower()
+    normalized = _NON_ALNUM.sub(" ", normalized).strip()
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+def dedup_articles(items: list) -> list:
+    """
+    Drops repeats of a story (first occurrence wins) and sets item["fingerprint"].
+    """
+    seen = set()
+    unique = []
+    for item in items:
+        fingerprint = title_fingerprint(item.get("title"))
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        item["fingerprint"] = fingerprint
+        unique.append(item)
+    return unique
+
+
+def score_articles(items: list, scorer) -> list:
+    """
+    Sentiment score per item (same order), scoring only headlines not seen before.
+    Items need a "fingerprint" (see dedup_articles).
+    """
+    scores = [article_sentiment.peek(item["fingerprint"]) for item in items]
+    missing = [i for i, score in enumerate(scores) if score is None]
+    if missing:
+        for i, score in zip(missing, scorer.score_batch([items[i]["title"] for i in missing])):
+            article_sentiment.put(items[i]["fingerprint"], score)
+            scores[i] = score
+    return scores
+
+
+def news_store_stats() -> dict:
+    return {name: budget.stats() for name, budget in provider_budgets.items()}
@@ -0,0 +1,230 @@
+import math
+import os
+import threading
+from collections import deque
+
+import numpy as np
+
+from .analysis_engine import FORECAST_MIN_BARS, forecast_confidence
+from .cache import TTLCache
+from .indicator_engine import _EMA, sync_bars
+from .metrics import timed
+
+# Online next-close forecaster, the low-latency alternative to the RandomForest registry.
+#
+# Same inputs as the forest (return_1d, vol_change, high_low_pct, rsi, macd), kept up to date
+# bar by bar with the incremental RSI/MACD state from indicator_engine, and a linear model of
+# the next bar's return fitted by recursive least squares with exponential forgetting, so
+# recent bars weigh more. Folding in a bar is one rank-1 update of a 6x6 matrix (~20 us per
+# bar with the feature updates); there is no refit, ever.
+#
+# Inputs are put on comparable scales first: rsi centred to [-1, 1], macd as a fraction of
+# the close, vol_change clipped (a volume spike would otherwise dominate the fit).
+#
+# Like IndicatorEngine, the last bar is still forming: it is only predicted from, and learned
+# once the next bar arrives. The reported RMSE is prequential: every committed close is first
+# scored against the prediction made the bar before (in price units, like the forest's
+# held-out RMSE), then learned; the last ONLINE_FORECAST_RMSE_WINDOW errors are kept.
+
+ONLINE_FORGETTING = float(os.getenv("ONLINE_FORECAST_FORGETTING", "0.995"))
+ONLINE_RMSE_WINDOW = int(os.getenv("ONLINE_FORECAST_RMSE_WINDOW", "50"))
+ONLINE_PRIOR = float(os.getenv("ONLINE_FORECAST_PRIOR", "1.0"))  # initial P = prior * I (ridge strength 1/prior)
+ONLINE_TTL = int(os.getenv("ONLINE_FORECAST_TTL", "3600"))
+ONLINE_MAX_ENTRIES = int(os.getenv("ONLINE_FORECAST_MAX_ENTRIES", "512"))
+
+NAN = float("nan")
+N_INPUTS = 6  # intercept + the five features
+# Bound on trace(P): quiet stretches (inputs barely moving) would otherwise let forgetting wind it up
+MAX_TRACE = 1e4
+
+
+class OnlineForecaster:
+    """
+    Recursive-least-squares forecaster for one price series.
+    Feed it a DataFrame with sync() (or bars with append()/revise()) and read forecast().
+    """
+
+    RSI_WINDOW = 14
+
+    def __init__(self, forgetting: float = ONLINE_FORGETTING, rmse_window: int = ONLINE_RMSE_WINDOW,
+                 prior: float = ONLINE_PRIOR):
+        self.lock = threading.Lock()
+        self.forgetting = forgetting
+        self.rmse_window = rmse_window
+        self.prior = prior
+        self.reset()
+
+    def reset(self):
+        self.committed = 0
+        self.bar = None             # last (still-forming) bar: (open, high, low, close, volume)
+        self.prev = None            # last committed bar
+        self.prev_inputs = None     # its (inputs, complete), learned once the next close is committed
+        self.first_date = None
+        self.last_date = None
+        self._synced_df = None
+        self._forecast = None
+
+        self.rsi_up = _EMA(1 / self.RSI_WINDOW, self.RSI_WINDOW)
+        self.rsi_down = _EMA(1 / self.RSI_WINDOW, self.RSI_WINDOW)
+        self.ema_fast = _EMA(2 / (12 + 1), 12)
+        self.ema_slow = _EMA(2 / (26 + 1), 26)
+
+        self.weights = np.zeros(N_INPUTS)
+        self.P = np.eye(N_INPUTS) * self.prior
+        self.updates = 0
+        self.errors = deque()
+        self.sq_sum = 0.0
+
+    # --- bar updates ---
+
+    def append(self, bar, date=None):
+        if self.bar is not None:
+            self._commit(self.bar)
+        if self.first_date is None:
+            self.first_date = date
+        self.bar = tuple(float(v) for v in bar)
+        self.last_date = date
+        self._forecast = None
+
+    def revise(self, bar):
+        """
+        Replaces the last bar (e.g. the intraday candle moved).
+        """
+        if self.bar is None:
+            raise ValueError("No bar to revise")
+        self.bar = tuple(float(v) for v in bar)
+        self._forecast = None
+
+    def __len__(self):
+        return self.committed + (self.bar is not None)
+
+    def _inputs(self, bar, commit: bool):
+        # (inputs, all defined) for bar on top of the committed state; commit=True also folds bar into it
+        open_, high, low, close, volume = bar
+        prev = self.prev
+        if prev is None:
+            ret = vol = NAN
+            up = down = 0.0
+        else:
+            ret = close / prev[3] - 1 if prev[3] else NAN
+            vol = min(max(volume / prev[4] - 1, -1.0), 3.0) if prev[4] > 0 else NAN
+            diff = close - prev[3]
+            up, down = (diff if diff > 0 else 0.0), (-diff if diff < 0 else 0.0)
+
+        avg_up, avg_down = self.rsi_up.peek(up), self.rsi_down.peek(down)
+        rsi = 100.0 if avg_down == 0 else 100 - (100 / (1 + avg_up / avg_down))
+        slow = self.ema_slow.peek(close)
+        macd = self.ema_fast._next(close) - slow if not math.isnan(slow) else NAN
+
+        if commit:
+            self.rsi_up.push(up)
+            self.rsi_down.push(down)
+            self.ema_fast.push(close)
+            self.ema_slow.push(close)
+
+        values = (1.0, ret, vol, (high - low) / close, (rsi - 50) / 50, macd / close) if close else \
+                 (1.0, ret, vol, NAN, (rsi - 50) / 50, NAN)
+        complete = not any(v != v for v in values)
+        return np.array(values), complete
+
+    def _commit(self, bar):
+        close = bar[3]
+        inputs = self._inputs(bar, commit=True)
+        if self.prev_inputs is not None and self.prev[3]:
+            # Score the prediction made one bar ago, then learn from the realized return
+            x, complete = self.prev_inputs
+            prev_close = self.prev[3]
+            predicted = prev_close * (1 + float(self.weights @ (x if complete else np.nan_to_num(x))))
+            err = (predicted - close) ** 2
+            self.errors.append(err)
+            self.sq_sum += err
+            if len(self.errors) > self.rmse_window:
+                self.sq_sum -= self.errors.popleft()
+            if self.committed % self.rmse_window == 0:
+                self.sq_sum = math.fsum(self.errors)  # so subtraction drift can't accumulate
+            if complete:
+                self._learn(x, close / prev_close - 1)
+
+        self.prev = bar
+        self.prev_inputs = inputs
+        self.committed += 1
+
+    def _learn(self, x: np.ndarray, target: float):
+        lam = self.forgetting
+        Px = self.P @ x
+        denom = lam + x @ Px
+        self.weights += Px * ((target - self.weights @ x) / denom)
+        # outer(Px, Px) is exactly symmetric, so P stays symmetric without re-symmetrizing
+        P = (self.P - np.outer(Px, Px) / denom) / lam
+        trace = P.trace()
+        if trace > MAX_TRACE:
+            P *= MAX_TRACE / trace
+        self.P = P
+        self.updates += 1
+
+    # --- outputs ---
+
+    def rmse(self) -> float:
+        if not self.errors:
+            return NAN
+        return math.sqrt(max(self.sq_sum, 0.0) / len(self.errors))
+
+    def forecast(self) -> dict:
+        """
+        Next-close prediction from the last bar, shaped like predict_next_close().
+        """
+        if self._forecast is not None:
+            return self._forecast
+        if len(self) < FORECAST_MIN_BARS:
+            return {"error": "Not enough data for ML prediction (need 50+ candles)"}
+
+        current_price = self.bar[3]
+        x, complete = self._inputs(self.bar, commit=False)
+        if not complete:
+            x = np.nan_to_num(x)  # like the forest's fillna(0)
+        next_price = current_price * (1 + float(self.weights @ x))
+        rmse = self.rmse()
+        self._forecast = {
+            "predicted_price": round(next_price, 2),
+            "predicted_change_percent": round((next_price - current_price) / current_price * 100, 2),
+            "direction": "Up" if next_price > current_price else "Down",
+            "confidence": forecast_confidence(rmse, current_price),
+            "model_error_rmse": round(rmse, 2),
+            "model": "online",
+            "bars_learned": self.updates,
+        }
+        return self._forecast
+
+    # --- DataFrame reconciliation ---
+
+    def sync(self, df) -> dict:
+        """
+        Brings the model in line with df (columns: date + OHLCV) and returns forecast().
+        Bars after the last one learned are folded in one by one, also when a period-bounded
+        window slid past its old first bar; if history changed underneath (backfill, a revised
+        close), the model is rebuilt from df.
+        """
+        if df is self._synced_df and self._forecast is not None:
+            return self._forecast
+        if not sync_bars(self, df):
+            return {}
+        return self.forecast()
+
+
+# One forecaster per ticker/period/interval, like the indicator engines
+forecasters = TTLCache("online_forecasters", ttl=ONLINE_TTL, max_entries=ONLINE_MAX_ENTRIES)
+
+
+def online_forecast(result) -> dict:
+    """
+    Online-model forecast for a MarketData result, updated from the previous call for the
+    same ticker/period/interval. Mock (fallback) data gets a throwaway model.
+    """
+    if result.df.empty:
+        return {}
+    if result.is_mock:
+        return OnlineForecaster().sync(result.df)
+    key = f"{result.ticker}_{result.period}_{result.interval}"
+    forecaster = forecasters.get_or_load(key, OnlineForecaster)
+    with timed("ml.online"), forecaster.lock:
+        return forecaster.sync(result.df)
@@ -0,0 +1,270 @@
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import indicators as ind
+from .analysis_engine import candlestick_patterns
+
+# Vectorized pattern scanner: candlestick families and swing-point structures over a whole
+# history in one pass, returned as an index of occurrences.
+#
+# Candlestick patterns are elementwise comparisons of shifted OHLC arrays (shift along the
+# first axis, so (bars, tickers) panels work too). Shapes only, no trend filter; a pattern
+# is reported on the bar that completes it.
+#
+# Structures are built on swing pivots: a bar whose high (low) is the extreme of the `order`
+# bars on each side. A pivot is only known `order` bars later, so the last `order` bars never
+# hold one. Pivots are reduced to an alternating zigzag (highest high / lowest low of each run),
+# and the structures are checks over sliding windows of zigzag points:
+#   double top / bottom   H-L-H (L-H-L) with both extremes within DOUBLE_TOLERANCE and the
+#                         middle swing at least DOUBLE_MIN_DEPTH away (the neckline)
+#   harmonic XABCD        five alternating points whose AB/XA, BC/AB, CD/BC and AD/XA ratios
+#                         fall in a pattern's ranges (widened by HARMONIC_TOLERANCE)
+
+PATTERN_ORDER = int(os.getenv("PATTERN_PIVOT_ORDER", "5"))  # bars on each side of a pivot
+DOUBLE_TOLERANCE = float(os.getenv("PATTERN_DOUBLE_TOLERANCE", "0.03"))
+DOUBLE_MIN_DEPTH = float(os.getenv("PATTERN_DOUBLE_MIN_DEPTH", "0.03"))
+HARMONIC_TOLERANCE = float(os.getenv("PATTERN_HARMONIC_TOLERANCE", "0.05"))
+
+
+def _prev(x: np.ndarray, k: int = 1) -> np.ndarray:
+    # x shifted k bars forward along axis 0 (the first k rows repeat row 0; callers mask them)
+    out = np.empty_like(x)
+    out[k:] = x[:-k] if k else x
+    out[:k] = x[:1]
+    return out
+
+
+def candle_patterns(open_, high, low, close) -> dict:
+    """
+    {pattern name: per-bar boolean array} for every candlestick pattern in CANDLE_PATTERNS.
+    """
+    open_, high, low, close = (ind.as_array(x) for x in (open_, high, low, close))
+    doji, hammer, bullish_engulfing = candlestick_patterns(open_, high, low, close)
+
+    body = np.abs(close - open_)
+    top, bottom = np.maximum(open_, close), np.minimum(open_, close)
+    upper_wick, lower_wick = high - top, bottom - low
+    bull, bear = close > open_, close < open_
+    long_body = body > 0.5 * (high - low)
+
+    o1, c1, body1, bull1, bear1 = _prev(open_), _prev(close), _prev(body), _prev(bull), _prev(bear)
+    o2, c2, body2, bull2, bear2 = _prev(open_, 2), _prev(close, 2), _prev(body, 2), _prev(bull, 2), _prev(bear, 2)
+    long2 = _prev(long_body, 2)
+    top1, bottom1 = np.maximum(o1, c1), np.minimum(o1, c1)
+
+    bars = np.arange(len(close)).reshape((-1,) + (1,) * (close.ndim - 1))
+    has1, has2 = bars >= 1, bars >= 2
+
+    # Shooting star: hammer upside down (long upper wick, small lower wick)
+    shooting_star = (upper_wick > 2 * body) & (lower_wick < body)
+    # Bearish engulfing: green candle, then a red body covering it
+    bearish_engulfing = has1 & bull1 & bear & (open_ > c1) & (close < o1)
+    # Harami: a smaller opposite-colour body inside the previous one
+    bullish_harami = has1 & bear1 & bull & (open_ > c1) & (close < o1) & (body < body1)
+    bearish_harami = has1 & bull1 & bear & (open_ < c1) & (close > o1) & (body < body1)
+    # Stars: long candle, small body beyond its close, then a candle closing past the first's midpoint
+    small_star = body1 < 0.3 * body2
+    morning_star = has2 & long2 & bear2 & small_star & (top1 <= c2) & bull & (close > (o2 + c2) / 2)
+    evening_star = has2 & long2 & bull2 & small_star & (bottom1 >= c2) & bear & (close < (o2 + c2) / 2)
+    # Three soldiers / crows: three long same-colour candles, each opening inside the previous
+    # body and closing beyond it
+    long1 = _prev(long_body)
+    three_white_soldiers = has2 & bull2 & bull1 & bull & long2 & long1 & long_body & \
+        (c1 > c2) & (close > c1) & (o1 > o2) & (o1 < c2) & (open_ > o1) & (open_ < c1) & \
+        (upper_wick < 0.3 * body)
+    three_black_crows = has2 & bear2 & bear1 & bear & long2 & long1 & long_body & \
+        (c1 < c2) & (close < c1) & (o1 < o2) & (o1 > c2) & (open_ < o1) & (open_ > c1) & \
+        (lower_wick < 0.3 * body)
+
+    return {
+        "doji": doji,
+        "hammer": hammer,
+        "shooting_star": shooting_star,
+        "bullish_engulfing": bullish_engulfing,
+        "bearish_engulfing": bearish_engulfing,
+        "bullish_harami": bullish_harami,
+        "bearish_harami": bearish_harami,
+        "morning_star": morning_star,
+        "evening_star": evening_star,
+        "three_white_soldiers": three_white_soldiers,
+        "three_black_crows": three_black_crows,
+    }
+
+
+# Bias of each candlestick pattern ("neutral" for doji)
+CANDLE_PATTERNS = {
+    "doji": "neutral",
+    "hammer": "bullish",
+    "shooting_star": "bearish",
+    "bullish_engulfing": "bullish",
+    "bearish_engulfing": "bearish",
+    "bullish_harami": "bullish",
+    "bearish_harami": "bearish",
+    "morning_star": "bullish",
+    "evening_star": "bearish",
+    "three_white_soldiers": "bullish",
+    "three_black_crows": "bearish",
+}
+
+
+def pivots(high, low, order: int = PATTERN_ORDER):
+    """
+    (pivot_high, pivot_low) boolean arrays: the bar's high (low) is the highest (lowest) of the
+    `order` bars on each side. On a plateau only the first bar counts.
+    """
+    high, low = ind.as_array(high), ind.as_array(low)
+    n = len(high)
+    is_high, is_low = np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+    if order < 1 or n < 2 * order + 1:
+        return is_high, is_low
+    centre = slice(order, n - order)
+    win_high = sliding_window_view(high, 2 * order + 1).max(axis=1)
+    win_low = sliding_window_view(low, 2 * order + 1).min(axis=1)
+    left_high = sliding_window_view(high[:-1], order).max(axis=1)[:n - 2 * order]
+    left_low = sliding_window_view(low[:-1], order).min(axis=1)[:n - 2 * order]
+    is_high[centre] = (high[centre] == win_high) & (high[centre] > left_high)
+    is_low[centre] = (low[centre] == win_low) & (low[centre] < left_low)
+    return is_high, is_low
+
+
+def zigzag(high, low, order: int = PATTERN_ORDER):
+    """
+    Alternating swing points (index, price, is_high), sorted by bar. Consecutive pivots of
+    the same kind collapse to the most extreme one; a bar that is both a pivot high and a
+    pivot low (an outside bar) keeps only its high.
+    """
+    high, low = ind.as_array(high), ind.as_array(low)
+    is_high, is_low = pivots(high, low, order)
+    is_low &= ~is_high
+    index = np.flatnonzero(is_high | is_low)
+    if len(index) == 0:
+        return index, np.empty(0), np.empty(0, dtype=bool)
+    kind = is_high[index]
+    price = np.where(kind, high[index], low[index])
+
+    # Runs of the same kind; keep the highest high / lowest low of each (first on ties)
+    run = np.concatenate(([0], np.cumsum(kind[1:] != kind[:-1])))
+    score = np.where(kind, price, -price)
+    order_in_run = np.lexsort((index, -score, run))
+    first = np.ones(len(order_in_run), dtype=bool)
+    first[1:] = run[order_in_run][1:] != run[order_in_run][:-1]
+    keep = np.sort(order_in_run[first])
+    return index[keep], price[keep], kind[keep]
+
+
+def double_tops_bottoms(index, price, kind, tolerance: float = DOUBLE_TOLERANCE,
+                        min_depth: float = DOUBLE_MIN_DEPTH) -> list:
+    """
+    Double tops / bottoms over zigzag points. Each is reported on its second extreme.
+    """
+    if len(index) < 3:
+        return []
+    first, middle, second = price[:-2], price[1:-1], price[2:]
+    top = kind[:-2]  # H-L-H; L-H-L otherwise
+    level = np.maximum(first, second)
+    similar = np.abs(first - second) <= tolerance * level
+    depth = np.where(top, np.minimum(first, second) - middle, middle - np.maximum(first, second))
+    hits = np.flatnonzero(similar & (depth >= min_depth * level))
+    return [{
+        "pattern": "double_top" if top[i] else "double_bottom",
+        "direction": "bearish" if top[i] else "bullish",
+        "index": int(index[i + 2]),
+        "start": int(index[i]),
+        "points": [round(float(p), 4) for p in price[i:i + 3]],
+        "neckline": round(float(middle[i]), 4),
+    } for i in hits]
+
+
+# Harmonic XABCD ratio ranges: AB/XA, BC/AB, CD/BC, AD/XA
+HARMONIC_PATTERNS = {
+    "gartley": ((0.618, 0.618), (0.382, 0.886), (1.272, 1.618), (0.786, 0.786)),
+    "bat": ((0.382, 0.5), (0.382, 0.886), (1.618, 2.618), (0.886, 0.886)),
+    "butterfly": ((0.786, 0.786), (0.382, 0.886), (1.618, 2.24), (1.27, 1.618)),
+    "crab": ((0.382, 0.618), (0.382, 0.886), (2.24, 3.618), (1.618, 1.618)),
+}
+
+
+def harmonics(index, price, kind, tolerance: float = HARMONIC_TOLERANCE) -> list:
+    """
+    Harmonic XABCD patterns over zigzag points. Each is reported on D; bullish when D is a low.
+    """
+    if len(index) < 5:
+        return []
+    points = sliding_window_view(price, 5)
+    x, a, b, c, d = points.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = np.stack([
+            np.abs(b - a) / np.abs(a - x),
+            np.abs(c - b) / np.abs(b - a),
+            np.abs(d - c) / np.abs(c - b),
+            np.abs(a - d) / np.abs(a - x),
+        ])
+    occurrences = []
+    for name, ranges in HARMONIC_PATTERNS.items():
+        lo = np.array([r[0] for r in ranges])[:, None] * (1 - tolerance)
+        hi = np.array([r[1] for r in ranges])[:, None] * (1 + tolerance)
+        for i in np.flatnonzero(((ratios >= lo) & (ratios <= hi)).all(axis=0)):
+            bullish = not kind[i + 4]
+            occurrences.append({
+                "pattern": name,
+                "direction": "bullish" if bullish else "bearish",
+                "index": int(index[i + 4]),
+                "start": int(index[i]),
+                "points": [round(float(p), 4) for p in points[i]],
+                "ratios": [round(float(r), 3) for r in ratios[:, i]],
+            })
+    return occurrences
+
+
+def scan(df, order: int = PATTERN_ORDER, names=None) -> list:
+    """
+    Every pattern occurrence in df (columns open/high/low/close, optional date), sorted by bar.
+    names limits the scan to those patterns (candlestick names, "double_top", "double_bottom",
+    or harmonic names). Each occurrence: {"pattern", "direction", "index", "time", ...}.
+    """
+    open_, high, low, close = (ind.as_array(df[col]) for col in ('open', 'high', 'low', 'close'))
+    wanted = set(names) if names else None
+    occurrences = []
+
+    for name, hits in candle_patterns(open_, high, low, close).items():
+        if wanted is not None and name not in wanted:
+            continue
+        occurrences += [{"pattern": name, "direction": CANDLE_PATTERNS[name], "index": int(i)}
+                        for i in np.flatnonzero(hits)]
+
+    structures = {"double_top", "double_bottom", *HARMONIC_PATTERNS}
+    if wanted is None or wanted & structures:
+        points = zigzag(high, low, order)
+        found = double_tops_bottoms(*points) + harmonics(*points)
+        occurrences += [o for o in found if wanted is None or o["pattern"] in wanted]
+
+    occurrences.sort(key=lambda o: (o["index"], o["pattern"]))
+    if occurrences and 'date' in getattr(df, 'columns', ()):
+        # Same day format as the chart payload's "time", formatted for the hit bars only
+        hits = [o["index"] for o in occurrences]
+        for o, time in zip(occurrences, df['date'].iloc[hits].dt.strftime('%Y-%m-%d').tolist()):
+            o["time"] = time
+    return occurrences
+
+
+def pattern_names() -> list:
+    return list(CANDLE_PATTERNS) + ["double_top", "double_bottom"] + list(HARMONIC_PATTERNS)
+
+
+def recent_patterns(df, bars: int = 10, order: int = PATTERN_ORDER) -> list:
+    """
+    Readable names of the patterns completed in the last `bars` bars, newest first
+    (e.g. "Double Top (3 bars ago)"), for prompts and summaries.
+    """
+    last = len(df) - 1
+    names = []
+    for o in reversed(scan(df, order)):
+        if o["index"] <= last - bars:
+            break
+        if o["pattern"] == "doji":  # too common to be worth a mention
+            continue
+        ago = last - o["index"]
+        names.append(f"{o['pattern'].replace('_', ' ').title()} ({'last bar' if ago == 0 else '1 bar ago' if ago == 1 else f'{ago} bars ago'})")
+    return names
@@ -0,0 +1,280 @@
+import gzip
+import importlib.util
+import math
+import os
+import threading
+
+import numpy as np
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from .lazy import lazy_import
+from .metrics import timed
+
+# Response encodings for /api/market-data.
+#
+# The default stays what clients get today: application/json with market_data as a list of
+# per-bar dicts (now serialized with orjson, same bytes apart from NaN coming out as null where
+# the stdlib encoder refused the response). Clients can ask for something smaller through the
+# Accept header, or ?format= which wins over it:
+#
+#   json      application/json                         per-bar dicts (default)
+#   columnar  application/vnd.trademind.columnar+json  market_data as one array per field,
+#                                                      prices quantized to `price_decimals`
+#   msgpack   application/msgpack                      columnar, in MessagePack, with every numeric
+#                                                      column a little-endian typed array (bin):
+#                                                      prices as integers in 10^-price_decimals
+#                                                      units, volume as float64 (see "dtypes")
+#
+# Prices are quantized to PAYLOAD_PRICE_DIGITS significant digits, never fewer than
+# PAYLOAD_MIN_PRICE_DECIMALS decimals (115.3988 -> 115.40, 0.012345 -> 0.012345). The quantized
+# columns are built once per fetch and kept on the MarketData, like the chart payload.
+#
+# Bodies over PAYLOAD_COMPRESS_MIN_BYTES are compressed per Accept-Encoding: brotli when the
+# client takes it (and the brotli package is installed), else gzip.
+
+PAYLOAD_PRICE_DIGITS = int(os.getenv("PAYLOAD_PRICE_DIGITS", "5"))
+PAYLOAD_MIN_PRICE_DECIMALS = int(os.getenv("PAYLOAD_MIN_PRICE_DECIMALS", "2"))
+PAYLOAD_MAX_PRICE_DECIMALS = 8
+PAYLOAD_COMPRESS_MIN_BYTES = int(os.getenv("PAYLOAD_COMPRESS_MIN_BYTES", "1024"))
+PAYLOAD_GZIP_LEVEL = int(os.getenv("PAYLOAD_GZIP_LEVEL", "5"))
+PAYLOAD_BROTLI_QUALITY = int(os.getenv("PAYLOAD_BROTLI_QUALITY", "4"))
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.trademind.columnar+json",
+    "msgpack": "application/msgpack",
+}
+_ACCEPTED = {
+    "application/json": "json",
+    "application/vnd.trademind.columnar+json": "columnar",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+
+# Optional packages (not in requirements.txt): their formats / encodings are only offered
+# when installed
+msgpack = lazy_import("msgpack")
+brotli = lazy_import("brotli")
+HAS_MSGPACK = importlib.util.find_spec("msgpack") is not None
+HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+
+
+class FormatUnavailable(Exception):
+    pass
+
+
+def available_formats() -> list:
+    return [name for name in MEDIA_TYPES if name != "msgpack" or HAS_MSGPACK]
+
+
+def _media_ranges(header: str):
+    # (value, q) pairs of an Accept / Accept-Encoding header, best first (stable for equal q)
+    ranges = []
+    for part in (header or "").split(","):
+        value, _, params = part.strip().partition(";")
+        if not value:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        ranges.append((value.strip().lower(), q))
+    return sorted(ranges, key=lambda item: -item[1])
+
+
+def negotiate_format(accept: str = None, requested: str = None) -> str:
+    """
+    Response format for an Accept header, or the explicitly requested one.
+    Raises ValueError for an unknown `requested`, FormatUnavailable if its package is missing.
+    Accept values that match nothing fall back to json.
+    """
+    if requested is not None:
+        if requested not in MEDIA_TYPES:
+            raise ValueError(f"Unknown format (one of {', '.join(MEDIA_TYPES)})")
+        if requested not in available_formats():
+            raise FormatUnavailable(f"{requested} responses need the {requested} package installed")
+        return requested
+    formats = available_formats()
+    for media_type, q in _media_ranges(accept):
+        if q <= 0:
+            continue
+        fmt = _ACCEPTED.get(media_type)
+        if fmt in formats:
+            return fmt
+        if media_type in ("*/*", "application/*"):
+            return "json"
+    return "json"
+
+
+def negotiate_encoding(accept_encoding: str = None) -> str:
+    """
+    "br", "gzip" or None (identity) for an Accept-Encoding header.
+    """
+    accepted = {value: q for value, q in _media_ranges(accept_encoding)}
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (["br"] if HAS_BROTLI else []) + ["gzip"]:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def price_decimals(prices: np.ndarray) -> int:
+    """
+    Decimals that keep PAYLOAD_PRICE_DIGITS significant digits of the largest price.
+    """
+    finite = np.abs(prices[np.isfinite(prices)])
+    top = float(finite.max()) if finite.size else 0.0
+    if top <= 0:
+        return PAYLOAD_MIN_PRICE_DECIMALS
+    decimals = PAYLOAD_PRICE_DIGITS - 1 - math.floor(math.log10(top))
+    return min(max(decimals, PAYLOAD_MIN_PRICE_DECIMALS), PAYLOAD_MAX_PRICE_DECIMALS)
+
+
+def _columns(result) -> dict:
+    # Quantized columns for a MarketData, built once per fetch
+    cached = result.encodings.get("columns")
+    if cached is not None:
+        return cached
+    df = result.df
+    prices = df[PRICE_COLUMNS].to_numpy(dtype='float64')
+    decimals = price_decimals(prices)
+    columns = {
+        "time": [bar['time'] for bar in result.chart],
+        "prices": np.round(prices, decimals),
+        "volume": df['volume'].to_numpy(dtype='float64'),
+        "price_decimals": decimals,
+    }
+    result.encodings["columns"] = columns
+    return columns
+
+
+def columnar_market_data(result) -> dict:
+    """
+    market_data as {"time": [...], "open": [...], ..., "volume": [...], "price_decimals": n}.
+    """
+    cached = result.encodings.get("columnar")
+    if cached is not None:
+        return cached
+    columns = _columns(result)
+    prices = columns["prices"]
+    volume = columns["volume"]
+    block = {"time": columns["time"]}
+    for i, name in enumerate(PRICE_COLUMNS):
+        block[name] = prices[:, i].tolist()
+    # Volumes are whole numbers for almost every instrument; floats only when they aren't
+    whole = np.isfinite(volume).all() and (volume == np.round(volume)).all()
+    block["volume"] = volume.astype('int64').tolist() if whole else volume.tolist()
+    block["price_decimals"] = columns["price_decimals"]
+    result.encodings["columnar"] = block
+    return block
+
+
+def typed_market_data(result) -> dict:
+    """
+    market_data for MessagePack: the columnar shape with numeric columns as little-endian
+    typed-array bytes, and their dtypes (prices as integers in 10^-price_decimals units).
+    """
+    cached = result.encodings.get("typed")
+    if cached is not None:
+        return cached
+    columns = _columns(result)
+    prices = columns["prices"]
+    decimals = columns["price_decimals"]
+    block = {"time": columns["time"]}
+    dtypes = {}
+    if np.isfinite(prices).all():
+        scaled = np.rint(prices * 10 ** decimals)
+        dtype = '<i4' if np.abs(scaled).max(initial=0) < 2 ** 31 else '<i8'
+        for i, name in enumerate(PRICE_COLUMNS):
+            block[name] = scaled[:, i].astype(dtype).tobytes()
+            dtypes[name] = "int32" if dtype == '<i4' else "int64"
+    else:
+        # Gaps have no integer form: ship that fetch's prices as float64 (NaN for a gap)
+        for i, name in enumerate(PRICE_COLUMNS):
+            block[name] = prices[:, i].astype('<f8').tobytes()
+            dtypes[name] = "float64"
+    block["volume"] = columns["volume"].astype('<f8').tobytes()
+    dtypes["volume"] = "float64"
+    block["dtypes"] = dtypes
+    block["price_decimals"] = decimals
+    result.encodings["typed"] = block
+    return block
+
+
+def _default(obj):
+    # Whatever orjson can't serialize natively (numpy scalars it doesn't cover, sets, ...)
+    return jsonable_encoder(obj)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return jsonable_encoder(obj)
+
+
+def encode(response: dict, fmt: str, result=None) -> bytes:
+    """
+    Body for a market-data response dict in `fmt`. `result` (the MarketData behind
+    response["market_data"]) is needed for the columnar formats.
+    """
+    if fmt != "json" and result is not None:
+        market_data = columnar_market_data(result) if fmt == "columnar" else typed_market_data(result)
+        response = {**response, "market_data": market_data}
+    if fmt == "msgpack":
+        return msgpack.packb(response, default=_msgpack_default, use_bin_type=True)
+    return orjson.dumps(response, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=PAYLOAD_BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=PAYLOAD_GZIP_LEVEL)
+    return body
+
+
+_stats_lock = threading.Lock()
+_stats = {}  # "<format>" or "<format>+<encoding>" -> {"responses", "bytes", "bytes_sent"}
+
+
+def render(response: dict, fmt: str, encoding: str = None, result=None) -> Response:
+    """
+    Encoded (and, past PAYLOAD_COMPRESS_MIN_BYTES, compressed) Response for a market-data dict.
+    """
+    with timed(f"encode.{fmt}"):
+        body = encode(response, fmt, result)
+    size = len(body)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding and size >= PAYLOAD_COMPRESS_MIN_BYTES:
+        with timed(f"compress.{encoding}"):
+            body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    else:
+        encoding = None
+
+    key = f"{fmt}+{encoding}" if encoding else fmt
+    with _stats_lock:
+        entry = _stats.setdefault(key, {"responses": 0, "bytes": 0, "bytes_sent": 0})
+        entry["responses"] += 1
+        entry["bytes"] += size
+        entry["bytes_sent"] += len(body)
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+def payload_stats() -> dict:
+    """
+    Responses and bytes (encoded / sent after compression) per format and encoding.
+    """
+    with _stats_lock:
+        responses = {key: dict(entry) for key, entry in _stats.items()}
+    return {"formats": available_formats(), "brotli": HAS_BROTLI, "responses": responses}
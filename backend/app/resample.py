@@ -0,0 +1,175 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from .bar_store import PERIOD_DAYS, PERIOD_SESSIONS
+from .indicator_engine import latest_indicators
+from .market_data import MarketData, build_chart_payload, fetch_market_data
+
+# Multi-timeframe bars from one base fetch.
+#
+# A dashboard showing 1h, 4h and 1d used to make three upstream fetches and hold three cache
+# entries. Here the finest interval the provider has to serve is fetched once and coarser
+# bars are aggregated from it with reduceat over bin change points (first open, max high,
+# min low, last close, summed volume), no groupby.
+#
+# Intraday bins are anchored to each session's first bar (a 4h bar on a US equity covers
+# 09:30-13:30, then 13:30-16:00); daily bins are local calendar days; weekly bins run
+# Monday-Sunday; monthly / quarterly bins are calendar months / quarters.
+
+# Intervals yfinance serves, and how far back (days) it serves the intraday ones
+PROVIDER_INTERVALS = ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo"]
+PROVIDER_MAX_DAYS = {"1m": 7, "2m": 60, "5m": 60, "15m": 60, "30m": 60, "60m": 730, "90m": 60, "1h": 730}
+
+_INTERVAL = re.compile(r"^(\d+)(m|h|d|wk|mo)$")
+
+
+def parse_interval(interval: str):
+    """
+    ("intraday", minutes) | ("day", days) | ("week", weeks) | ("month", months).
+    Raises ValueError for anything else.
+    """
+    match = _INTERVAL.match(interval or "")
+    if not match:
+        raise ValueError(f"Unknown interval '{interval}'")
+    count, unit = int(match.group(1)), match.group(2)
+    if count <= 0:
+        raise ValueError(f"Unknown interval '{interval}'")
+    if unit == "m":
+        return ("intraday", count)
+    if unit == "h":
+        return ("intraday", count * 60)
+    if unit == "d":
+        return ("day", count)
+    if unit == "wk":
+        return ("week", count)
+    return ("month", count)
+
+
+def derivable(base: str, target: str) -> bool:
+    """
+    True if target bars can be aggregated exactly from base bars.
+    """
+    base_kind, base_n = parse_interval(base)
+    target_kind, target_n = parse_interval(target)
+    if base == target:
+        return True
+    if base_kind == "intraday":
+        return target_kind != "intraday" or target_n % base_n == 0
+    if base_kind == "day":
+        return base_n == 1 and target_kind in ("day", "week", "month")
+    if base_kind == "week":
+        return target_kind == "week" and target_n % base_n == 0
+    return target_kind == "month" and target_n % base_n == 0
+
+
+def _sort_key(interval: str):
+    kind, n = parse_interval(interval)
+    minutes = {"intraday": 1, "day": 1440, "week": 7 * 1440, "month": 30 * 1440}[kind]
+    return n * minutes
+
+
+def plan_fetches(intervals: list, period: str) -> dict:
+    """
+    Maps each requested interval to the base interval to fetch it from, fetching as few
+    base intervals as possible. Intraday bases the provider can't serve for the whole
+    period are skipped (daily-and-up targets then come from 1d bars).
+    """
+    if period in PERIOD_SESSIONS:
+        days = PERIOD_SESSIONS[period] * 7 // 5 + 4
+    else:
+        days = 366 if period == "ytd" else PERIOD_DAYS.get(period)  # None: "max" (or unknown)
+    plan = {}
+    bases = []
+    for target in sorted(dict.fromkeys(intervals), key=_sort_key):
+        base = next((b for b in bases if derivable(b, target)), None)
+        if base is None:
+            candidates = [iv for iv in PROVIDER_INTERVALS if derivable(iv, target) and (
+                iv not in PROVIDER_MAX_DAYS or (days is not None and days <= PROVIDER_MAX_DAYS[iv]))]
+            if not candidates:
+                raise ValueError(f"Interval '{target}' can't be served for period '{period}'")
+            # The target itself if the provider has it, else the coarsest interval dividing it
+            base = target if target in candidates else max(candidates, key=_sort_key)
+            bases.append(base)
+        plan[target] = base
+    return plan
+
+
+_DAY_NS = 86_400 * 1_000_000_000
+
+
+def _wall_clock_ns(dates: pd.Series) -> np.ndarray:
+    # Local wall-clock time, so day and session boundaries follow the exchange's calendar
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates.dt.as_unit("ns").array.asi8
+
+
+def _bin_starts(dates: pd.Series, interval: str) -> np.ndarray:
+    """
+    Row indices where a new target bar begins (dates sorted ascending).
+    """
+    kind, n = parse_interval(interval)
+    t = _wall_clock_ns(dates)
+    day = t // _DAY_NS
+    if kind == "intraday":
+        new_day = np.ones(len(t), dtype=bool)
+        new_day[1:] = day[1:] != day[:-1]
+        day_starts = np.flatnonzero(new_day)
+        session_open = np.repeat(t[day_starts], np.diff(np.append(day_starts, len(t))))
+        labels = day * 1440 + (t - session_open) // (n * 60 * 1_000_000_000)
+    elif kind == "day":
+        labels = day // n
+    elif kind == "week":
+        labels = (day + 3) // (7 * n)  # Monday-based: 1970-01-01 was a Thursday
+    else:
+        labels = (dates.dt.year.to_numpy() * 12 + dates.dt.month.to_numpy() - 1) // n
+    change = np.ones(len(labels), dtype=bool)
+    change[1:] = labels[1:] != labels[:-1]
+    return np.flatnonzero(change)
+
+
+def resample_ohlcv(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Aggregates normalized bars (date + OHLCV, sorted) into `interval` bars.
+    Each bar is stamped with the time of its first source bar.
+    """
+    if df.empty:
+        return df
+    starts = _bin_starts(df['date'], interval)
+    ends = np.append(starts[1:], len(df)) - 1
+    return pd.DataFrame({
+        'date': df['date'].iloc[starts].reset_index(drop=True),
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(df['volume'].to_numpy(), starts),
+    })
+
+
+def fetch_timeframes(ticker: str, intervals: list, period: str = "1mo") -> dict:
+    """
+    {interval: MarketData} for every requested interval, from one fetch per base interval
+    (see plan_fetches). Raises ValueError for an unknown interval or an unservable plan.
+    """
+    plan = plan_fetches(intervals, period)
+    bases = {base: fetch_market_data(ticker, period, base) for base in set(plan.values())}
+    results = {}
+    for target, base in plan.items():
+        source = bases[base]
+        if target == base:
+            results[target] = source
+            continue
+        df = resample_ohlcv(source.df, target)
+        results[target] = MarketData(ticker, period, target, df, build_chart_payload(df), is_mock=source.is_mock)
+    return results
+
+
+def multi_timeframe_indicators(ticker: str, intervals: list, period: str = "1mo") -> dict:
+    """
+    {interval: indicator summary} for several timeframes in one call.
+    """
+    return {interval: latest_indicators(result)
+            for interval, result in fetch_timeframes(ticker, intervals, period).items()}
@@ -0,0 +1,316 @@
+import os
+import re
+import time
+
+import numpy as np
+
+from .analysis_engine import _round_finite
+from .cache import TTLCache
+from .lazy import lazy_import
+from .market_data import iter_market_data_batch
+from .metrics import timed
+from .patterns import candle_patterns
+
+scipy_signal = lazy_import("scipy.signal")
+
+# Cross-sectional screener.
+#
+# A universe's history is kept as a panel: one (bars, tickers) float64 array per OHLCV field,
+# right-aligned so the last row is every ticker's latest bar. Shorter histories are padded at
+# the top with their first bar, which makes the padding invisible to the recursive filters
+# (an EMA fed a constant it was seeded with stays at that constant), so RSI, MACD, ATR etc.
+# come out exactly as the per-ticker kernels compute them, for all tickers in one pass of
+# lfilter / slicing along axis 0. Windows longer than a ticker's history are masked by length.
+#
+# The latest values form a table (one array per field); a query like "rsi < 30 and above cloud"
+# is just boolean masks over it, so once a panel is built screening costs microseconds.
+
+SCREENER_PERIOD = os.getenv("SCREENER_PERIOD", "1y")
+SCREENER_MAX_TICKERS = int(os.getenv("SCREENER_MAX_TICKERS", "5000"))
+SCREENER_UNIVERSE = [t.strip().upper() for t in os.getenv(
+    "SCREENER_UNIVERSE",
+    "AAPL,MSFT,NVDA,AMZN,GOOGL,META,TSLA,AVGO,JPM,V,MA,UNH,XOM,JNJ,PG,HD,COST,ABBV,MRK,KO,"
+    "PEP,BAC,WMT,NFLX,AMD,CRM,ORCL,ADBE,INTC,DIS,SPY,QQQ,BTC-USD,ETH-USD",
+).split(",") if t.strip()]
+
+# Built panels are kept (and refreshed in the background once stale) per universe
+panels = TTLCache(
+    "screener_panels",
+    ttl=int(os.getenv("SCREENER_PANEL_TTL", "60")),
+    stale_ttl=int(os.getenv("SCREENER_PANEL_STALE_TTL", "300")),
+    max_entries=int(os.getenv("SCREENER_PANEL_MAX_ENTRIES", "8")),
+)
+
+NUMERIC_FIELDS = ["price", "change_pct", "volume", "rsi", "macd", "macd_signal", "macd_hist",
+                  "bb_position", "sma_50", "sma_200", "atr", "atr_pct"]
+FLAG_FIELDS = ["golden_cross", "above_cloud", "below_cloud", "in_cloud", "macd_bullish",
+               "oversold", "overbought", "doji", "hammer", "shooting_star", "bullish_engulfing",
+               "bearish_engulfing", "bullish_harami", "bearish_harami", "morning_star", "evening_star",
+               "three_white_soldiers", "three_black_crows"]
+# Candles a pattern spans (it needs that much history)
+PATTERN_BARS = {"doji": 1, "hammer": 1, "shooting_star": 1, "bullish_engulfing": 2, "bearish_engulfing": 2,
+                "bullish_harami": 2, "bearish_harami": 2, "morning_star": 3, "evening_star": 3,
+                "three_white_soldiers": 3, "three_black_crows": 3}
+ALIASES = {"close": "price", "bb": "bb_position", "bollinger": "bb_position", "change": "change_pct",
+           "above_the_cloud": "above_cloud", "below_the_cloud": "below_cloud", "in_the_cloud": "in_cloud",
+           "engulfing": "bullish_engulfing"}
+
+
+class Panel:
+    """
+    Right-aligned (bars, tickers) OHLCV arrays for a universe.
+    """
+
+    def __init__(self, tickers: list, frames: list, is_mock: list = None):
+        self.tickers = list(tickers)
+        self.lengths = np.array([len(df) for df in frames], dtype=np.int64)
+        self.is_mock = np.array(is_mock if is_mock is not None else [False] * len(frames), dtype=bool)
+        n_bars = int(self.lengths.max()) if len(frames) else 0
+        self.pad = n_bars - self.lengths  # first real row of every column
+
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            panel = np.empty((n_bars, len(frames)))
+            for j, df in enumerate(frames):
+                values = df[name].to_numpy(dtype=np.float64)
+                start = n_bars - len(values)
+                panel[start:, j] = values
+                # Pad with the first bar (no volume) so filters see a constant warm-up
+                panel[:start, j] = 0.0 if name == 'volume' else (values[0] if len(values) else np.nan)
+            setattr(self, name, panel)
+
+
+def _ema(x: np.ndarray, alpha: float, start: np.ndarray) -> np.ndarray:
+    """
+    Column-wise adjust=False EMA where column j starts averaging at row start[j]
+    (ind.ema skipping leading NaNs); rows before start are don't-care.
+    """
+    columns = np.arange(x.shape[1])
+    start = np.minimum(start, len(x) - 1)
+    seed = x[start, columns]
+    x = np.where(np.arange(len(x))[:, None] < start, seed, x)
+    y, _ = scipy_signal.lfilter([alpha], [1.0, alpha - 1.0], x, axis=0, zi=(1.0 - alpha) * x[:1])
+    return y
+
+
+def _window(values: np.ndarray, window: int) -> np.ndarray:
+    return values[-window:] if window <= len(values) else values
+
+
+def _where_long_enough(values, lengths, window):
+    return np.where(lengths >= window, values, np.nan)
+
+
+def compute_table(panel: Panel) -> dict:
+    """
+    Latest indicator values for every ticker of the panel: {field: (tickers,) array}.
+    Same windows and semantics as calculate_technical_indicators / summarize_indicators.
+    """
+    n = panel.lengths
+    close, high, low, open_ = panel.close, panel.high, panel.low, panel.open
+    if close.size == 0:
+        empty = np.zeros(len(n))
+        return {**{name: empty.copy() for name in NUMERIC_FIELDS},
+                **{name: empty.astype(bool) for name in FLAG_FIELDS}}
+    last = close[-1]
+
+    # RSI(14): Wilder-smoothed up / down moves (the padding only adds zero moves)
+    diff = np.zeros_like(close)
+    np.subtract(close[1:], close[:-1], out=diff[1:])
+    up = _ema(np.maximum(diff, 0.0), 1.0 / 14, panel.pad)[-1]
+    down = _ema(np.maximum(-diff, 0.0), 1.0 / 14, panel.pad)[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + up / down)
+    rsi[down == 0] = 100.0
+    rsi = _where_long_enough(rsi, n, 14)
+
+    # MACD(12, 26, 9); the signal line starts where the MACD line does
+    line = _ema(close, 2.0 / 13, panel.pad) - _ema(close, 2.0 / 27, panel.pad)
+    signal = _where_long_enough(_ema(line, 2.0 / 10, panel.pad + 25)[-1], n, 26 + 9 - 1)
+    line = _where_long_enough(line[-1], n, 26)
+
+    # Bollinger(20, 2) position and SMAs
+    recent = _window(close, 20)
+    mavg, std = recent.mean(axis=0), recent.std(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bb_position = _where_long_enough((last - (mavg - 2 * std)) / (4 * std), n, 20)
+    sma_50 = _where_long_enough(_window(close, 50).mean(axis=0), n, 50)
+    sma_200 = _where_long_enough(_window(close, 200).mean(axis=0), n, 200)
+
+    # ATR(14): zero during warm-up, seeded with the mean of the first 14 true ranges
+    tr = high - low
+    if len(close) > 1:
+        prev_close = close[:-1]
+        np.maximum(tr[1:], np.abs(high[1:] - prev_close), out=tr[1:])
+        np.maximum(tr[1:], np.abs(low[1:] - prev_close), out=tr[1:])
+    first = np.minimum(panel.pad, len(close) - 1)
+    columns = np.arange(len(n))
+    tr[first, columns] = (high - low)[first, columns]  # no previous close on a ticker's first bar
+    seed_rows = np.minimum(first + np.arange(14)[:, None], len(close) - 1)
+    seed = tr[seed_rows, columns].mean(axis=0)
+    tr = np.where(np.arange(len(tr))[:, None] < panel.pad + 14, seed, tr)
+    atr, _ = scipy_signal.lfilter([1.0 / 14], [1.0, 1.0 / 14 - 1.0], tr, axis=0, zi=(1.0 - 1.0 / 14) * tr[:1])
+    atr = np.where(n >= 14, atr[-1], 0.0)
+
+    # Ichimoku(9, 26, 52) cloud at the latest bar; span b uses whatever history there is
+    conv = _where_long_enough((_window(high, 9).max(axis=0) + _window(low, 9).min(axis=0)) / 2, n, 9)
+    base = _where_long_enough((_window(high, 26).max(axis=0) + _window(low, 26).min(axis=0)) / 2, n, 26)
+    span_a = (conv + base) / 2
+    span_b = (_window(high, 52).max(axis=0) + _window(low, 52).min(axis=0)) / 2
+    cloud_top, cloud_bottom = np.maximum(span_a, span_b), np.minimum(span_a, span_b)
+
+    # Patterns completed by the latest candle (the longest look two candles back)
+    candles = candle_patterns(open_[-3:], high[-3:], low[-3:], close[-3:])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = np.where(n >= 2, (last / close[-2] - 1.0) * 100 if len(close) > 1 else np.nan, np.nan)
+        atr_pct = np.where(n >= 14, atr / last * 100, np.nan)
+    return {
+        "price": last,
+        "change_pct": change_pct,
+        "volume": panel.volume[-1],
+        "rsi": rsi,
+        "macd": line,
+        "macd_signal": signal,
+        "macd_hist": line - signal,
+        "bb_position": bb_position,
+        "sma_50": sma_50,
+        "sma_200": sma_200,
+        "atr": atr,
+        "atr_pct": atr_pct,
+        "golden_cross": sma_50 > sma_200,
+        "above_cloud": last > cloud_top,
+        "below_cloud": last < cloud_bottom,
+        "in_cloud": (cloud_bottom <= last) & (last <= cloud_top),
+        "macd_bullish": line > signal,
+        "oversold": rsi < 30,
+        "overbought": rsi > 70,
+        **{name: candles[name][-1] & (n >= bars) for name, bars in PATTERN_BARS.items()},
+    }
+
+
+_COMPARISON = re.compile(r"^(.+?)\s*(<=|>=|!=|==|=|<|>)\s*(.+)$")
+# Characters that look like a connective but aren't one (conditions never contain them)
+_SEPARATOR = re.compile(r"[,;&|]")
+_OPERATORS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+              "=": np.equal, "==": np.equal, "!=": np.not_equal}
+
+
+def _field(text: str) -> str:
+    name = re.sub(r"[\s-]+", "_", text.strip().lower())
+    return ALIASES.get(name, name)
+
+
+def _operand(table: dict, text: str):
+    name = _field(text)
+    if name in NUMERIC_FIELDS:
+        return table[name]
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"Unknown field '{text.strip()}' (fields: {', '.join(NUMERIC_FIELDS)})")
+
+
+def _condition(table: dict, text: str) -> np.ndarray:
+    text = text.strip()
+    negate = re.match(r"^not\s+", text, re.IGNORECASE)
+    if negate:
+        return ~_condition(table, text[negate.end():])
+    match = _COMPARISON.match(text)
+    if match:
+        left, op, right = match.groups()
+        with np.errstate(invalid="ignore"):
+            return _OPERATORS[op](_operand(table, left), _operand(table, right))
+    name = _field(text)
+    if name not in FLAG_FIELDS:
+        raise ValueError(f"Unknown condition '{text}' (flags: {', '.join(FLAG_FIELDS)})")
+    return table[name]
+
+
+def query_mask(table: dict, query: str) -> np.ndarray:
+    """
+    Boolean mask of the rows matching a query: comparisons ("rsi < 30", "price > sma_50") and
+    flags ("above cloud", "golden cross"), combined with and (or &&) / or / not (and binds
+    tighter). An empty query matches everything. Raises ValueError for anything it can't parse,
+    including other separators (",", "&", ";", ...), which are never read as and.
+    """
+    rows = len(table["price"])
+    if not query or not query.strip():
+        return np.ones(rows, dtype=bool)
+    mask = np.zeros(rows, dtype=bool)
+    for alternative in re.split(r"\s+or\s+", query.strip(), flags=re.IGNORECASE):
+        clause = np.ones(rows, dtype=bool)
+        for condition in re.split(r"\s+and\s+|\s*&&\s*", alternative, flags=re.IGNORECASE):
+            if not condition.strip():
+                raise ValueError(f"Malformed query '{query}'")
+            if _SEPARATOR.search(condition):
+                raise ValueError(f"Malformed query '{query}' (combine conditions with and / or / not)")
+            clause &= _condition(table, condition)
+        mask |= clause
+    return mask
+
+
+class Screen:
+    """
+    A built panel's indicator table, queried with run().
+    """
+
+    def __init__(self, panel: Panel, period: str, interval: str):
+        self.tickers = np.array(panel.tickers, dtype=object)
+        self.bars = panel.lengths
+        self.is_mock = panel.is_mock
+        self.period = period
+        self.interval = interval
+        self.table = compute_table(panel)
+        self.built_at = time.time()
+
+    def run(self, query: str = "", sort: str = None, limit: int = 50) -> dict:
+        """
+        Rows matching query, ordered by sort ("rsi" ascending, "-rsi" descending; NaN last).
+        Raises ValueError for a bad query or sort field.
+        """
+        rows = np.flatnonzero(query_mask(self.table, query))
+        if sort:
+            descending = sort.strip().startswith("-")
+            name = _field(sort.strip().lstrip("+-"))
+            if name not in NUMERIC_FIELDS:
+                raise ValueError(f"Unknown sort field '{sort}' (fields: {', '.join(NUMERIC_FIELDS)})")
+            values = self.table[name][rows]
+            rows = rows[np.argsort(-values if descending else values, kind="stable")]
+        return {
+            "universe": len(self.tickers),
+            "matches": len(rows),
+            "built_at": self.built_at,
+            "results": [self.row(i) for i in rows[:max(limit, 0)]],
+        }
+
+    def row(self, i: int) -> dict:
+        item = {"ticker": self.tickers[i], "bars": int(self.bars[i]), "is_mock": bool(self.is_mock[i])}
+        for name in NUMERIC_FIELDS:
+            item[name] = _round_finite(float(self.table[name][i]), 4 if name == "bb_position" else 2)
+        for name in FLAG_FIELDS:
+            item[name] = bool(self.table[name][i])
+        return item
+
+
+def build_screen(tickers: list, period: str = SCREENER_PERIOD, interval: str = "1d") -> Screen:
+    """
+    Loads the universe through the batch loader (one bulk download for cache misses)
+    and computes its indicator table.
+    """
+    names, frames, mocks = [], [], []
+    for ticker, result in iter_market_data_batch(tickers, period, interval):
+        if result.df.empty:
+            continue
+        names.append(ticker)
+        frames.append(result.df)
+        mocks.append(result.is_mock)
+    with timed("screener.compute"):
+        return Screen(Panel(names, frames, mocks), period, interval)
+
+
+def get_screen(tickers: list = None, period: str = SCREENER_PERIOD, interval: str = "1d") -> Screen:
+    """
+    The cached Screen for a universe (default SCREENER_UNIVERSE), built on first use.
+    """
+    tickers = tuple(sorted(set(tickers or SCREENER_UNIVERSE)))
+    return panels.get_or_load((tickers, period, interval), lambda: build_screen(list(tickers), period, interval))
@@ -0,0 +1,112 @@
+import re
+import string
+
+# Compiled headline sentiment scorer.
+#
+# Every lexicon term matches as a whole word, in the surface forms listed for it (`forms`:
+# "rise" -> rises, rose, risen, rising) and in no others, so "bull" doesn't fire inside
+# "bulletin" or "bullish", nor "dive" inside "dividend". Terms carry weights, and a negator
+# shortly before a term in the same clause ("not", "no", "won't", ...) flips its sign.
+#
+# A headline is normalized with a handful of C-level string passes: lowercased, "n't" spelled
+# out as " not", and every punctuation character (quotes, brackets, hyphens, clause marks, however
+# many cling to a word) turned into a space. One split and one set intersection with the known
+# words then find its terms and negators. Only headlines that contain both take the slower
+# clause-by-clause path that tracks negation. score_batch() runs the normalization passes once
+# over the whole feed instead of once per headline.
+#
+# Scoring keeps the original rules: each term counts once per headline, the sum is
+# clamped to [-1.0, 1.0].
+
+NEGATIONS = ["not", "no", "never", "without", "neither", "nor", "hardly", "barely"]
+NEGATION_WINDOW = 3  # words between a negator and the term it flips
+
+_PUNCTUATION = string.punctuation + "“”‘’–—…"
+_WORD_BREAKS = str.maketrans(_PUNCTUATION, " " * len(_PUNCTUATION))
+_ASCII_WORD_BREAKS = bytes.maketrans(string.punctuation.encode(), b" " * len(string.punctuation))
+# Clause marks followed by a space or the end (not the point in "2.5%"), with any closing quotes
+_CLAUSE_BREAK = re.compile(r"[,.;:!?]+[\"'”’)]*(?=\s|$)")
+_SEPARATOR = "\x1e"  # joins a batch into one string; not punctuation, so it survives normalization
+
+
+def _normalize(text: str) -> str:
+    # Lowercase with negations spelled out ("won't" -> "wo not"); punctuation is left in place
+    return text.lower().replace("n't", " not").replace("n’t", " not")
+
+
+def _break_words(text: str) -> str:
+    # Punctuation -> spaces. For ASCII text a bytes table is several times cheaper per call
+    if text.isascii():
+        return text.encode("ascii").translate(_ASCII_WORD_BREAKS).decode("ascii")
+    return text.translate(_WORD_BREAKS)
+
+
+class SentimentScorer:
+    """
+    score(text) / score_batch(texts) -> float in [-1.0, 1.0] per text.
+    `lexicon` maps single-word terms to weights, positive = bullish; `forms` maps a term
+    to the other word forms it matches (a term without an entry matches only as written).
+    """
+
+    def __init__(self, lexicon: dict, forms: dict = None, negations=NEGATIONS,
+                 negation_window: int = NEGATION_WINDOW):
+        self.lexicon = dict(lexicon)
+        self.negation_window = negation_window
+
+        self._forms = {}  # word form -> term
+        for term in self.lexicon:
+            if len(term.split()) != 1:
+                raise ValueError(f"Sentiment terms are single words: {term!r}")
+            for form in [term, *(forms or {}).get(term, ())]:
+                # A form shared by two terms keeps the first (lexicon order)
+                self._forms.setdefault(form.lower(), term)
+        self._negations = frozenset(n.lower() for n in negations)
+        self._words = frozenset(self._forms) | self._negations
+        self._weights = {form: self.lexicon[term] for form, term in self._forms.items()}
+
+    def score(self, text: str) -> float:
+        if not text:
+            return 0.0
+        normalized = _normalize(text)
+        found = self._words.intersection(_break_words(normalized).split())
+        return self._score(found, normalized) if found else 0.0
+
+    def score_batch(self, texts) -> list:
+        """
+        Scores a whole news feed: normalized in one pass over the joined titles.
+        """
+        texts = [text or "" for text in texts]
+        joined = _SEPARATOR.join(texts)
+        if joined.count(_SEPARATOR) != len(texts) - 1:
+            return [self.score(text) for text in texts]  # a title contains the separator
+        normalized = _normalize(joined)
+        found = map(self._words.intersection, map(str.split, _break_words(normalized).split(_SEPARATOR)))
+        return [self._score(words, n) if words else 0.0 for words, n in zip(found, normalized.split(_SEPARATOR))]
+
+    def _score(self, found: set, normalized: str) -> float:
+        # found: the known words (terms and negators) in the normalized text
+        if len(found) == 1:
+            (word,) = found
+            score = self._weights.get(word, 0.0)  # a lone negator scores 0
+        elif self._negations.isdisjoint(found):
+            score = sum(map(self.lexicon.__getitem__, {self._forms[word] for word in found}))
+        else:
+            score = self._score_negated(normalized)
+        # Clamp score
+        return max(min(score, 1.0), -1.0)
+
+    def _score_negated(self, normalized: str) -> float:
+        # Clause by clause: a negator flips the terms up to negation_window words after it
+        score, seen = 0.0, set()
+        for clause in _CLAUSE_BREAK.split(normalized):
+            negated_at = None
+            for i, word in enumerate(_break_words(clause).split()):
+                if word in self._negations:
+                    negated_at = i
+                    continue
+                term = self._forms.get(word)
+                if term is not None and term not in seen:
+                    seen.add(term)
+                    negated = negated_at is not None and i - negated_at <= self.negation_window
+                    score += -self.lexicon[term] if negated else self.lexicon[term]
+        return score
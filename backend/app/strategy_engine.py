@@ -1,12 +1,18 @@
-import google.generativeai as genai
 import os
 import json
-from PIL import Image
-import io
+import asyncio
+
+from .analysis_cache import analysis_cache, analysis_key
+from .image_prep import CHAT_MAX_SIDE, max_side_for, prepare_image
+from .lazy import lazy_import
+from .metrics import timed
+
+# The Gemini SDK is imported (and configured) on the first model call, see lazy.py
+genai = lazy_import("google.generativeai")
 
 # Initialize Gemini
 def init_gemini(api_key: str):
-    genai.configure(api_key=api_key)
+    genai.when_loaded(lambda module: module.configure(api_key=api_key))
 
 STRATEGY_PROMPTS = {
     "General Analysis": """
@@ -60,13 +66,29 @@ OUTPUT_FORMAT = """
     Do not add markdown formatting like ```json ... ```. Just the raw JSON string.
 """
 
-def analyze_chart(image_bytes, mode="General Analysis", context=None):
-    """
-    Sends image and prompt to Gemini.
-    Context: Optional dict containing technical indicators (RSI, MACD etc)
-    """
-    model = genai.GenerativeModel('gemini-1.5-pro')
+GEMINI_MODEL = 'gemini-1.5-pro'
+
+ANALYSIS_ERROR = {
+    "Detected Pattern": "Error",
+    "Strategy": "Could not analyze chart.",
+    "Entry Price": "N/A",
+    "Stop Loss": "N/A",
+    "Risk Level": "Unknown"
+}
+
+CHAT_ERROR = "I'm having trouble connecting to the market neural network right now. Please try again later."
+
+CHAT_SYSTEM_PROMPT = """
+    You are TradeMind, an advanced AI Trading Consultant.
+    Your goal is to provide helpful, accurate, and cautious financial insights.
     
+    - If asked about specific stocks, analyze them using your training data.
+    - If provided with recent market data (in context), usage it to support your answer.
+    - Always warn about risks. Do not give financial advice as absolute fact.
+    - Be concise and professional.
+    """
+
+def _analysis_prompt(mode, context=None) -> str:
     prompt = STRATEGY_PROMPTS.get(mode, STRATEGY_PROMPTS["General Analysis"])
     
     # Enhance prompt with quantitative data if available
@@ -77,49 +99,19 @@ def analyze_chart(image_bytes, mode="General Analysis", context=None):
         context_str += "\nUse this data to confirm visual patterns. E.g. if RSI is > 70, confirm overbought conditions visually.\n"
         prompt += context_str
 
-    full_prompt = f"{prompt}\n\n{OUTPUT_FORMAT}"
-    
-    try:
-        # Load image
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        response = model.generate_content([full_prompt, image])
+    return f"{prompt}\n\n{OUTPUT_FORMAT}"
+
+def _parse_analysis(text: str) -> dict:
+    # Clean response to ensure valid JSON
+    text_resp = text.strip()
+    if text_resp.startswith("```json"):
+        text_resp = text_resp[7:]
+    if text_resp.endswith("```"):
+        text_resp = text_resp[:-3]
         
-        # Clean response to ensure valid JSON
-        text_resp = response.text.strip()
-        if text_resp.startswith("```json"):
-            text_resp = text_resp[7:]
-        if text_resp.endswith("```"):
-            text_resp = text_resp[:-3]
-            
-        return json.loads(text_resp)
-    except Exception as e:
-        print(f"Gemini Analysis Error: {e}")
-        return {
-            "Detected Pattern": "Error",
-            "Strategy": "Could not analyze chart.",
-            "Entry Price": "N/A",
-            "Stop Loss": "N/A",
-            "Risk Level": "Unknown"
-        }
-
-def chat_with_ai(message: str, image_bytes=None, context=None):
-    """
-    General Chat with financial context.
-    Returns a plain text response or markdown.
-    """
-    model = genai.GenerativeModel('gemini-1.5-pro')
-    
-    system_prompt = """
-    You are TradeMind, an advanced AI Trading Consultant.
-    Your goal is to provide helpful, accurate, and cautious financial insights.
-    
-    - If asked about specific stocks, analyze them using your training data.
-    - If provided with recent market data (in context), usage it to support your answer.
-    - Always warn about risks. Do not give financial advice as absolute fact.
-    - Be concise and professional.
-    """
-    
+    return json.loads(text_resp)
+
+def _chat_content(message: str, image_bytes=None, context=None) -> list:
     # Enhance prompt with market data if available
     if context:
         context_str = "\n\n**Current Market Data:**\n"
@@ -129,16 +121,65 @@ def chat_with_ai(message: str, image_bytes=None, context=None):
     else:
         message = f"User Question: {message}"
         
-    full_prompt = f"{system_prompt}\n\n{message}"
-    
+    content = [f"{CHAT_SYSTEM_PROMPT}\n\n{message}"]
+    if image_bytes:
+        content.append(prepare_image(image_bytes, CHAT_MAX_SIDE).blob())
+    return content
+
+# In-flight async analyses per cache key, so concurrent re-clicks share one Gemini call
+_pending_analyses = {}
+
+async def analyze_chart_async(image_bytes, mode="General Analysis", context=None):
+    """
+    Sends image and prompt to Gemini without blocking the event loop.
+    Context: Optional dict containing technical indicators (RSI, MACD etc)
+    Repeat submissions (same image, mode, rounded context) are served from analysis_cache.
+    """
+    key = analysis_key(image_bytes, mode, context, GEMINI_MODEL)
+    # The cache reads JSON from disk on a memory miss: off the event loop
+    cached = await asyncio.to_thread(analysis_cache.get, key)
+    if cached is not None:
+        return dict(cached)
+
+    pending = _pending_analyses.get(key)
+    if pending is None:
+        pending = asyncio.ensure_future(_run_analysis_async(key, image_bytes, mode, context))
+        _pending_analyses[key] = pending
+        pending.add_done_callback(lambda _: _pending_analyses.pop(key, None))
+    return dict(await asyncio.shield(pending))
+
+async def _run_analysis_async(key, image_bytes, mode, context):
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    full_prompt = _analysis_prompt(mode, context)
+
+    try:
+        # Decode/resize/encode is CPU work (~0.5 s for a 4K PNG): keep it off the event loop
+        image = await asyncio.to_thread(prepare_image, image_bytes, max_side_for(mode))
+
+        with timed("gemini.analyze", upstream="gemini"):
+            response = await model.generate_content_async([full_prompt, image.blob()])
+        analysis = _parse_analysis(response.text)
+    except Exception as e:
+        print(f"Gemini Analysis Error: {e}")
+        return ANALYSIS_ERROR
+
+    # File write, rename and the periodic sweep: off the event loop too
+    await asyncio.to_thread(analysis_cache.put, key, analysis)
+    return analysis
+
+async def chat_with_ai_async(message: str, image_bytes=None, context=None):
+    """
+    General Chat with financial context, without blocking the event loop.
+    Returns a plain text response or markdown.
+    """
+    model = genai.GenerativeModel(GEMINI_MODEL)
+
     try:
-        content = [full_prompt]
-        if image_bytes:
-            image = Image.open(io.BytesIO(image_bytes))
-            content.append(image)
-            
-        response = model.generate_content(content)
+        # Built off the event loop: an attached image goes through prepare_image
+        content = await asyncio.to_thread(_chat_content, message, image_bytes, context)
+        with timed("gemini.chat", upstream="gemini"):
+            response = await model.generate_content_async(content)
         return response.text
     except Exception as e:
         print(f"Gemini Chat Error: {e}")
-        return "I'm having trouble connecting to the market neural network right now. Please try again later."
+        return CHAT_ERROR
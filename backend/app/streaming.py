@@ -0,0 +1,163 @@
+import asyncio
+import os
+
+from .indicator_engine import latest_indicators
+from .market_data import CACHE_DURATION, fetch_market_data
+
+# Live market updates with server-side fan-out.
+#
+# One producer task per subscribed ticker refreshes the data every STREAM_INTERVAL seconds
+# (through the shared market data cache), updates the indicators incrementally and pushes
+# only what changed to every subscriber:
+#   {"type": "snapshot", "ticker", "bars": [...], "indicators": {...}}   on subscribe / resync
+#   {"type": "update", "ticker", "bars": [new or revised bars], "indicators": {changed keys}}
+# N viewers of a ticker cost one refresh per interval instead of N full recomputations.
+# A producer with no subscribers for STREAM_IDLE_TIMEOUT seconds is torn down.
+
+STREAM_INTERVAL = float(os.getenv("STREAM_INTERVAL", str(CACHE_DURATION)))
+STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", "60"))
+# Messages buffered per subscriber; a subscriber that falls further behind gets a fresh snapshot
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "16"))
+
+
+def _snapshot(ticker: str):
+    # Blocking (cache/provider + indicators), runs in a worker thread
+    result = fetch_market_data(ticker)
+    return result.chart, latest_indicators(result)
+
+
+class TickerProducer:
+
+    def __init__(self, hub, ticker: str):
+        self.hub = hub
+        self.ticker = ticker
+        self.subscribers = set()
+        self.bars = {}  # time -> bar, as last broadcast
+        self.chart = []
+        self.indicators = {}
+        self.ready = asyncio.Event()
+        self.idle_since = None
+        self.task = asyncio.create_task(self._run())
+
+    def snapshot_message(self) -> dict:
+        return {"type": "snapshot", "ticker": self.ticker, "bars": self.chart, "indicators": self.indicators}
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if self.subscribers:
+                    self.idle_since = None
+                    await self._refresh()
+                elif self.idle_since is None:
+                    self.idle_since = loop.time()
+                elif loop.time() - self.idle_since >= self.hub.idle_timeout:
+                    break
+                await asyncio.sleep(self.hub.interval)
+        finally:
+            self.hub._remove(self)
+
+    async def _refresh(self):
+        try:
+            chart, indicators = await asyncio.to_thread(_snapshot, self.ticker)
+        except Exception as e:
+            print(f"Stream refresh error for {self.ticker}: {e}")
+            return
+        self.hub.refreshes += 1
+
+        changed_bars = [bar for bar in chart if self.bars.get(bar['time']) != bar]
+        changed_indicators = {k: v for k, v in indicators.items() if self.indicators.get(k) != v}
+        self.chart = chart
+        self.bars = {bar['time']: bar for bar in chart}
+        self.indicators = indicators
+
+        if not self.ready.is_set():
+            self.ready.set()
+            return  # subscribers waiting on ready start from the snapshot
+        if changed_bars or changed_indicators:
+            self.broadcast({"type": "update", "ticker": self.ticker,
+                            "bars": changed_bars, "indicators": changed_indicators})
+
+    def broadcast(self, message: dict):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind for deltas to apply: start it over from the current state
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.snapshot_message())
+                self.hub.resyncs += 1
+        self.hub.messages += len(self.subscribers)
+
+
+class StreamHub:
+    """
+    Registry of per-ticker producers. Use `async with hub.subscribe(ticker) as queue`
+    and forward queue messages to the client.
+    """
+
+    def __init__(self, interval: float = STREAM_INTERVAL, idle_timeout: float = STREAM_IDLE_TIMEOUT,
+                 queue_size: int = STREAM_QUEUE_SIZE):
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.queue_size = queue_size
+        self.producers = {}
+
+        self.refreshes = 0
+        self.messages = 0
+        self.resyncs = 0
+
+    def subscribe(self, ticker: str):
+        return _Subscription(self, ticker)
+
+    def _remove(self, producer: TickerProducer):
+        if self.producers.get(producer.ticker) is producer:
+            del self.producers[producer.ticker]
+
+    async def close(self):
+        producers = list(self.producers.values())
+        for producer in producers:
+            producer.task.cancel()
+        await asyncio.gather(*(p.task for p in producers), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "tickers": len(self.producers),
+            "subscribers": sum(len(p.subscribers) for p in self.producers.values()),
+            "refreshes": self.refreshes,
+            "messages": self.messages,
+            "resyncs": self.resyncs,
+        }
+
+
+class _Subscription:
+
+    def __init__(self, hub: StreamHub, ticker: str):
+        self.hub = hub
+        self.ticker = ticker
+        self.queue = asyncio.Queue(maxsize=hub.queue_size)
+        self.producer = None
+
+    async def __aenter__(self) -> asyncio.Queue:
+        producer = self.hub.producers.get(self.ticker)
+        if producer is None or producer.task.done():
+            producer = TickerProducer(self.hub, self.ticker)
+            self.hub.producers[self.ticker] = producer
+        producer.subscribers.add(self.queue)
+        self.producer = producer
+
+        try:
+            await producer.ready.wait()
+        except BaseException:
+            # Cancelled (client gone) before the first snapshot: __aexit__ won't run
+            producer.subscribers.discard(self.queue)
+            raise
+        self.queue.put_nowait(producer.snapshot_message())
+        return self.queue
+
+    async def __aexit__(self, *exc):
+        self.producer.subscribers.discard(self.queue)
+
+
+hub = StreamHub()
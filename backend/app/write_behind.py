@@ -0,0 +1,224 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from .metrics import timed
+
+# Write-behind queue for fire-and-forget inserts (analysis_history).
+#
+# Requests enqueue rows and return immediately; a background thread batches them into
+# one multi-row insert per `batch_size` rows or `flush_interval` seconds, retries failed
+# batches with exponential backoff, and appends what it still can't write to a local
+# JSON-lines spill file. The spill file is replayed on start and after the next
+# successful write, so rows survive backend outages and restarts. Lines that don't parse
+# (a crash mid-append cuts the last one short) are moved to `<spill_path>.bad` and skipped.
+#
+# `client` is anything shaped like the Supabase client:
+# client.table(name).insert(rows).execute(), so a local stand-in works for testing.
+
+
+class WriteBehindQueue:
+
+    def __init__(self, client, table: str, batch_size: int = 50, flush_interval: float = 0.5,
+                 max_queue: int = 10000, max_retries: int = 5, backoff: float = 0.5,
+                 max_backoff: float = 30.0, spill_path: str = None):
+        self.client = client
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.spill_path = spill_path
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.corrupt = 0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.table}", daemon=True)
+            self._thread.start()
+
+    def put(self, row: dict):
+        """
+        Queues a row for insertion. Never blocks; spills straight to disk when the queue is full.
+        """
+        try:
+            self._queue.put_nowait(row)
+            self.enqueued += 1
+        except queue.Full:
+            self._spill([row])
+
+    def close(self, timeout: float = 10.0):
+        """
+        Flushes everything queued (bounded by timeout) and stops the flusher.
+        Rows still queued after the timeout go to the spill file.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        leftover = self._drain_nowait()
+        if leftover:
+            self._spill(leftover)
+
+    # --- flusher ---
+
+    def _run(self):
+        self._replay_spill()
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self) -> list:
+        if self._stop.is_set():
+            return self._drain_nowait(self.batch_size)
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain_nowait(self, limit: int = None) -> list:
+        rows = []
+        while limit is None or len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _insert(self, rows: list):
+        with timed("supabase.insert", upstream="supabase"):
+            self.client.table(self.table).insert(rows).execute()
+
+    def _write(self, batch: list, replay_after: bool = True) -> bool:
+        if not self._insert_with_retries(batch):
+            self._spill(batch)
+            return False
+        if replay_after:
+            # Outside the insert retries: the batch is written, whatever the replay runs into
+            self._replay_spill()
+        return True
+
+    def _insert_with_retries(self, batch: list) -> bool:
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._insert(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return True
+            except Exception as e:
+                print(f"Write-behind insert error ({self.table}, attempt {attempt + 1}): {e}")
+                # Shutting down: don't hold the drain up with backoff, spill instead
+                if attempt == self.max_retries or self._stop.is_set():
+                    break
+                self.retries += 1
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_backoff)
+        return False
+
+    # --- spill file ---
+
+    def _spill(self, rows: list):
+        if not rows:
+            return
+        if not self.spill_path:
+            self.dropped += len(rows)
+            print(f"Write-behind dropped {len(rows)} rows ({self.table}), no spill file configured")
+            return
+        try:
+            with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+            self.spilled += len(rows)
+        except Exception as e:
+            self.dropped += len(rows)
+            print(f"Write-behind spill error ({self.table}): {e}")
+
+    def _replay_spill(self):
+        if not self.spill_path:
+            return
+        replay_path = self.spill_path + ".replay"
+        try:
+            with self._spill_lock:
+                # A leftover .replay file means a previous replay was interrupted: finish that one first
+                if not os.path.exists(replay_path):
+                    if not os.path.exists(self.spill_path):
+                        return
+                    os.replace(self.spill_path, replay_path)
+            rows = self._read_replay(replay_path)
+        except Exception as e:
+            # The flusher keeps running; the file is picked up again after the next write
+            print(f"Write-behind replay error ({self.table}): {e}")
+            return
+
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            if self._write(batch, replay_after=False):
+                self.replayed += len(batch)
+            else:
+                # Backend still down; everything after this batch goes back to the spill file too
+                self._spill(rows[start + self.batch_size:])
+                break
+        # Removed only once every row is written or re-spilled (at-least-once across crashes)
+        try:
+            os.remove(replay_path)
+        except OSError as e:
+            print(f"Write-behind replay cleanup error ({self.table}): {e}")
+
+    def _read_replay(self, replay_path: str) -> list:
+        rows, bad = [], []
+        with open(replay_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            # Kept for inspection instead of failing the whole replay on every start
+            with open(self.spill_path + ".bad", "a", encoding="utf-8") as f:
+                f.writelines(bad)
+            self.corrupt += len(bad)
+            print(f"Write-behind skipped {len(bad)} unreadable spill lines ({self.table}), "
+                  f"kept in {self.spill_path}.bad")
+        return rows
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "corrupt": self.corrupt,
+        }
@@ -0,0 +1,100 @@
+"""
+Parity check and benchmark: vectorized backtests (app.backtest) vs a per-bar Python loop.
+
+    cd backend
+    python -m benchmarks.bench_backtest              # 50 tickers x 10 years x 60-combination MACD grid
+    python -m benchmarks.bench_backtest 200 2520     # tickers, bars per ticker
+
+The loop reference re-implements the fill / cost / trade rules bar by bar; its metrics must
+match evaluate() (exits non-zero on a mismatch). Then the whole grid is timed both ways.
+"""
+import sys
+import time
+
+import numpy as np
+
+from app import backtest as bt
+from benchmarks.bench_indicators import synthetic_bars, warm_lazy_imports
+
+DEFAULT_TICKERS = 50
+DEFAULT_BARS = 2520  # ~10 years of daily bars
+GRID = {"fast": [5, 8, 12, 16, 20], "slow": [20, 26, 35, 50], "signal": [5, 9, 12]}
+COST_BPS = 5.0
+
+
+def loop_metrics(close, positions, cost_bps: float = COST_BPS) -> dict:
+    cost = cost_bps / 10_000
+    equity, peak, max_drawdown = 1.0, 1.0, 0.0
+    prev, trades, wins, trade_log = 0.0, 0, 0, 0.0
+    for t in range(1, len(close)):
+        held = positions[t - 1]
+        r = held * (close[t] / close[t - 1] - 1.0) - abs(held - prev) * cost
+        if held != prev:
+            if prev != 0:
+                trades += 1
+                wins += trade_log > 0
+            trade_log = 0.0
+        if held != 0:
+            trade_log += np.log1p(r)
+        equity *= 1.0 + r
+        peak = max(peak, equity)
+        max_drawdown = min(max_drawdown, equity / peak - 1.0)
+        prev = held
+    if prev != 0:
+        trades += 1
+        wins += trade_log > 0
+    return {"total_return": equity - 1.0, "max_drawdown": max_drawdown, "trades": trades,
+            "hit_rate": wins / trades if trades else 0.0}
+
+
+def check_parity(df, grid) -> int:
+    bars = {col: df[col].to_numpy() for col in ('open', 'high', 'low', 'close')}
+    mismatches = 0
+    for strategy in bt.STRATEGIES:
+        for allow_short in (False, True):
+            positions = bt.STRATEGIES[strategy](bars, allow_short=allow_short)
+            vectorized = bt.evaluate(bars['close'], positions[:, None], COST_BPS)
+            expected = loop_metrics(bars['close'], positions)
+            for name, value in expected.items():
+                if not np.isclose(vectorized[name][0], value, rtol=1e-9, atol=1e-12):
+                    mismatches += 1
+                    print(f"  MISMATCH {strategy} short={allow_short} {name}: "
+                          f"loop {value}, vectorized {vectorized[name][0]}")
+    return mismatches
+
+
+def main(tickers: int, n_bars: int) -> int:
+    grid = bt.parameter_grid("macd", GRID)
+    frames = [synthetic_bars(n_bars, seed) for seed in range(tickers)]
+    warm_lazy_imports()  # not part of the timings below
+
+    print("Parity vs per-bar loop (every strategy, long-only and long/short):")
+    mismatches = check_parity(frames[0], grid)
+    print(f"  {mismatches} mismatches")
+    if mismatches:
+        return 1
+
+    runs = tickers * len(grid)
+    start = time.perf_counter()
+    for df in frames:
+        bt.backtest_ticker(df, "macd", grid, COST_BPS)
+    vectorized = time.perf_counter() - start
+
+    # The loop is timed on a sample of tickers and scaled up
+    sample = frames[:max(1, tickers // 10)]
+    start = time.perf_counter()
+    for df in sample:
+        bars = {col: df[col].to_numpy() for col in ('open', 'high', 'low', 'close')}
+        for params in grid:
+            loop_metrics(bars['close'], bt.macd_positions(bars, **params))
+    looped = (time.perf_counter() - start) * tickers / len(sample)
+
+    print(f"\n{tickers} tickers x {n_bars:,} bars x {len(grid)} combinations = {runs:,} runs:")
+    print(f"  per-bar loop (est.)  {looped:8.2f}s")
+    print(f"  vectorized           {vectorized:8.2f}s  ({looped / vectorized:5.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*(args + [DEFAULT_TICKERS, DEFAULT_BARS][len(args):])))
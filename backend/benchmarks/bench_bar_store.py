@@ -0,0 +1,165 @@
+"""
+Regression check and benchmark: the local bar store (app.bar_store).
+
+    cd backend
+    python -m benchmarks.bench_bar_store            # 10 years of daily bars
+    python -m benchmarks.bench_bar_store 20000      # bars
+
+Checks (any failure exits non-zero):
+
+- mixed sources: a ticker first stored by the batch endpoint (yf.download) and then updated
+  by a single-ticker tail fetch (Ticker.history) must serve exactly the fixture's bars, once
+  each, in the exchange timezone; and the other way round;
+- timezones: a naive frame merged into a tz-aware store is read in the store's timezone and
+  never clears it, an aware frame in another timezone is matched by instant;
+- tail updates: a run of updates (the last bar revised, new bars, one reaching deep into the
+  base, one before the first bar), through compaction, must read back like a plain upsert.
+
+Then a tail update is timed against rewriting the whole history (BAR_STORE_TAIL_MAX=0).
+"""
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app import bar_store as bar_store_module
+from app.bar_store import OHLCV_COLUMNS, BarStore
+from benchmarks.bench_indicators import synthetic_bars
+
+DEFAULT_BARS = 2520  # ~10 years of daily bars
+ROUNDS = 200
+TICKERS = ["AAPL", "MSFT"]
+
+
+def frame(dates) -> pd.DataFrame:
+    df = synthetic_bars(len(dates))
+    df.insert(0, 'date', pd.Series(dates))
+    return df
+
+
+def upsert(stored: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    kept = stored[~stored['date'].isin(new['date'])]
+    return pd.concat([kept, new]).sort_values('date').reset_index(drop=True)
+
+
+def same_bars(got: pd.DataFrame, expected: pd.DataFrame) -> bool:
+    return (len(got) == len(expected)
+            and (got['date'].to_numpy() == expected['date'].to_numpy()).all()
+            and np.allclose(got[OHLCV_COLUMNS].to_numpy(), expected[OHLCV_COLUMNS].to_numpy()))
+
+
+def check_mixed_sources() -> int:
+    from app.market_data import cache, fetch_market_data, iter_market_data_batch
+    from benchmarks.stand_ins import load_history, offline
+
+    mismatches = 0
+    for order in (["batch", "single"], ["single", "batch"]):
+        with offline() as upstreams:
+            for source in order + ["single"]:  # the last fetch reads what the store holds
+                cache.clear()
+                if source == "batch":
+                    results = dict(iter_market_data_batch(TICKERS, "1y"))
+                else:
+                    results = {ticker: fetch_market_data(ticker, "1y") for ticker in TICKERS}
+            for ticker, result in results.items():
+                expected = load_history(ticker)
+                expected = expected[expected.index >= bar_store_module.period_start("1y")]
+                dates = result.df['date']
+                if result.is_mock or len(dates) != len(expected) or str(dates.dt.tz) != "America/New_York" \
+                        or not (dates.to_numpy() == expected.index.to_numpy()).all() \
+                        or not np.allclose(result.df['close'].to_numpy(), expected['Close'].to_numpy()):
+                    print(f"  MISMATCH {' then '.join(order)} {ticker}: {len(dates)} bars "
+                          f"({dates.nunique()} unique, tz {dates.dt.tz}), expected {len(expected)}")
+                    mismatches += 1
+            if upstreams.calls["yfinance.download"] != 1:
+                print(f"  MISMATCH {' then '.join(order)}: {upstreams.calls['yfinance.download']} bulk downloads")
+                mismatches += 1
+    return mismatches
+
+
+def check_timezones() -> int:
+    mismatches = 0
+    dates = pd.date_range("2024-01-02", periods=30, freq="B", tz="America/New_York")
+    with tempfile.TemporaryDirectory() as directory:
+        store = BarStore(directory)
+        stored = frame(dates)
+        store.merge("X", "1d", stored)
+        naive = frame(dates[-3:].tz_localize(None))
+        store.merge("X", "1d", naive)
+        stored = upsert(stored, naive.assign(date=naive['date'].dt.tz_localize("America/New_York")))
+        utc = frame(dates[-2:].tz_convert("UTC"))
+        store.merge("X", "1d", utc)
+        stored = upsert(stored, utc.assign(date=utc['date'].dt.tz_convert("America/New_York")))
+        got = store.read("X", "1d")
+        if store.meta("X", "1d")["tz"] != "UTC" or not same_bars(got, stored):
+            print(f"  MISMATCH timezones: tz {got['date'].dt.tz}, {len(got)} bars, expected {len(stored)}")
+            mismatches += 1
+    return mismatches
+
+
+def check_updates(n_bars: int) -> int:
+    mismatches = 0
+    dates = pd.date_range("1990-01-01", periods=n_bars + 300, freq="D", tz="UTC")
+    with tempfile.TemporaryDirectory() as directory, mock.patch.object(bar_store_module, "BAR_STORE_TAIL_MAX", 64):
+        store = BarStore(directory)
+        stored = frame(dates[10:n_bars])
+        store.merge("X", "1d", stored, covered_from=dates[10])
+        updates = [frame(dates[i - 1:i + 3]) for i in range(n_bars, n_bars + 300, 3)]
+        updates.insert(50, frame(dates[n_bars - 200:n_bars - 150]))  # deep into the base
+        updates.append(frame(dates[:12]))                            # before the first bar
+        for i, update in enumerate(updates):
+            store.merge("X", "1d", update)
+            stored = upsert(stored, update)
+            if not same_bars(store.read("X", "1d"), stored):
+                print(f"  MISMATCH update {i}: meta {store.meta('X', '1d')}")
+                mismatches += 1
+                break
+        start = stored['date'].iloc[len(stored) // 2]
+        if not same_bars(store.read("X", "1d", start), stored[stored['date'] >= start]):
+            print("  MISMATCH read from a start")
+            mismatches += 1
+        if not store.compactions:
+            print("  MISMATCH no compaction past BAR_STORE_TAIL_MAX")
+            mismatches += 1
+    return mismatches
+
+
+def time_tail_update(n_bars: int, tail_max: int) -> float:
+    dates = pd.date_range("1990-01-01", periods=n_bars + ROUNDS, freq="D", tz="UTC")
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(bar_store_module, "BAR_STORE_TAIL_MAX", tail_max):
+        store = BarStore(directory)
+        store.merge("X", "1d", frame(dates[:n_bars]))
+        updates = [frame(dates[i - 1:i + 1]) for i in range(n_bars, n_bars + ROUNDS)]
+        start = time.perf_counter()
+        for update in updates:
+            store.merge("X", "1d", update)
+        return (time.perf_counter() - start) / ROUNDS
+
+
+def main(n_bars: int) -> int:
+    checks = [
+        ("Mixed sources (batch download + single-ticker tail fetch)", check_mixed_sources),
+        ("Timezones (naive and other-tz frames)", check_timezones),
+        (f"Tail updates ({n_bars:,} bars, through compaction)", lambda: check_updates(n_bars)),
+    ]
+    for title, check in checks:
+        print(f"{title}:")
+        mismatches = check()
+        print(f"  {mismatches} mismatches")
+        if mismatches:
+            return 1
+
+    tail = time_tail_update(n_bars, bar_store_module.BAR_STORE_TAIL_MAX)
+    rewrite = time_tail_update(n_bars, 0)
+    print(f"\nTail update (revised last bar + one new bar) on {n_bars:,} bars:")
+    print(f"  full rewrite       {rewrite * 1000:8.3f} ms")
+    print(f"  tail segment       {tail * 1000:8.3f} ms  ({rewrite / tail:4.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BARS))
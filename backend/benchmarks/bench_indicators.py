@@ -0,0 +1,153 @@
+"""
+Parity check and benchmark: app.indicators kernels vs the `ta` library objects.
+
+    cd backend
+    python -m benchmarks.bench_indicators            # 1k, 100k, 1M bars
+    python -m benchmarks.bench_indicators 1000 5000  # custom sizes
+
+Every kernel is checked against its `ta` counterpart first (exits non-zero on a mismatch),
+then both full indicator sets are timed at each size. The modules the kernels import lazily
+are loaded (and their import timed) before anything else, as the server prewarms them.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from ta.momentum import RSIIndicator
+from ta.trend import MACD, SMAIndicator, EMAIndicator, IchimokuIndicator
+from ta.volatility import BollingerBands, AverageTrueRange
+from ta.volume import OnBalanceVolumeIndicator
+
+from app import indicators as ind
+from app.analysis_engine import compute_indicator_block
+from app.lazy import prewarm
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+# Imported by the kernels on first use (app.lazy); ~1 s for scipy.signal
+LAZY_MODULES = ["scipy.signal", "scipy.ndimage"]
+
+
+def synthetic_bars(n: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Random-walk OHLCV bars (deterministic for a given seed).
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close * (1 + rng.normal(0, 0.003, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.003, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.003, n)))
+    volume = rng.integers(100_000, 5_000_000, n).astype(np.float64)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume})
+
+
+def ta_indicators(df: pd.DataFrame) -> dict:
+    close, high, low, volume = df['close'], df['high'], df['low'], df['volume']
+    macd = MACD(close=close)
+    bollinger = BollingerBands(close=close, window=20, window_dev=2)
+    ichimoku = IchimokuIndicator(high=high, low=low, window1=9, window2=26, window3=52)
+    lookback = min(len(df), 100)
+    return {
+        'rsi': RSIIndicator(close=close, window=14).rsi(),
+        'macd': macd.macd(),
+        'macd_signal': macd.macd_signal(),
+        'macd_diff': macd.macd_diff(),
+        'bb_high': bollinger.bollinger_hband(),
+        'bb_low': bollinger.bollinger_lband(),
+        'bb_mid': bollinger.bollinger_mavg(),
+        'sma_50': SMAIndicator(close=close, window=50).sma_indicator(),
+        'sma_200': SMAIndicator(close=close, window=200).sma_indicator(),
+        'ema_20': EMAIndicator(close=close, window=20).ema_indicator(),
+        'ichimoku_a': ichimoku.ichimoku_a(),
+        'ichimoku_b': ichimoku.ichimoku_b(),
+        'ichimoku_base_line': ichimoku.ichimoku_base_line(),
+        'ichimoku_conversion_line': ichimoku.ichimoku_conversion_line(),
+        'obv': OnBalanceVolumeIndicator(close=close, volume=volume).on_balance_volume(),
+        'atr': AverageTrueRange(high=high, low=low, close=close, window=14).average_true_range(),
+        'rolling_max': high.rolling(window=lookback).max(),
+        'rolling_min': low.rolling(window=lookback).min(),
+    }
+
+
+def kernel_indicators(df: pd.DataFrame) -> dict:
+    close, high, low, volume = (ind.as_array(df[c]) for c in ('close', 'high', 'low', 'volume'))
+    lookback = min(len(df), 100)
+    macd, macd_signal, macd_diff = ind.macd(close)
+    bb_high, bb_low, bb_mid = ind.bollinger(close, 20, 2)
+    span_a, span_b, base, conv = ind.ichimoku(high, low, 9, 26, 52)
+    return {
+        'rsi': ind.rsi(close, 14),
+        'macd': macd,
+        'macd_signal': macd_signal,
+        'macd_diff': macd_diff,
+        'bb_high': bb_high,
+        'bb_low': bb_low,
+        'bb_mid': bb_mid,
+        'sma_50': ind.sma(close, 50),
+        'sma_200': ind.sma(close, 200),
+        'ema_20': ind.ema(close, span=20, min_periods=20),
+        'ichimoku_a': span_a,
+        'ichimoku_b': span_b,
+        'ichimoku_base_line': base,
+        'ichimoku_conversion_line': conv,
+        'obv': ind.obv(close, volume),
+        'atr': ind.atr(high, low, close, 14),
+        'rolling_max': ind.rolling_max(high, lookback),
+        'rolling_min': ind.rolling_min(low, lookback),
+    }
+
+
+def check_parity(n: int = 1_000, rtol: float = 1e-9, atol: float = 1e-6) -> list:
+    """
+    Returns the names of kernels whose output differs from `ta` (NaN positions must match too).
+    """
+    df = synthetic_bars(n, seed=7)
+    expected, actual = ta_indicators(df), kernel_indicators(df)
+    failures = []
+    for name, want in expected.items():
+        ok = np.allclose(actual[name], want.to_numpy(dtype=np.float64), rtol=rtol, atol=atol, equal_nan=True)
+        print(f"  {name:<26} {'ok' if ok else 'MISMATCH'}")
+        if not ok:
+            failures.append(name)
+    return failures
+
+
+def warm_lazy_imports() -> float:
+    """
+    Loads LAZY_MODULES up front so their first import isn't timed as kernel work.
+    Returns the seconds it took (0 when already loaded).
+    """
+    start = time.perf_counter()
+    prewarm(LAZY_MODULES).join()
+    return time.perf_counter() - start
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(sizes):
+    print(f"Lazy imports ({', '.join(LAZY_MODULES)}): {warm_lazy_imports():.2f}s, not timed below\n")
+    print("Parity vs ta (1k bars):")
+    failures = check_parity()
+    if failures:
+        print(f"Parity check failed: {', '.join(failures)}")
+        return 1
+
+    print(f"\n{'bars':>10} {'ta (s)':>10} {'kernels (s)':>12} {'speedup':>9}")
+    for n in sizes:
+        df = synthetic_bars(n)
+        repeat = 5 if n <= 100_000 else 1
+        t_ta = best_of(lambda: ta_indicators(df), repeat)
+        t_np = best_of(lambda: compute_indicator_block(df['open'], df['high'], df['low'], df['close'], df['volume']), repeat)
+        print(f"{n:>10,} {t_ta:>10.4f} {t_np:>12.4f} {t_ta / t_np:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES))
@@ -0,0 +1,119 @@
+"""
+Parity check and benchmark: market-data response encodings (app.payload).
+
+    cd backend
+    python -m benchmarks.bench_payload            # 10 years of daily bars
+    python -m benchmarks.bench_payload 20000      # bars
+
+The json format must be byte-identical to what the endpoint returned before (FastAPI's
+jsonable_encoder + the stdlib encoder), and the columnar / MessagePack bodies must decode back
+to the chart within half a price quantum (exits non-zero otherwise). Then every format is
+sized and timed, plain and compressed; "cold" includes building the quantized columns, which
+happens once per fetch.
+"""
+import gzip
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from app import payload
+from app.market_data import MarketData, build_chart_payload
+from benchmarks.bench_indicators import synthetic_bars
+
+DEFAULT_BARS = 2520  # ~10 years of daily bars
+ROUNDS = 20
+
+
+def market_data(n_bars: int) -> MarketData:
+    df = synthetic_bars(n_bars)
+    df.insert(0, 'date', pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=n_bars, tz="America/New_York"))
+    return MarketData("SYN", "max", "1d", df, build_chart_payload(df))
+
+
+def response_for(result: MarketData) -> dict:
+    # Shaped like the /api/market-data response, with the rest of the payload kept small
+    return {"ticker": result.ticker, "price": result.chart[-1]['close'], "market_data": result.chart,
+            "news": [], "news_sentiment": {"score": 0, "mood": "Neutral"}, "indicators": {}, "forecast": {}}
+
+
+def legacy_body(response: dict) -> bytes:
+    return json.dumps(jsonable_encoder(response), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def decoded_columns(body: bytes, fmt: str) -> dict:
+    if fmt == "columnar":
+        block = json.loads(body)["market_data"]
+        return {name: np.asarray(block[name], dtype='float64') for name in payload.PRICE_COLUMNS + ['volume']}
+    block = payload.msgpack.unpackb(body)["market_data"]
+    columns = {name: np.frombuffer(block[name], dtype=block["dtypes"][name]).astype('float64')
+               for name in payload.PRICE_COLUMNS + ['volume']}
+    if block["dtypes"]["close"].startswith("int"):
+        for name in payload.PRICE_COLUMNS:
+            columns[name] /= 10 ** block["price_decimals"]
+    return columns
+
+
+def check_parity(result: MarketData) -> int:
+    mismatches = 0
+    response = response_for(result)
+    if payload.encode(response, "json", result) != legacy_body(response):
+        print("  MISMATCH json: body differs from the stdlib encoding")
+        mismatches += 1
+    quantum = 10.0 ** -payload.price_decimals(result.df[payload.PRICE_COLUMNS].to_numpy())
+    for fmt in payload.available_formats()[1:]:
+        columns = decoded_columns(payload.encode(response, fmt, result), fmt)
+        for name, values in columns.items():
+            error = np.abs(values - result.df[name].to_numpy()).max()
+            if error > (quantum / 2 + 1e-9 if name != 'volume' else 0):
+                print(f"  MISMATCH {fmt} {name}: max error {error}")
+                mismatches += 1
+    return mismatches
+
+
+def timed_encode(response: dict, result: MarketData, fmt: str, encoding: str):
+    result.encodings.clear()
+    start = time.perf_counter()
+    body = payload.compress(payload.encode(response, fmt, result), encoding)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        body = payload.compress(payload.encode(response, fmt, result), encoding)
+    return body, cold, (time.perf_counter() - start) / ROUNDS
+
+
+def main(n_bars: int) -> int:
+    result = market_data(n_bars)
+    print("Parity (json byte-identical, columnar / msgpack within half a quantum):")
+    mismatches = check_parity(result)
+    print(f"  {mismatches} mismatches")
+    if mismatches:
+        return 1
+
+    response = response_for(result)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        legacy = legacy_body(response)
+    legacy_seconds = (time.perf_counter() - start) / ROUNDS
+    encodings = [None, "gzip"] + (["br"] if payload.HAS_BROTLI else [])
+
+    print(f"\n{n_bars:,} bars ({result.chart[0]['time']} .. {result.chart[-1]['time']}):")
+    print(f"  {'format':<18} {'bytes':>10} {'cold ms':>9} {'warm ms':>9}")
+    print(f"  {'stdlib json':<18} {len(legacy):>10,} {legacy_seconds * 1000:9.2f} {legacy_seconds * 1000:9.2f}")
+    for fmt in payload.available_formats():
+        for encoding in encodings:
+            body, cold, warm = timed_encode(response, result, fmt, encoding)
+            name = f"{fmt}+{encoding}" if encoding else fmt
+            print(f"  {name:<18} {len(body):>10,} {cold * 1000:9.2f} {warm * 1000:9.2f}")
+    gzipped = len(gzip.compress(legacy, compresslevel=payload.PAYLOAD_GZIP_LEVEL))
+    print(f"  (stdlib json+gzip would be {gzipped:,} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:2]]
+    sys.exit(main(*(args + [DEFAULT_BARS][len(args):])))
@@ -0,0 +1,114 @@
+"""
+Parity check and benchmark: the panel screener (app.screener) vs per-ticker indicator blocks.
+
+    cd backend
+    python -m benchmarks.bench_screener             # 2,000 tickers x 1 year of daily bars
+    python -m benchmarks.bench_screener 5000 504    # tickers, bars per ticker
+
+Every 10th ticker gets a shorter history (down to a handful of bars) so the padding and
+warm-up masks are exercised. The panel's latest values must match compute_indicator_block /
+candlestick_patterns run ticker by ticker (exits non-zero on a mismatch). Then building the
+table and running a query are timed against the per-ticker loop, with the lazily imported
+modules loaded beforehand (their import is reported on its own).
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.analysis_engine import INDICATOR_COLUMNS, compute_indicator_block
+from app.patterns import candle_patterns
+from app.screener import Panel, Screen
+from benchmarks.bench_indicators import LAZY_MODULES, synthetic_bars, warm_lazy_imports
+
+DEFAULT_TICKERS = 2000
+DEFAULT_BARS = 252
+QUERY = "rsi < 40 and above cloud or golden cross and macd_bullish"
+
+
+def universe(tickers: int, n_bars: int):
+    rng = np.random.default_rng(7)
+    names, frames = [], []
+    for j in range(tickers):
+        n = n_bars if j % 10 else int(rng.integers(1, n_bars + 1))
+        names.append(f"T{j:05d}")
+        frames.append(synthetic_bars(n, seed=j))
+    return names, frames
+
+
+def per_ticker(df) -> dict:
+    block = dict(zip(INDICATOR_COLUMNS, compute_indicator_block(
+        df['open'], df['high'], df['low'], df['close'], df['volume'])))
+    latest = {name: values[-1] for name, values in block.items()}
+    candles = candle_patterns(df['open'], df['high'], df['low'], df['close'])
+    close = df['close'].to_numpy()[-1]
+    top = max(latest['ichimoku_a'], latest['ichimoku_b'])
+    bottom = min(latest['ichimoku_a'], latest['ichimoku_b'])
+    return {
+        "rsi": latest['rsi'],
+        "macd": latest['macd'],
+        "macd_signal": latest['macd_signal'],
+        "bb_position": (close - latest['bb_low']) / (latest['bb_high'] - latest['bb_low']),
+        "sma_50": latest['sma_50'],
+        "sma_200": latest['sma_200'],
+        "atr": latest['atr'],
+        "golden_cross": bool(latest['sma_50'] > latest['sma_200']),
+        "above_cloud": bool(close > top),
+        "below_cloud": bool(close < bottom),
+        **{name: bool(hits[-1]) for name, hits in candles.items()},
+    }
+
+
+def check_parity(names, frames, table) -> int:
+    mismatches = 0
+    for j, df in enumerate(frames):
+        for name, expected in per_ticker(df).items():
+            got = table[name][j]
+            same = got == expected if isinstance(expected, bool) else np.isclose(
+                got, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+            if not same:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"  MISMATCH {names[j]} ({len(df)} bars) {name}: per-ticker {expected}, panel {got}")
+    return mismatches
+
+
+def main(tickers: int, n_bars: int) -> int:
+    names, frames = universe(tickers, n_bars)
+    imported = warm_lazy_imports()
+
+    start = time.perf_counter()
+    panel = Panel(names, frames)
+    packed = time.perf_counter() - start
+    start = time.perf_counter()
+    screen = Screen(panel, "1y", "1d")
+    computed = time.perf_counter() - start
+
+    print(f"Parity vs per-ticker kernels ({tickers:,} tickers):")
+    mismatches = check_parity(names, frames, screen.table)
+    print(f"  {mismatches} mismatches")
+    if mismatches:
+        return 1
+
+    start = time.perf_counter()
+    result = screen.run(QUERY, sort="-rsi", limit=50)
+    queried = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for df in frames:
+        per_ticker(df)
+    looped = time.perf_counter() - start
+
+    print(f"\n{tickers:,} tickers x {n_bars} bars:")
+    print(f"  lazy imports         {imported * 1000:8.1f} ms  (once per process: {', '.join(LAZY_MODULES)})")
+    print(f"  per-ticker kernels   {looped * 1000:8.1f} ms")
+    print(f"  panel pack           {packed * 1000:8.1f} ms")
+    print(f"  panel indicators     {computed * 1000:8.1f} ms  ({looped / computed:5.1f}x)")
+    print(f"  query + sort         {queried * 1000:8.3f} ms  ({result['matches']} matches for '{QUERY}')")
+    print(f"  total screen         {(packed + computed + queried) * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*(args + [DEFAULT_TICKERS, DEFAULT_BARS][len(args):])))
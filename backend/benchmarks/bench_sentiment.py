@@ -0,0 +1,142 @@
+"""
+Regression check and benchmark: compiled SentimentScorer vs the original substring scorer.
+
+    cd backend
+    python -m benchmarks.bench_sentiment           # 100k headlines
+    python -m benchmarks.bench_sentiment 20000
+
+The regression check runs on headlines where the original scorer was right (lexicon words
+used as whole words, no negation) and requires identical scores. Then a list of real-world
+cases the substring scorer got wrong (partial words, derived words, inflections, negation)
+must score exactly as listed, one by one and through score_batch. Either check failing exits
+non-zero.
+"""
+import random
+import sys
+import time
+
+from app.market_data import SENTIMENT_LEXICON, sentiment_scorer
+
+DEFAULT_SIZE = 100_000
+
+# Filler words that don't contain any lexicon term as a substring
+FILLER = ["shares", "company", "quarter", "market", "analysts", "today", "after", "report",
+          "tech", "stock", "investors", "earnings", "outlook", "update", "week", "fund", "bank"]
+
+# (headline, expected score)
+EXPECTED_SCORES = [
+    ("Dividend bulletin issued against enterprise plans", 0.0),  # dive, bull, gain, rise inside words
+    ("Chipmaker shares surge, surge again", 0.3),                # "gain" inside "again", surge once
+    ("Analysts turn bullish on Apple", 0.0),                     # "bullish" is not a form of "bull"
+    ("Bearish analysts miss the rally", -0.3),                   # only "miss"
+    ("Buyer beware", 0.0),                                       # nor "buyer" of "buy"
+    ("Sellers dominate", 0.0),                                   # nor "sellers" of "sell"
+    ("Shares rose after earnings beat", 0.6),                    # irregular and listed forms
+    ("Losses mount as stock sank", -0.6),
+    ("Sell-off deepens", -0.3),
+    ("Stocks did not rise after the report", -0.3),              # negation
+    ("Stock won't fall, analysts say", 0.3),
+    ("Stock won’t fall", 0.3),
+    ("Not a crash, but a steep drop", 0.0),                      # negation ends with the clause
+    ("No upgrade for the bank this quarter despite growth", 0.0),  # window: growth is too far away
+    ("STOCK WON'T FALL, ANALYSTS SAY", 0.3),                    # contractions in any case
+    ("Don't buy the dip", -0.3),
+    ("Shares didn't rise 2.5% after the report", -0.3),         # a decimal point ends no clause
+    ("No. 1 chipmaker's shares surge", 0.3),                    # "No." does: nothing to negate
+    ('Analysts: "Shares will surge."', 0.3),                    # any punctuation around a word
+    ('(Shares "surge"!!)', 0.3),
+    ("Markets—rally or crash?", -0.3),
+]
+
+
+def legacy_analyze_sentiment(text: str) -> float:
+    """
+    The original scorer: one substring scan per lexicon word.
+    """
+    if not text:
+        return 0.0
+
+    text_lower = text.lower()
+    score = 0.0
+
+    for word in SENTIMENT_LEXICON['bullish']:
+        if word in text_lower:
+            score += 0.3
+
+    for word in SENTIMENT_LEXICON['bearish']:
+        if word in text_lower:
+            score -= 0.3
+
+    # Clamp score
+    return max(min(score, 1.0), -1.0)
+
+
+def synthetic_headlines(n: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    terms = SENTIMENT_LEXICON['bullish'] + SENTIMENT_LEXICON['bearish']
+    headlines = []
+    for _ in range(n):
+        words = rng.sample(FILLER, rng.randint(4, 9)) + rng.sample(terms, rng.randint(0, 3))
+        rng.shuffle(words)
+        headlines.append(" ".join(words).capitalize())
+    return headlines
+
+
+def check_expected() -> int:
+    mismatches = 0
+    titles = [title for title, _ in EXPECTED_SCORES]
+    for (title, expected), batched in zip(EXPECTED_SCORES, sentiment_scorer.score_batch(titles)):
+        score = sentiment_scorer.score(title)
+        if abs(score - expected) > 1e-9 or batched != score:
+            mismatches += 1
+            print(f"  MISMATCH {title!r}: expected {expected:+.2f}, got {score:+.2f} (batch {batched:+.2f})")
+    return mismatches
+
+
+def check_regression(headlines) -> int:
+    mismatches = 0
+    for title, score in zip(headlines, sentiment_scorer.score_batch(headlines)):
+        expected = legacy_analyze_sentiment(title)
+        if abs(score - expected) > 1e-9:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  MISMATCH {title!r}: legacy {expected:.2f}, compiled {score:.2f}")
+    return mismatches
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(size: int) -> int:
+    headlines = synthetic_headlines(size)
+
+    print(f"Regression vs substring scorer ({size:,} whole-word headlines):")
+    mismatches = check_regression(headlines)
+    print(f"  {mismatches} mismatches")
+    if mismatches:
+        return 1
+
+    print(f"\nExpected scores ({len(EXPECTED_SCORES)} hand-checked headlines):")
+    mismatches = check_expected()
+    print(f"  {mismatches} mismatches")
+    if mismatches:
+        return 1
+
+    t_legacy = best_of(lambda: [legacy_analyze_sentiment(t) for t in headlines])
+    t_single = best_of(lambda: [sentiment_scorer.score(t) for t in headlines])
+    t_batch = best_of(lambda: sentiment_scorer.score_batch(headlines))
+    print(f"\n{size:,} headlines:")
+    print(f"  substring scorer      {t_legacy:8.3f}s")
+    print(f"  compiled, per title   {t_single:8.3f}s  ({t_legacy / t_single:4.1f}x)")
+    print(f"  compiled, score_batch {t_batch:8.3f}s  ({t_legacy / t_batch:4.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE))
@@ -0,0 +1,135 @@
+"""
+Load test: concurrent /api/analyze and /api/chat requests against the ASGI app, offline.
+
+    cd backend
+    python -m benchmarks.load_analyze            # 20 concurrent requests per endpoint
+    python -m benchmarks.load_analyze 50
+
+The image host, the market data provider and Gemini are replaced by stand-ins with fixed
+latencies (blocking for the provider, like yfinance), so the wall time shows whether
+requests overlap: with a non-blocking pipeline N concurrent requests finish in roughly
+the time of one, instead of N times that.
+"""
+import asyncio
+import sys
+import time
+from unittest import mock
+
+import io
+
+import httpx
+import pandas as pd
+from PIL import Image
+
+from app import main as app_main
+from app.market_data import MarketData
+from app.write_behind import WriteBehindQueue
+from benchmarks.bench_indicators import synthetic_bars
+
+IMAGE_LATENCY = 0.2     # image download
+PROVIDER_LATENCY = 0.2  # market data fetch (blocking)
+MODEL_LATENCY = 0.3     # Gemini call
+DB_LATENCY = 0.1        # Supabase insert (off the request path now)
+SERIAL_TIME = max(IMAGE_LATENCY, PROVIDER_LATENCY) + MODEL_LATENCY
+
+
+def _png(width: int = 64, height: int = 48) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (255, 255, 255)).save(out, "PNG")
+    return out.getvalue()
+
+
+CHART_IMAGE = _png()
+
+
+def _fake_market_data(ticker, period="1mo", interval="1d"):
+    time.sleep(PROVIDER_LATENCY)
+    df = synthetic_bars(120)
+    df.insert(0, 'date', pd.date_range(end='2024-06-28', periods=len(df), freq='D'))
+    return MarketData(ticker, period, interval, df, [{"time": "2024-06-28", "close": 1.0, "volume": 1}])
+
+
+async def _fake_download(url, max_bytes=None):
+    await asyncio.sleep(IMAGE_LATENCY)
+    return CHART_IMAGE
+
+
+async def _fake_analysis(image_bytes, mode="General Analysis", context=None):
+    await asyncio.sleep(MODEL_LATENCY)
+    return {"Detected Pattern": "None", "Strategy": "Hold", "Entry Price": "Market",
+            "Stop Loss": "N/A", "Risk Level": "Low"}
+
+
+async def _fake_chat(message, image_bytes=None, context=None):
+    await asyncio.sleep(MODEL_LATENCY)
+    return "ok"
+
+
+class StandInSupabase:
+    """
+    Local stand-in for the Supabase client: client.table(name).insert(rows).execute().
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.inserts = 0
+
+    def table(self, name):
+        return self
+
+    def insert(self, rows):
+        self._pending = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def execute(self):
+        time.sleep(DB_LATENCY)
+        self.rows.extend(self._pending)
+        self.inserts += 1
+
+
+async def _run(path: str, payloads: list) -> float:
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(path, json=p) for p in payloads))
+        elapsed = time.perf_counter() - start
+    failed = [r.status_code for r in responses if r.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{path}: {len(failed)} failed requests ({failed[:5]})")
+    return elapsed
+
+
+def main(concurrency: int) -> int:
+    db = StandInSupabase()
+    writer = WriteBehindQueue(db, "analysis_history", flush_interval=0.05)
+    writer.start()
+    patches = [
+        mock.patch.object(app_main, "GEMINI_API_KEY", "bench"),
+        mock.patch.object(app_main, "history_writer", writer),
+        mock.patch.object(app_main, "fetch_market_data", _fake_market_data),
+        mock.patch.object(app_main, "download_bytes", _fake_download),
+        mock.patch.object(app_main, "analyze_chart_async", _fake_analysis),
+        mock.patch.object(app_main, "chat_with_ai_async", _fake_chat),
+    ]
+    for p in patches:
+        p.start()
+    try:
+        analyze = [{"image_url": f"http://img/{i}.png", "mode": "General Analysis", "ticker": f"T{i}"}
+                   for i in range(concurrency)]
+        chat = [{"message": "hi", "image_url": f"http://img/{i}.png", "ticker": f"T{i}"}
+                for i in range(concurrency)]
+        print(f"{concurrency} concurrent requests, one request alone takes ~{SERIAL_TIME:.2f}s "
+              f"(one after another: ~{SERIAL_TIME * concurrency:.1f}s)")
+        for path, payloads in (("/api/analyze", analyze), ("/api/chat", chat)):
+            elapsed = asyncio.run(_run(path, payloads))
+            print(f"  {path:<14} {elapsed:6.2f}s wall  ({SERIAL_TIME * concurrency / elapsed:4.1f}x vs serial)")
+        writer.close()
+        print(f"  analysis_history: {len(db.rows)} rows written in {db.inserts} batched inserts")
+    finally:
+        for p in patches:
+            p.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,139 @@
+"""
+Writes the fixtures the benchmark suite replays instead of the live upstreams.
+
+    cd backend
+    python -m benchmarks.record_fixtures           # deterministic synthetic fixtures (offline)
+    python -m benchmarks.record_fixtures --live    # record yfinance history / news (+ NewsAPI if NEWS_API_KEY is set)
+
+benchmarks/fixtures/
+    history/<TICKER>.csv   one year of daily bars in yfinance's shape (Date index, capitalized OHLCV)
+    news.json              {"yahoo": {ticker: [yfinance news items]}, "newsapi": {ticker: get_everything response}}
+    gemini.json            {"analysis": raw chart-analysis reply, "chat": raw chat reply}
+    chart.png              the chart image /api/analyze downloads
+
+Gemini replies and the chart are always the canned ones (recording them would need an API
+key and a real chart). Re-record only on purpose: a new fixture set invalidates baseline.json.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+TICKERS = ["AAPL", "MSFT", "NVDA", "SPY", "BTC-USD"]
+BARS = 252
+
+HEADLINES = [
+    "{name} shares surge after record quarterly profit",
+    "Analysts upgrade {name} on strong growth outlook",
+    "{name} stock falls as regulators weigh antitrust risk",
+    "{name} beats estimates but guidance disappoints investors",
+    "Why {name} could outperform the market this year",
+    "{name} faces weak demand in China, shares slip",
+    "Hedge funds buy {name} ahead of product launch",
+    "{name} not expected to miss targets, CFO says",
+]
+
+GEMINI = {
+    "analysis": json.dumps({
+        "Detected Pattern": "Ascending Triangle",
+        "Strategy": "Buy the breakout above resistance with volume confirmation",
+        "Entry Price": "Market",
+        "Stop Loss": "Below the rising trendline",
+        "Risk Level": "Medium",
+    }),
+    "chat": "RSI is neutral and MACD just crossed above its signal line, so momentum is improving; "
+            "wait for a close above the 50-day SMA before adding to the position.",
+}
+
+
+def synthetic_history(ticker: str, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start_price = {"BTC-USD": 60000.0, "SPY": 520.0}.get(ticker, 100.0 + 50 * seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0004, 0.015, BARS)))
+    open_ = close * (1 + rng.normal(0, 0.004, BARS))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, BARS)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, BARS)))
+    volume = rng.integers(5_000_000, 80_000_000, BARS)
+    dates = pd.bdate_range(end="2025-06-27", periods=BARS, tz="America/New_York", name="Date")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=dates).round({"Open": 4, "High": 4, "Low": 4, "Close": 4})
+
+
+def synthetic_news(ticker: str, seed: int):
+    rng = np.random.default_rng(seed)
+    picks = rng.permutation(len(HEADLINES))
+    base = 1_750_000_000
+    yahoo = [{
+        "title": HEADLINES[i].format(name=ticker),
+        "link": f"https://finance.example.com/{ticker.lower()}/{k}",
+        "publisher": ["Reuters", "Bloomberg", "MarketWatch"][k % 3],
+        "providerPublishTime": base - 3600 * k,
+    } for k, i in enumerate(picks[:2])]
+    newsapi = {"status": "ok", "articles": [{
+        "title": HEADLINES[i].format(name=ticker) + " - Example News",
+        "url": f"https://news.example.com/{ticker.lower()}/{k}",
+        "source": {"name": "Example News"},
+        "publishedAt": f"2025-06-2{k}T12:00:00Z",
+    } for k, i in enumerate(picks[1:6])]}
+    return yahoo, newsapi
+
+
+def chart_png() -> bytes:
+    import io
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (1280, 720), (18, 18, 24))
+    draw = ImageDraw.Draw(image)
+    rng = np.random.default_rng(0)
+    price = 360.0
+    for x in range(40, 1240, 12):
+        step = rng.normal(0, 6)
+        top, bottom = sorted((price, price + step))
+        draw.line([(x + 4, top - abs(rng.normal(0, 4))), (x + 4, bottom + abs(rng.normal(0, 4)))], fill=(160, 160, 160))
+        draw.rectangle([x, top, x + 8, max(bottom, top + 1)], fill=(38, 166, 154) if step < 0 else (239, 83, 80))
+        price += step
+    out = io.BytesIO()
+    image.save(out, "PNG")
+    return out.getvalue()
+
+
+def record_live(ticker: str):
+    import yfinance as yf
+
+    hist = yf.Ticker(ticker).history(period="1y", interval="1d")
+    yahoo = yf.Ticker(ticker).news or []
+    newsapi = None
+    if os.getenv("NEWS_API_KEY"):
+        from newsapi import NewsApiClient
+        newsapi = NewsApiClient(api_key=os.getenv("NEWS_API_KEY")).get_everything(
+            q=ticker, language="en", sort_by="relevancy", page_size=5)
+    return hist[["Open", "High", "Low", "Close", "Volume"]], yahoo, newsapi
+
+
+def main(live: bool) -> int:
+    os.makedirs(os.path.join(FIXTURES_DIR, "history"), exist_ok=True)
+    news = {"yahoo": {}, "newsapi": {}}
+    for seed, ticker in enumerate(TICKERS):
+        hist, yahoo, newsapi = record_live(ticker) if live else (synthetic_history(ticker, seed), *synthetic_news(ticker, seed))
+        if live and newsapi is None:
+            newsapi = synthetic_news(ticker, seed)[1]
+        hist.to_csv(os.path.join(FIXTURES_DIR, "history", f"{ticker}.csv"))
+        news["yahoo"][ticker] = yahoo
+        news["newsapi"][ticker] = newsapi
+        print(f"  {ticker}: {len(hist)} bars, {len(yahoo)} yahoo items, {len(newsapi['articles'])} newsapi articles")
+
+    with open(os.path.join(FIXTURES_DIR, "news.json"), "w", encoding="utf-8") as f:
+        json.dump(news, f, indent=1)
+    with open(os.path.join(FIXTURES_DIR, "gemini.json"), "w", encoding="utf-8") as f:
+        json.dump(GEMINI, f, indent=1)
+    with open(os.path.join(FIXTURES_DIR, "chart.png"), "wb") as f:
+        f.write(chart_png())
+    print(f"Fixtures written to {FIXTURES_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main("--live" in sys.argv[1:]))
@@ -0,0 +1,218 @@
+"""
+Fixture-backed stand-ins for the upstream services, for running the app offline.
+
+    with offline(latency=0.0) as upstreams:
+        ...  # yfinance, NewsAPI, Gemini, Supabase and image downloads replay fixtures/
+
+Histories are re-based so the last fixture bar is today (period windows and the bar store
+see current data), and every on-disk store (bar store, forecast models, chart analyses)
+points at a temporary directory. `latency` adds a fixed delay to each upstream call
+(blocking for the sync clients, awaited for the async ones).
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import types
+from contextlib import contextmanager
+from unittest import mock
+
+import pandas as pd
+
+from app.bar_store import PERIOD_SESSIONS, period_start
+from benchmarks.record_fixtures import FIXTURES_DIR
+
+
+def load_history(ticker: str) -> pd.DataFrame:
+    path = os.path.join(FIXTURES_DIR, "history", f"{ticker}.csv")
+    if not os.path.exists(path):
+        path = os.path.join(FIXTURES_DIR, "history", "AAPL.csv")  # any other symbol replays AAPL's bars
+    hist = pd.read_csv(path, index_col="Date")
+    hist.index = pd.to_datetime(hist.index, utc=True).tz_convert("America/New_York")
+    shift = pd.Timestamp.now(tz="America/New_York").normalize() - hist.index[-1].normalize()
+    hist.index = (hist.index + shift).rename("Date")
+    return hist
+
+
+class Upstreams:
+    """
+    Call counters for every stand-in (what a benchmark actually hit).
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = {"yfinance.history": 0, "yfinance.download": 0, "yfinance.news": 0,
+                      "newsapi": 0, "gemini": 0, "supabase": 0, "image": 0}
+        self.histories = {}
+        with open(os.path.join(FIXTURES_DIR, "news.json"), encoding="utf-8") as f:
+            self.news = json.load(f)
+        with open(os.path.join(FIXTURES_DIR, "gemini.json"), encoding="utf-8") as f:
+            self.gemini = json.load(f)
+        with open(os.path.join(FIXTURES_DIR, "chart.png"), "rb") as f:
+            self.chart = f.read()
+
+    def wait(self, name: str):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    async def wait_async(self, name: str):
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def history(self, ticker: str, period: str = None, start=None) -> pd.DataFrame:
+        """
+        Fixture bars from `start`, or for a yfinance period ("max" / unknown = all of them).
+        """
+        if ticker not in self.histories:
+            self.histories[ticker] = load_history(ticker)
+        hist = self.histories[ticker]
+        if start is None and period is not None:
+            try:
+                start = period_start(period)
+            except ValueError:
+                start = None
+        if start is not None:
+            hist = hist[hist.index >= pd.Timestamp(start)]
+        if period in PERIOD_SESSIONS:
+            sessions = hist.index.normalize().unique()[-PERIOD_SESSIONS[period]:]
+            hist = hist[hist.index.normalize().isin(sessions)]
+        return hist
+
+    # yfinance
+
+    def yfinance(self):
+        upstreams = self
+
+        class Ticker:
+            def __init__(self, ticker):
+                self.ticker = ticker
+
+            def history(self, period=None, interval="1d", start=None, **kwargs):
+                upstreams.wait("yfinance.history")
+                return upstreams.history(self.ticker, period, start)
+
+            @property
+            def news(self):
+                upstreams.wait("yfinance.news")
+                return upstreams.news["yahoo"].get(self.ticker, [])
+
+        def download(tickers, period=None, interval="1d", ignore_tz=None, **kwargs):
+            upstreams.wait("yfinance.download")
+            data = pd.concat({ticker: upstreams.history(ticker, period) for ticker in tickers}, axis=1)
+            # Like yfinance: day+ intervals come back tz-naive unless ignore_tz=False
+            if ignore_tz is None:
+                ignore_tz = interval[-1] not in ("m", "h")
+            if ignore_tz:
+                data.index = data.index.tz_localize(None)
+            return data
+
+        return types.SimpleNamespace(Ticker=Ticker, download=download)
+
+    # NewsAPI
+
+    def newsapi(self):
+        upstreams = self
+
+        class NewsApiClient:
+            def get_everything(self, q=None, page_size=5, **kwargs):
+                upstreams.wait("newsapi")
+                response = upstreams.news["newsapi"].get(q) or {"status": "ok", "articles": []}
+                return {**response, "articles": response["articles"][:page_size]}
+
+        return NewsApiClient()
+
+    # Gemini
+
+    def genai(self):
+        upstreams = self
+
+        class Response:
+            def __init__(self, text):
+                self.text = text
+
+        class GenerativeModel:
+            def __init__(self, name):
+                self.name = name
+
+            def _reply(self, content):
+                # The analysis prompt asks for JSON, everything else is chat
+                prompt = content[0] if isinstance(content, list) else content
+                return Response(upstreams.gemini["analysis" if "JSON" in str(prompt) else "chat"])
+
+            def generate_content(self, content):
+                upstreams.wait("gemini")
+                return self._reply(content)
+
+            async def generate_content_async(self, content):
+                await upstreams.wait_async("gemini")
+                return self._reply(content)
+
+        return types.SimpleNamespace(GenerativeModel=GenerativeModel, configure=lambda **kwargs: None)
+
+    # Supabase (client.table(name).insert(rows).execute())
+
+    def supabase(self):
+        upstreams = self
+
+        class Table:
+            rows = []
+
+            def insert(self, rows):
+                self._pending = rows if isinstance(rows, list) else [rows]
+                return self
+
+            def execute(self):
+                upstreams.wait("supabase")
+                Table.rows.extend(self._pending)
+
+        return types.SimpleNamespace(table=lambda name: Table())
+
+    # Image host
+
+    async def download_bytes(self, url, max_bytes=None):
+        await self.wait_async("image")
+        return self.chart
+
+
+@contextmanager
+def offline(latency: float = 0.0):
+    """
+    Patches every upstream client with fixture replays and redirects on-disk state to a
+    temporary directory; yields the Upstreams (call counters).
+    """
+    from app import analysis_cache, main, market_data, model_registry, strategy_engine
+    from app.bar_store import bar_store
+    from app.news_store import provider_budgets
+    from app.write_behind import WriteBehindQueue
+
+    upstreams = Upstreams(latency)
+    state_dir = tempfile.mkdtemp(prefix="bench-state-")
+    writer = WriteBehindQueue(upstreams.supabase(), "analysis_history", flush_interval=0.05,
+                              spill_path=os.path.join(state_dir, "spill.jsonl"))
+    patches = [
+        mock.patch.object(market_data, "yf", upstreams.yfinance()),
+        mock.patch.object(market_data, "newsapi", upstreams.newsapi()),
+        mock.patch.object(strategy_engine, "genai", upstreams.genai()),
+        mock.patch.object(main, "GEMINI_API_KEY", "fixture"),
+        mock.patch.object(main, "history_writer", writer),
+        mock.patch.object(main, "download_bytes", upstreams.download_bytes),
+        mock.patch.object(bar_store, "directory", os.path.join(state_dir, "bars")),
+        mock.patch.object(model_registry.registry, "model_dir", os.path.join(state_dir, "models")),
+        mock.patch.object(analysis_cache.analysis_cache, "directory", os.path.join(state_dir, "analyses")),
+    ]
+    # Benchmarks call the news providers far more often than the production budgets allow
+    patches += [mock.patch.object(budget, "limit", 10 ** 9) for budget in provider_budgets.values()]
+    for p in patches:
+        p.start()
+    writer.start()
+    try:
+        yield upstreams
+    finally:
+        writer.close()
+        for p in reversed(patches):
+            p.stop()
+        shutil.rmtree(state_dir, ignore_errors=True)
@@ -0,0 +1,117 @@
+"""
+Startup profile: what importing the app costs, and what the first requests pull in.
+
+    cd backend
+    python -m benchmarks.startup_profile            # import-time breakdown + first-request profile
+    python -m benchmarks.startup_profile --top 25
+
+Every measurement runs in a fresh interpreter (nothing imported yet):
+
+- import time of app.main from `python -X importtime`, grouped by top-level package
+  (self time summed over the package's modules, so nested imports aren't counted twice);
+- resident memory after the import and after each of the first requests (GET /, then
+  /api/market-data, /api/patterns and /api/backtest, offline and fixture-backed), and which of the heavy
+  libraries each step has loaded by then.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["fastapi", "pandas", "numpy", "scipy", "sklearn", "joblib", "yfinance", "google.generativeai",
+         "supabase", "newsapi", "PIL", "httpx"]
+
+# Runs in the child: import the app, make the first requests, print one JSON line
+_CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+
+def step(name, began):
+    return {"step": name, "seconds": round(time.perf_counter() - began, 3), "rss_mb": rss_mb(),
+            "loaded": [m for m in HEAVY if m in sys.modules]}
+
+HEAVY = %r
+steps = []
+began = time.perf_counter()
+import httpx
+from app.main import app
+steps.append(step("import app.main", began))
+
+async def requests():
+    from benchmarks.stand_ins import offline
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://profile", timeout=60) as client:
+        began = time.perf_counter()
+        (await client.get("/")).raise_for_status()
+        steps.append(step("first GET /", began))
+        with offline():
+            began = time.perf_counter()
+            (await client.get("/api/market-data/AAPL")).raise_for_status()
+            steps.append(step("first GET /api/market-data", began))
+            began = time.perf_counter()
+            (await client.get("/api/patterns/AAPL", params={"period": "1y"})).raise_for_status()
+            steps.append(step("first GET /api/patterns", began))
+            began = time.perf_counter()
+            (await client.post("/api/backtest", json={"tickers": ["AAPL"], "strategy": "macd", "period": "1y"})
+             ).raise_for_status()
+            steps.append(step("first POST /api/backtest", began))
+
+asyncio.run(requests())
+print(json.dumps({"steps": steps, "total": round(time.perf_counter() - start, 3)}))
+"""
+
+
+def _run(args: list) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+
+
+def import_profile() -> dict:
+    """
+    {"total": seconds, "packages": {top-level package: seconds}} for `import app.main`.
+    """
+    proc = _run(["-X", "importtime", "-c", "import app.main"])
+    packages = defaultdict(int)
+    total = 0
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(self_us)
+        if name == "app.main":
+            total = int(cumulative_us)
+    return {"total": total / 1e6, "packages": {name: us / 1e6 for name, us in packages.items()}}
+
+
+def request_profile() -> dict:
+    return json.loads(_run(["-c", _CHILD % HEAVY]).stdout.strip().splitlines()[-1])
+
+
+def main(top: int) -> int:
+    profile = import_profile()
+    print(f"import app.main: {profile['total']:.2f}s")
+    ranked = sorted(profile["packages"].items(), key=lambda item: -item[1])[:top]
+    for name, seconds in ranked:
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms")
+
+    print()
+    requests = request_profile()
+    for step in requests["steps"]:
+        print(f"{step['step']:<27} {step['seconds']:6.2f}s  rss {step['rss_mb']:7.1f} MB  "
+              f"loaded: {', '.join(step['loaded'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="packages to list (by import time)")
+    sys.exit(main(parser.parse_args().top))
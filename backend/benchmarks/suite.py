@@ -0,0 +1,253 @@
+"""
+Benchmark suite for the backend hot paths, offline, compared against a saved baseline.
+
+    cd backend
+    python -m benchmarks.suite                       # run everything, compare with benchmarks/baseline.json
+    python -m benchmarks.suite --only endpoint       # cases whose name contains "endpoint"
+    python -m benchmarks.suite --save-baseline       # run and store the results as the new baseline
+    python -m benchmarks.suite --latency 0.05        # add 50 ms to every upstream call
+
+yfinance, NewsAPI, Gemini, Supabase and the image host replay the recorded fixtures in
+benchmarks/fixtures (see stand_ins.py), so runs are reproducible and need no keys or network.
+Each case reports p50 / p99 latency and throughput. The whole suite runs --rounds times
+(interleaved, so a burst of machine noise doesn't land on one case) and a case is compared
+on its best round's p50: more than --threshold (default 25%) above the baseline is flagged
+and the run exits non-zero. Baselines are machine-specific: save one on the machine that
+runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.stand_ins import offline
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+TICKER = "AAPL"
+WATCHLIST = ["AAPL", "MSFT", "NVDA", "SPY", "BTC-USD"]
+
+
+class Case:
+    """
+    A named operation timed `iterations` times after `warmup` untimed runs.
+    `setup` runs before every call, outside the timing (e.g. to empty a cache).
+    """
+
+    def __init__(self, name: str, call, iterations: int, warmup: int = 2, setup=None):
+        self.name = name
+        self.call = call
+        self.iterations = iterations
+        self.warmup = warmup
+        self.setup = setup
+
+
+def _clear_market_caches():
+    from app.indicator_engine import engines
+    from app.market_data import cache
+    from app.news_store import news_cache
+    cache.clear()
+    news_cache.clear()
+    engines.clear()
+
+
+def _clear_analyses():
+    from app.analysis_cache import analysis_cache
+    analysis_cache.memory.clear()
+    shutil.rmtree(analysis_cache.directory, ignore_errors=True)
+
+
+def function_cases() -> list:
+    from app.analysis_engine import calculate_technical_indicators, train_and_predict
+    from app.market_data import analyze_sentiment, build_chart_payload, fetch_market_data, get_market_data
+    from app.news_store import article_sentiment
+    from app.patterns import scan
+
+    df = fetch_market_data(TICKER, "1y").df
+    with open(os.path.join(os.path.dirname(__file__), "fixtures", "news.json"), encoding="utf-8") as f:
+        news = json.load(f)
+    headlines = [item["title"] for items in news["yahoo"].values() for item in items] + \
+                [a["title"] for response in news["newsapi"].values() for a in response["articles"]]
+    texts = iter(headlines * 1000)
+
+    return [
+        Case("get_market_data.payload", lambda: build_chart_payload(df), 300),
+        Case("get_market_data.cached", lambda: get_market_data(TICKER), 2000),
+        Case("get_market_data.uncached", lambda: get_market_data(TICKER), 100, setup=_clear_market_caches),
+        Case("calculate_technical_indicators", lambda: calculate_technical_indicators(df.copy()), 200),
+        Case("train_and_predict", lambda: train_and_predict(df.copy()), 5, warmup=1),
+        Case("scan_patterns", lambda: scan(df), 300),
+        Case("analyze_sentiment", lambda: analyze_sentiment(next(texts)), 5000,
+             setup=article_sentiment.clear),
+    ]
+
+
+def endpoint_cases(client: httpx.AsyncClient) -> list:
+    def request(method, path, **kwargs):
+        async def call():
+            response = await client.request(method, path, **kwargs)
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} {path}: {response.status_code} {response.text[:200]}")
+            return response
+        return call
+
+    return [
+        Case("endpoint.market_data.cached", request("GET", f"/api/market-data/{TICKER}"), 200),
+        Case("endpoint.market_data.uncached", request("GET", f"/api/market-data/{TICKER}"), 40,
+             setup=_clear_market_caches),
+        Case("endpoint.market_data.online", request("GET", f"/api/market-data/{TICKER}?forecast_model=online"), 200),
+        Case("endpoint.market_data.columnar", request("GET", f"/api/market-data/{TICKER}", headers={
+            "Accept": "application/vnd.trademind.columnar+json"}), 200),
+        Case("endpoint.market_data.msgpack", request("GET", f"/api/market-data/{TICKER}?format=msgpack"), 200),
+        Case("endpoint.batch.uncached", request("POST", "/api/market-data/batch", json={"tickers": WATCHLIST}), 30,
+             setup=_clear_market_caches),
+        Case("endpoint.timeframes", request("GET", f"/api/market-data/{TICKER}/timeframes?intervals=1d,1wk,1mo"), 100),
+        Case("endpoint.patterns", request("GET", f"/api/patterns/{TICKER}"), 200),
+        Case("endpoint.screener", request("POST", "/api/screener", json={
+            "tickers": WATCHLIST, "query": "rsi < 70 and price > sma_50", "sort": "-rsi"}), 200),
+        Case("endpoint.backtest", request("POST", "/api/backtest", json={
+            "tickers": WATCHLIST, "strategy": "macd", "period": "1y",
+            "params": {"fast": [8, 12], "slow": [26, 35], "signal": [9]}}), 30),
+        Case("endpoint.analyze.uncached", request("POST", "/api/analyze", json={
+            "image_url": "https://img.example.com/chart.png", "mode": "General Analysis", "ticker": TICKER}), 40,
+             setup=_clear_analyses),
+        Case("endpoint.chat", request("POST", "/api/chat", json={"message": "Is it a buy?", "ticker": TICKER}), 100),
+    ]
+
+
+def summarize(rounds: list) -> dict:
+    times = np.concatenate(rounds)
+    return {
+        "iterations": len(times),
+        "best_p50_ms": float(min(np.percentile(r, 50) for r in rounds) * 1000),
+        "p50_ms": float(np.percentile(times, 50) * 1000),
+        "p99_ms": float(np.percentile(times, 99) * 1000),
+        "mean_ms": float(times.mean() * 1000),
+        "ops_per_sec": float(len(times) / times.sum()) if times.sum() > 0 else float("inf"),
+    }
+
+
+def run_case(case: Case) -> list:
+    times = []
+    for i in range(case.warmup + case.iterations):
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        case.call()
+        if i >= case.warmup:
+            times.append(time.perf_counter() - start)
+    return times
+
+
+async def run_case_async(case: Case) -> list:
+    times = []
+    for i in range(case.warmup + case.iterations):
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        await case.call()
+        if i >= case.warmup:
+            times.append(time.perf_counter() - start)
+    return times
+
+
+async def run_endpoints(only: str, rounds: int, samples: dict):
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        cases = [case for case in endpoint_cases(client) if only in case.name]
+        for _ in range(rounds):
+            for case in cases:
+                samples.setdefault(case.name, []).append(await run_case_async(case))
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Names of the cases whose p50 regressed by more than threshold against the baseline.
+    """
+    regressions, unchecked = [], []
+    print(f"\n{'case (best round p50)':<34} {'ms':>9} {'baseline':>9} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:<34} {result['best_p50_ms']:9.3f} {'-':>9} {'new':>8}")
+            unchecked.append(name)
+            continue
+        change = result["best_p50_ms"] / base["best_p50_ms"] - 1.0 if base["best_p50_ms"] > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  improved"
+        print(f"{name:<34} {result['best_p50_ms']:9.3f} {base['best_p50_ms']:9.3f} {change:+8.1%}{flag}")
+    if unchecked:
+        print(f"\nNot in the baseline, so never flagged: {', '.join(unchecked)} "
+              f"(re-save it with --save-baseline when adding cases)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default="", help="run only cases whose name contains this")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p50 slowdown (0.25 = 25%%)")
+    parser.add_argument("--rounds", type=int, default=3, help="times the whole suite is run")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every upstream call")
+    args = parser.parse_args()
+
+    def report(name, result):
+        print(f"{name:<34} p50 {result['p50_ms']:9.3f} ms   p99 {result['p99_ms']:9.3f} ms   "
+              f"{result['ops_per_sec']:10.1f} ops/s   (n={result['iterations']})")
+
+    samples = {}  # case name -> [per-round timings]
+    with offline(args.latency) as upstreams:
+        cases = [case for case in function_cases() if args.only in case.name]
+        for _ in range(args.rounds):
+            for case in cases:
+                samples.setdefault(case.name, []).append(run_case(case))
+        asyncio.run(run_endpoints(args.only, args.rounds, samples))
+        print(f"Upstream calls replayed: {upstreams.calls}\n")
+
+    results = {name: summarize(rounds) for name, rounds in samples.items()}
+    for name, result in results.items():
+        report(name, result)
+
+    if args.save_baseline:
+        baseline = {
+            "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()},
+            "latency": args.latency,
+            "rounds": args.rounds,
+            "results": results,
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=1)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} (run with --save-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("latency") != args.latency:
+        print(f"Note: baseline was recorded with --latency {baseline.get('latency')}")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())